@@ -0,0 +1,314 @@
+# backfill.py
+# Index channel posts into the catalog.
+#
+# ChannelIndexer turns channel messages into catalog entries (title from the
+# caption via parse_caption, falling back to the file name) and upserts them
+# by msg_id: a post already in the catalog is updated, a post whose caption
+# URL is already there gets linked to its msg_id, anything else is added.
+# Upserts are batched: a batch's adds and updates become one
+# Catalog.write_batch(), and posts of one batch sharing a msg_id or caption
+# URL become one entry (the latest).
+#
+# Backfill walks CHANNEL_ID from the last checkpoint in id windows. Bots
+# cannot read chat history, but they can fetch messages by id, so windows of
+# `batch_size` ids are requested with get_messages(), `concurrency` at a
+# time. The checkpoint is only advanced after the entries before it are
+# committed, so an interrupted run resumes without gaps. The walk stops at
+# `stop` or after `max_empty` windows in a row with no messages at all.
+#
+#   python backfill.py                 # resume from backfill_checkpoint.json
+#   python backfill.py --from 1 --reset
+#   python backfill.py --fake 50000    # measure throughput against FakeClient
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+from catalog import Catalog, PersistError
+from delivery import flood_wait_seconds
+from storage import write_json_atomic
+from textutils import parse_caption
+
+logger = logging.getLogger("sara_bot")
+
+CHECKPOINT_PATH = "backfill_checkpoint.json"
+
+
+def message_id(msg) -> int:
+    # pyrogram 2.x: .id, 1.x: .message_id
+    return int(getattr(msg, "id", None) or getattr(msg, "message_id", 0) or 0)
+
+
+def entry_from_message(msg) -> Optional[Dict]:
+    """Catalog entry for a channel post, None if it is not a movie post."""
+    if msg is None or getattr(msg, "empty", False):
+        return None
+    media = getattr(msg, "document", None) or getattr(msg, "video", None)
+    filename = (getattr(media, "file_name", "") or "") if media else ""
+    title, url = parse_caption(getattr(msg, "caption", None) or getattr(msg, "text", None) or "")
+    if not media and not url:
+        # plain text post without a link: nothing to send later
+        return None
+    if not title:
+        title = os.path.splitext(filename)[0].replace(".", " ").replace("_", " ").strip()
+    if not title:
+        return None
+    return {"title": title, "msg_id": message_id(msg), "filename": filename,
+            "file_url": url or ""}
+
+
+class ChannelIndexer:
+    """Batched msg_id upserts into the catalog, shared by backfill and the live handler."""
+
+    def __init__(self, catalog: Catalog, on_commit: Optional[Callable[[int, int], None]] = None,
+                 flush_interval: float = 5.0, max_pending: int = 200):
+        self.catalog = catalog
+        self.on_commit = on_commit
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[Dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.added = 0
+        self.updated = 0
+
+    def upsert(self, entries: List[Dict]) -> Tuple[int, int]:
+        """Write ``entries`` to the catalog; returns (added, updated).
+
+        Adds and updates go to the catalog as one write. Raises
+        ``PersistError`` if the storage refuses it; the catalog is unchanged
+        then, nothing is counted, and a retry of the same entries is harmless.
+        """
+        if not entries:
+            return 0, 0
+        # msg_id -> entry still to be added, and file_url -> its msg_id:
+        # later posts of the batch replace an earlier one with either
+        adds: Dict[int, Dict] = {}
+        add_urls: Dict[str, int] = {}
+        # key -> changed fields of movies already in the catalog
+        updates: Dict[int, Dict] = {}
+        for e in entries:
+            mid = e["msg_id"]
+            url = e["file_url"]
+            pending = {m for m in (mid if mid in adds else None, add_urls.get(url) if url else None)
+                       if m is not None}
+            for m in pending:
+                old_url = adds.pop(m)["file_url"]
+                if old_url:
+                    add_urls.pop(old_url, None)
+            if not pending:
+                # the catalog keeps its msg_id/file_url indexes up to date
+                key = self.catalog.key_for_msg(mid)
+                if key is None and url:
+                    key = self.catalog.key_for_url(url)
+                if key is not None:
+                    old = self.catalog.get(key) or {}
+                    fields = {f: e[f] for f in ("title", "filename", "msg_id") if e[f] and old.get(f) != e[f]}
+                    if fields:
+                        updates.setdefault(key, {}).update(fields)
+                    continue
+            adds[mid] = e
+            if url:
+                add_urls[url] = mid
+        self.catalog.write_batch(list(adds.values()), updates)
+        updated = len(updates)
+        self.added += len(adds)
+        self.updated += updated
+        if (adds or updated) and self.on_commit is not None:
+            self.on_commit(len(adds), updated)
+        return len(adds), updated
+
+    # ---- live channel posts ----
+    async def submit(self, msg) -> bool:
+        """Queue a new channel post; commits every ``flush_interval`` s or ``max_pending`` posts."""
+        entry = entry_from_message(msg)
+        if entry is None:
+            return False
+        self._pending.append(entry)
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        return True
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def drain(self) -> Tuple[int, int]:
+        """Commit queued posts from outside the event loop (shutdown)."""
+        batch, self._pending = self._pending, []
+        return self.upsert(batch)
+
+    async def flush(self) -> Tuple[int, int]:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0, 0
+        try:
+            # catalog writes hit the disk: keep them off the event loop
+            added, updated = await asyncio.get_running_loop().run_in_executor(None, self.upsert, batch)
+        except Exception:
+            logger.exception("channel index commit failed, %d posts dropped", len(batch))
+            return 0, 0
+        logger.info("Channel index: %d added, %d updated", added, updated)
+        return added, updated
+
+
+class Backfill:
+    def __init__(self, client, indexer: ChannelIndexer, chat_id: int, checkpoint_path: str = CHECKPOINT_PATH,
+                 batch_size: int = 200, concurrency: int = 4, max_empty: int = 5,
+                 commit_every: int = 1000, max_retries: int = 5):
+        self.client = client
+        self.indexer = indexer
+        self.chat_id = chat_id
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = min(batch_size, 200)  # get_messages limit
+        self.concurrency = concurrency
+        self.max_empty = max_empty
+        self.commit_every = commit_every
+        self.max_retries = max_retries
+        self.stats = {"scanned": 0, "messages": 0, "posts": 0, "added": 0, "updated": 0,
+                      "flood_waits": 0, "seconds": 0.0}
+
+    # ---- checkpoint ----
+    def load_checkpoint(self) -> int:
+        """Last msg_id fully committed for this chat (0 = start over)."""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception:
+            logger.exception("backfill checkpoint unreadable, starting over")
+            return 0
+        if data.get("chat_id") != self.chat_id:
+            return 0
+        return int(data.get("last_msg_id", 0))
+
+    def save_checkpoint(self, last_msg_id: int):
+        write_json_atomic(self.checkpoint_path, dict(self.stats, chat_id=self.chat_id,
+                                                     last_msg_id=last_msg_id, updated_at=time.time()))
+
+    # ---- fetching ----
+    async def _fetch(self, first: int, last: int) -> List:
+        ids = list(range(first, last + 1))
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.client.get_messages(self.chat_id, ids)
+            except Exception as e:
+                delay = flood_wait_seconds(e)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                self.stats["flood_waits"] += 1
+                logger.warning("Backfill FloodWait %.1fs at ids %d-%d", delay, first, last)
+                await asyncio.sleep(delay)
+        return []
+
+    async def run(self, start: Optional[int] = None, stop: Optional[int] = None) -> Dict:
+        """Walk the channel from ``start`` (default: after the checkpoint) to ``stop``."""
+        started = time.perf_counter()
+        base = self.stats["seconds"]
+        next_id = start if start is not None else self.load_checkpoint() + 1
+        # highest id of a message that exists; ids after it may still be
+        # posted, so the checkpoint never moves past it
+        last_seen = next_id - 1
+        pending: List[Dict] = []
+        empty_windows = 0
+        loop = asyncio.get_running_loop()
+
+        async def commit():
+            nonlocal pending
+            try:
+                added, updated = await loop.run_in_executor(None, self.indexer.upsert, pending)
+            except PersistError:
+                # the checkpoint stays at the last commit that was stored
+                logger.error("Backfill stopped: the catalog refused the %d posts up to msg %d", len(pending), last_seen)
+                raise
+            pending = []
+            self.stats["added"] += added
+            self.stats["updated"] += updated
+            self.save_checkpoint(last_seen)
+            self.stats["seconds"] = base + time.perf_counter() - started
+            logger.info("Backfill at msg %d: %d ids scanned, %d posts, %d added, %d updated (%.0f ids/s)",
+                        last_seen, self.stats["scanned"], self.stats["posts"], self.stats["added"],
+                        self.stats["updated"], self.stats["scanned"] / max(self.stats["seconds"], 1e-9))
+
+        while (next_id <= stop) if stop is not None else (empty_windows < self.max_empty):
+            windows = []
+            for _ in range(self.concurrency):
+                if stop is not None and next_id > stop:
+                    break
+                last = next_id + self.batch_size - 1 if stop is None else min(next_id + self.batch_size - 1, stop)
+                windows.append((next_id, last))
+                next_id = last + 1
+            results = await asyncio.gather(*(self._fetch(a, b) for a, b in windows))
+            for (first, last), messages in zip(windows, results):
+                self.stats["scanned"] += last - first + 1
+                found = [m for m in messages if m is not None and not getattr(m, "empty", False)]
+                if not found:
+                    empty_windows += 1
+                    continue
+                empty_windows = 0
+                last_seen = max(last_seen, max(message_id(m) for m in found))
+                self.stats["messages"] += len(found)
+                for m in found:
+                    entry = entry_from_message(m)
+                    if entry is not None:
+                        self.stats["posts"] += 1
+                        pending.append(entry)
+            if len(pending) >= self.commit_every:
+                await commit()
+        await commit()
+        return dict(self.stats, last_msg_id=last_seen)
+
+
+def fake_channel(n: int, chat_id: int, gap_every: int = 7):
+    from fake_telegram import fake_post
+    channel = {}
+    for i in range(1, n + 1):
+        if i % gap_every == 0:
+            continue  # deleted post
+        channel[i] = fake_post(i, f"Movie {i} ({1990 + i % 35})\n📌 Download below", f"Movie.{i}.mkv", chat_id)
+    return channel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index CHANNEL_ID history into the catalog")
+    parser.add_argument("--from", dest="start", type=int, help="first msg_id (default: after the checkpoint)")
+    parser.add_argument("--to", dest="stop", type=int, help="last msg_id (default: until history runs out)")
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start at msg 1")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--json", default="movie_list.json", help="catalog JSON file (default: movie_list.json)")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"),
+                        help="catalog backend (default: $CATALOG_STORAGE, as the bot uses)")
+    parser.add_argument("--db", help="SQLite catalog file (default: $CATALOG_DB_PATH; implies --storage sqlite)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fake", type=int, metavar="N", help="use a FakeClient channel of N posts (throughput test)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    chat_id = int(os.environ.get("CHANNEL_ID", "-1001"))
+    from updater import open_catalog
+    catalog = open_catalog(args.json, args.storage or ("sqlite" if args.db else None), args.db)
+    indexer = ChannelIndexer(catalog)
+    start = args.start or (1 if args.reset else None)
+
+    async def main():
+        if args.fake:
+            from fake_telegram import FakeClient
+            client = FakeClient(fake_channel(args.fake, chat_id), latency=0.02)
+            return await Backfill(client, indexer, chat_id, args.checkpoint, args.batch_size,
+                                  args.concurrency).run(start, args.stop)
+        from pyrogram import Client
+        client = Client("sara_backfill", api_id=int(os.environ["API_ID"]), api_hash=os.environ.get("API_HASH"),
+                        bot_token=os.environ.get("BOT_TOKEN"))
+        async with client:
+            return await Backfill(client, indexer, chat_id, args.checkpoint, args.batch_size,
+                                  args.concurrency).run(start, args.stop)
+
+    stats = asyncio.run(main())
+    catalog.close()
+    print(json.dumps(stats, indent=2))
@@ -0,0 +1,304 @@
+# bench.py
+# Offline benchmarks of the catalog hot paths against synthetic catalogs.
+#
+# Every catalog size runs in its own child process: bot.py is imported in a
+# scratch directory holding a generated movie_list.json, with dummy
+# Telegram credentials and no GitHub / OMDb configuration, so nothing
+# touches the network and peak memory is per size. For each operation it
+# reports throughput, p50/p99 latency and the peak Python memory
+# (tracemalloc, measured in a separate shorter pass) as JSON.
+#
+#   python bench.py                                  # 1k and 10k entries
+#   python bench.py --sizes 1000,100000,1000000 --ops match_exact,match_typo
+#   python bench.py --out bench_output.json          # keep for comparison
+import os
+import sys
+import json
+import time
+import logging
+import random
+import shutil
+import string
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+from typing import Callable, Dict, Iterable, List, Optional
+
+OPS = ("index_build", "match_exact", "match_partial", "match_typo", "match_miss",
+       "add_movie_to_json", "admin_bulk_add", "parse_indexes_spec")
+
+_SYLLABLES = ("ka", "ra", "an", "mu", "li", "sh", "to", "ve", "ni", "da", "ja", "ro", "pa", "ya", "ga",
+              "ma", "th", "al", "ee", "ki", "su", "ba", "ha", "de", "on", "ar", "la", "vi", "go", "na")
+_ENGLISH = ("the", "dark", "night", "return", "king", "last", "war", "love", "story", "man", "city",
+            "black", "game", "house", "lost", "secret", "dragon", "star", "final", "wild")
+_TAGS = ("720p.WEB-DL.Hindi", "1080p.NF.WEB-DL.DDP5.1", "480p.HDRip.Dual.Audio", "720p.AMZN.WEB-DL.HIN-ENG",
+         "1080p.BluRay.x264", "720p.HEVC.ESub.x265", "720p.UNCUT.WEB-DL.Hindi-Telugu")
+
+
+# -------------------------
+# Synthetic data
+# -------------------------
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_titles(n: int, seed: int = 1) -> List[str]:
+    """Titles shaped like movie_list.json: names, years, parts, seasons/episodes."""
+    rng = random.Random(seed)
+    pool = [_word(rng).capitalize() for _ in range(max(500, n // 4))]
+    titles = []
+    while len(titles) < n:
+        if rng.random() < 0.15:
+            name = f"The {rng.choice(_ENGLISH).capitalize()} {rng.choice(pool)}"
+        else:
+            name = " ".join(rng.choice(pool) for _ in range(rng.choice((1, 1, 2, 2, 3, 4))))
+        r = rng.random()
+        if r < 0.55:
+            titles.append(name)
+        elif r < 0.75:
+            titles.append(f"{name} ({rng.randint(1975, 2025)})")
+        elif r < 0.85:
+            for part in range(1, rng.randint(2, 4)):
+                titles.append(f"{name} Part {part}")
+        elif r < 0.95:
+            for season in range(1, rng.randint(2, 3)):
+                titles.append(f"{name} Season {season}")
+        else:
+            for ep in range(1, rng.randint(3, 9)):
+                titles.append(f"{name} S01 EP{ep}")
+    return titles[:n]
+
+
+def synthetic_entry(title: str, i: int, rng: random.Random) -> Dict:
+    dotted = title.replace(" ", ".").replace("(", "").replace(")", "")
+    release = f"{dotted}.{rng.randint(1990, 2025)}.{rng.choice(_TAGS)}"
+    filename = rng.choice(("", title, f"{title}.jpeg", f"{release}.mkv"))
+    if rng.random() < 0.05:
+        return {"title": title, "msg_id": 100000 + i, "filename": filename, "file_url": ""}
+    return {"title": title, "msg_id": 0, "filename": filename,
+            "file_url": f"https://cdn{i % 7}.example.com/{release}.{i}.mkv"}
+
+
+def synthetic_catalog(n: int, seed: int = 1) -> List[Dict]:
+    rng = random.Random(seed + 1)
+    return [dict(synthetic_entry(t, i, rng), id=i + 1) for i, t in enumerate(synthetic_titles(n, seed))]
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    for _ in range(rng.choice((1, 1, 2))):
+        i = rng.randrange(1, len(word) - 1)
+        edit = rng.random()
+        if edit < 0.33:
+            word = word[:i] + word[i + 1:]
+        elif edit < 0.66:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word
+
+
+def query_workload(movies: List[Dict], n: int, kind: str, seed: int = 2) -> List[str]:
+    """``n`` queries of one kind: exact titles, partial titles, misspelled titles or misses."""
+    rng = random.Random(f"{seed}-{kind}")
+    queries = []
+    for _ in range(n):
+        words = rng.choice(movies)["title"].split()
+        if kind == "exact":
+            queries.append(" ".join(words).lower())
+        elif kind == "partial":
+            start = rng.randrange(len(words))
+            queries.append(" ".join(words[start:start + rng.randint(1, 2)]).lower())
+        elif kind == "typo":
+            i = max(range(len(words)), key=lambda j: len(words[j]))
+            words[i] = _typo(words[i].lower(), rng)
+            queries.append(" ".join(words).lower())
+        else:
+            queries.append(f"zq{_word(rng)}x {_word(rng)}q")
+    return queries
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))]
+
+
+def measure(op: str, fn: Callable, args: Iterable, budget: float, memory_runs: int = 20) -> Dict:
+    """Time ``fn(arg)`` for every arg until ``budget`` seconds are used, then trace memory."""
+    args = list(args)
+    timings = []
+    started = time.perf_counter()
+    for arg in args:
+        t = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - t)
+        if time.perf_counter() - started > budget:
+            break
+    total = sum(timings)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for arg in args[:max(1, min(memory_runs, len(timings)))]:
+        fn(arg)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    timings.sort()
+    return {"op": op, "n": len(timings), "seconds": round(total, 4),
+            "ops_per_second": round(len(timings) / total, 1) if total else 0.0,
+            "p50_ms": round(_percentile(timings, 50) * 1000, 3),
+            "p99_ms": round(_percentile(timings, 99) * 1000, 3),
+            "peak_kb": round(max(peak, 0) / 1024, 1)}
+
+
+def run_size(size: int, ops: List[str], queries: int, adds: int, bulk_rows: int, budget: float, seed: int) -> Dict:
+    """Benchmark one catalog size in this process (called in a child by main())."""
+    workdir = tempfile.mkdtemp(prefix=f"sara_bench_{size}_")
+    movies = synthetic_catalog(size, seed)
+    with open(os.path.join(workdir, "movie_list.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(movies, ensure_ascii=False))
+    os.chdir(workdir)
+    for name, value in (("API_ID", "1"), ("API_HASH", "bench"), ("BOT_TOKEN", "1:bench"),
+                        ("ADMIN_PASSWORD", "bench"), ("CHANNEL_ID", "-1001")):
+        os.environ.setdefault(name, value)
+    for name in ("GITHUB_TOKEN", "GITHUB_REPO", "OMDB_API_KEY"):
+        os.environ.pop(name, None)
+    os.environ.setdefault("SPELL_INDEX_PATH", os.path.join(workdir, "spell_index.json"))
+
+    started = time.perf_counter()
+    import bot
+    import_seconds = time.perf_counter() - started
+    logging.getLogger("sara_bot").setLevel(logging.WARNING)
+    from search import SearchIndex
+    from series import SeriesIndex
+    from spell import SpellIndex
+
+    results = []
+    rng = random.Random(seed + 3)
+    items = bot.catalog.items()
+
+    def build(_):
+        SearchIndex().rebuild(items)
+        SeriesIndex().rebuild(items)
+        if bot.spell_index is not None:
+            SpellIndex(max_distance=bot.spell_index.max_distance).sync(items)
+
+    def match(q):
+        bot.series_index.group(bot.matcher.match(q).matches, limit=bot.SEARCH_MAX_RESULTS)
+
+    for op in ops:
+        if op == "index_build":
+            results.append(measure(op, build, range(3), budget, memory_runs=1))
+        elif op.startswith("match_"):
+            results.append(measure(op, match, query_workload(movies, queries, op[6:], seed), budget))
+        elif op == "add_movie_to_json":
+            new = [synthetic_entry(t, size + i, rng) for i, t in enumerate(synthetic_titles(adds, seed + 4))]
+            results.append(measure(op, lambda e: bot.add_movie_to_json(e["title"], e["msg_id"], e["filename"],
+                                                                       e["file_url"]), new, budget, memory_runs=3))
+        elif op == "admin_bulk_add":
+            client = bot.flask_app.test_client()
+            with client.session_transaction() as s:
+                s["logged"] = True
+            bodies = []
+            for b in range(max(1, adds // 10)):
+                titles = synthetic_titles(bulk_rows, seed + 100 + b)
+                bodies.append("\n".join(f"{t} | https://bulk.example.com/{b}/{i}.mkv | {t}.mkv"
+                                        for i, t in enumerate(titles)))
+            results.append(measure(op, lambda body: client.post("/admin/bulk_add", data={"bulk_data": body}),
+                                   bodies, budget, memory_runs=1))
+        elif op == "parse_indexes_spec":
+            specs = []
+            for _ in range(queries):
+                a = rng.randint(1, size)
+                spec = [f"{a}-{min(size, a + rng.randint(1, max(1, size // 100)))}"]
+                spec += [str(rng.randint(1, size)) for _ in range(20)]
+                specs.append(",".join(spec))
+            results.append(measure(op, bot.parse_indexes_spec, specs, budget))
+    for r in results:
+        r["size"] = size
+    try:
+        import resource
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        max_rss_kb = None
+    bot.search_pool.shutdown()
+    bot.http_client.close()
+    bot.catalog.close()
+    os.chdir(tempfile.gettempdir())
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {"size": size, "import_seconds": round(import_seconds, 3), "max_rss_kb": max_rss_kb,
+            "results": results}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search, add and bulk import on synthetic catalogs")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated catalog sizes (1k .. 1M)")
+    parser.add_argument("--ops", default=",".join(OPS), help=f"comma separated subset of: {', '.join(OPS)}")
+    parser.add_argument("--queries", type=int, default=500, help="queries per match_* op")
+    parser.add_argument("--adds", type=int, default=50, help="add_movie_to_json calls (bulk posts = adds/10)")
+    parser.add_argument("--bulk-rows", type=int, default=1000, help="rows per admin_bulk_add post")
+    parser.add_argument("--budget", type=float, default=10.0, help="max seconds timed per op and size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    ops = [op for op in args.ops.split(",") if op]
+    unknown = set(ops) - set(OPS)
+    if unknown:
+        parser.error(f"unknown ops: {', '.join(sorted(unknown))}")
+
+    if args.child:
+        # the scratch directory becomes the cwd, so bot.py must be importable from here
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        report = run_size(args.child, ops, args.queries, args.adds, args.bulk_rows, args.budget, args.seed)
+        sys.stdout.write(json.dumps(report) + "\n")
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    runs = []
+    for size in sizes:
+        print(f"bench: {size} entries ...", file=sys.stderr)
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", str(size), "--ops", ",".join(ops),
+               "--queries", str(args.queries), "--adds", str(args.adds), "--bulk-rows", str(args.bulk_rows),
+               "--budget", str(args.budget), "--seed", str(args.seed)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            raise SystemExit(f"bench for {size} entries failed")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "queries": args.queries, "adds": args.adds, "bulk_rows": args.bulk_rows,
+                       "budget": args.budget, "seed": args.seed},
+              "runs": runs}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for run in runs:
+        for r in run["results"]:
+            print(f"{run['size']:>8} {r['op']:<20} {r['ops_per_second']:>10.1f}/s  p50 {r['p50_ms']:>8.3f}ms"
+                  f"  p99 {r['p99_ms']:>8.3f}ms  peak {r['peak_kb']:>9.1f}KB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,42 @@
 # sara_bot_fixed_full.py
 import os
-import re
 import json
 import time
 import logging
+import secrets
 import threading
 import asyncio
-from base64 import b64encode
-from datetime import timedelta
+import atexit
 from typing import List, Dict, Tuple, Set
 
-import requests
 from urllib.parse import quote_plus
 from fuzzywuzzy import fuzz
-from flask import Flask, request, render_template_string, redirect, session, url_for
 
 from pyrogram import Client, filters
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputMediaDocument, Message, CallbackQuery
+
+from catalog import Catalog, PersistError, SharedVersion
+from storage import make_storage
+from search import SearchIndex, Matcher, MatchResult
+from series import SeriesIndex
+from spell import SpellIndex
+from search_pool import SearchPool, SearchBusy
+from posters import PosterCache
+from file_ids import FileIdCache
+from github_sync import GitHubSync
+from http_client import HttpClient
+from delivery import DeliveryScheduler, flood_wait_seconds
+from cache import TTLCache, QueryCache, SingleFlight, RecentRequests
+import metrics
+from log_setup import setup_logging
+from backfill import ChannelIndexer, message_id
+from textutils import normalize_title
+import web
+from web import flask_app, instrumented, load_settings, save_settings
 
 # -------------------------
 # Config / Env
 # -------------------------
-ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD")
-if not ADMIN_PASSWORD:
-    raise ValueError("ADMIN_PASSWORD required")
-
 _try_api_id = os.environ.get("API_ID")
 _try_channel_id = os.environ.get("CHANNEL_ID")
 if not _try_api_id or not _try_channel_id:
@@ -34,56 +46,113 @@ API_ID = int(_try_api_id)
 API_HASH = os.environ.get("API_HASH")
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
 CHANNEL_ID = int(_try_channel_id)  # -100...
-FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "change_me_secret")
 CHANNEL_INVITE_LINK = os.environ.get("CHANNEL_INVITE_LINK", "https://t.me/+qYUn4HuS7hRiNTNl")
 
 # NEW: OMDb API for legal posters
 OMDB_API_KEY = os.environ.get("OMDB_API_KEY", "").strip()
+# overridable for a local stand-in (fake_omdb.py)
+OMDB_API_URL = os.environ.get("OMDB_API_URL", "https://www.omdbapi.com/")
+POSTER_CACHE_PATH = os.environ.get("POSTER_CACHE_PATH", "poster_cache.json")
+# Telegram file_ids learned by uploading URL entries (kept out of the catalog)
+FILE_ID_CACHE_PATH = os.environ.get("FILE_ID_CACHE_PATH", "file_ids.json")
+# how long a found poster / a "no poster" answer is trusted (seconds)
+POSTER_HIT_TTL = float(os.environ.get("POSTER_HIT_TTL", str(30 * 86400)))
+POSTER_MISS_TTL = float(os.environ.get("POSTER_MISS_TTL", str(86400)))
 
 # GitHub (optional) - if not set, uploads skipped
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
 GITHUB_REPO = os.environ.get("GITHUB_REPO")  # username/repo
 GITHUB_FILE_PATH = os.environ.get("GITHUB_FILE_PATH", "movie_list.json")
 GITHUB_BRANCH = os.environ.get("GITHUB_BRANCH", "main")
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+# changes are committed once nothing new arrived for DEBOUNCE seconds,
+# but never later than MAX_DELAY seconds after the first unsynced change
+GITHUB_SYNC_DEBOUNCE = float(os.environ.get("GITHUB_SYNC_DEBOUNCE", "10"))
+GITHUB_SYNC_MAX_DELAY = float(os.environ.get("GITHUB_SYNC_MAX_DELAY", "60"))
+
+# outgoing HTTP (OMDb, GitHub): read timeout (s), retries of idempotent calls,
+# parallel requests per host, and failures in a row that open a host's
+# circuit breaker for HTTP_BREAKER_RESET seconds
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "8"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_PER_HOST = int(os.environ.get("HTTP_PER_HOST", "4"))
+HTTP_BREAKER_THRESHOLD = int(os.environ.get("HTTP_BREAKER_THRESHOLD", "5"))
+HTTP_BREAKER_RESET = float(os.environ.get("HTTP_BREAKER_RESET", "30"))
+
+# outgoing sends per second: whole bot, one private chat, one group (per minute)
+DELIVERY_GLOBAL_RATE = float(os.environ.get("DELIVERY_GLOBAL_RATE", "25"))
+DELIVERY_CHAT_RATE = float(os.environ.get("DELIVERY_CHAT_RATE", "1"))
+DELIVERY_GROUP_RATE_PER_MIN = float(os.environ.get("DELIVERY_GROUP_RATE_PER_MIN", "20"))
+DELIVERY_GLOBAL_FLOOD_CHATS = int(os.environ.get("DELIVERY_GLOBAL_FLOOD_CHATS", "3"))
 
 LOCAL_JSON_PATH = "movie_list.json"
-SETTINGS_PATH = "settings.json"
-LOG_FILE = "bot.log"
+# "thread": Flask's own server in a thread of the bot process (default);
+# "gunicorn" (opt-in, see start.sh): the bot runs without Flask and
+# `gunicorn wsgi:application` serves it from worker processes sharing the catalog
+WEB_SERVER = os.environ.get("WEB_SERVER", "thread")
+# published catalog version: processes sharing the catalog reload when it moves
+CATALOG_VERSION_PATH = os.environ.get("CATALOG_VERSION_PATH", f"{LOCAL_JSON_PATH}.version")
+# seconds between mtime/size checks of movie_list.json for external edits
+CATALOG_RELOAD_INTERVAL = float(os.environ.get("CATALOG_RELOAD_INTERVAL", "2"))
+# "json" rewrites movie_list.json per change; "journal" appends changes to
+# movie_list.json.journal and compacts past these thresholds; "sqlite" keeps
+# the catalog in CATALOG_DB_PATH (import it once with `python storage.py import`)
+CATALOG_STORAGE = os.environ.get("CATALOG_STORAGE", "json")
+CATALOG_DB_PATH = os.environ.get("CATALOG_DB_PATH", "movies.db")
+JOURNAL_MAX_RECORDS = int(os.environ.get("JOURNAL_MAX_RECORDS", "5000"))
+JOURNAL_MAX_BYTES = int(os.environ.get("JOURNAL_MAX_BYTES", str(8 * 1024 * 1024)))
+# CPU time (ms) one query may spend in fuzzy scoring, and max matches sent back
+SEARCH_FUZZY_BUDGET_MS = float(os.environ.get("SEARCH_FUZZY_BUDGET_MS", "50"))
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "50"))
+# search worker pool: "thread" or "process", pool size, max queued searches, per-query timeout (s)
+SEARCH_POOL_MODE = os.environ.get("SEARCH_POOL_MODE", "thread")
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", "2"))
+SEARCH_QUEUE_SIZE = int(os.environ.get("SEARCH_QUEUE_SIZE", "64"))
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", "3"))
+# spelling correction of query words (max edits per word, 0 = off); the
+# vocabulary is kept in SPELL_INDEX_PATH between restarts
+SPELL_MAX_DISTANCE = int(os.environ.get("SPELL_MAX_DISTANCE", "2"))
+SPELL_INDEX_PATH = os.environ.get("SPELL_INDEX_PATH", "spell_index.json")
+# with WEB_SERVER=gunicorn the bot process serves its own /metrics on this port (0 = off)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# results are sent RESULTS_PAGE_SIZE at a time with Next/Prev buttons; a result
+# set stays pageable for RESULT_PAGES_TTL seconds (RESULT_PAGES_MAX sets kept)
+RESULTS_PAGE_SIZE = int(os.environ.get("RESULTS_PAGE_SIZE", "10"))
+RESULT_PAGES_TTL = float(os.environ.get("RESULT_PAGES_TTL", "900"))
+RESULT_PAGES_MAX = int(os.environ.get("RESULT_PAGES_MAX", "2000"))
+# match lists of recent queries (per catalog version): max entries, seconds
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "500"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "300"))
+# the same title asked again in a group within this many seconds is not answered twice
+GROUP_DUPLICATE_WINDOW = float(os.environ.get("GROUP_DUPLICATE_WINDOW", "60"))
+# new CHANNEL_ID posts are added to the catalog, committed in batches every
+# CHANNEL_INDEX_INTERVAL seconds (history: python backfill.py)
+CHANNEL_AUTO_INDEX = os.environ.get("CHANNEL_AUTO_INDEX", "1") == "1"
+CHANNEL_INDEX_INTERVAL = float(os.environ.get("CHANNEL_INDEX_INTERVAL", "5"))
+LOG_FILE = os.environ.get("LOG_FILE", "bot.log")
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+# bot.log rotates by size, or by time when LOG_ROTATE_WHEN is set ("midnight", "h", ...)
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.environ.get("LOG_ROTATE_WHEN", "")
+# one log line may log at most BURST warnings/errors per WINDOW seconds (0 = no limit);
+# INFO lines (admin audit) are never dropped
+LOG_RATE_BURST = int(os.environ.get("LOG_RATE_BURST", "20"))
+LOG_RATE_WINDOW = float(os.environ.get("LOG_RATE_WINDOW", "10"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
 
 # -------------------------
 # Logger बनाओ
 # -------------------------
+# handlers write from a background thread; logging calls only enqueue
 logger = logging.getLogger("sara_bot")
-logger.setLevel(logging.INFO)
-
-# 1) File Handler
-fh = logging.FileHandler(LOG_FILE, mode="a", encoding="utf-8")
-fh.setLevel(logging.INFO)
-fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-
-# 2) Console Handler
-ch = logging.StreamHandler()
-ch.setLevel(logging.INFO)
-ch.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-
-# Duplicate handlers से बचने के लिए
-if not logger.handlers:
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+log_listener = setup_logging(logger, LOG_FILE, json_lines=LOG_FORMAT == "json", max_bytes=LOG_MAX_BYTES,
+                             backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN, queue_size=LOG_QUEUE_SIZE,
+                             burst=LOG_RATE_BURST, window=LOG_RATE_WINDOW)
+atexit.register(log_listener.stop)
 
-# -------------------------
-# Test log
-# -------------------------
 logger.info("Starting Sara bot...")
-logger.warning("Warning test message...")
-logger.error("Error test message...")
-
-# -------------------------
-# Flask app
-# -------------------------
-flask_app = Flask(__name__)
-flask_app.secret_key = FLASK_SECRET_KEY
-flask_app.permanent_session_lifetime = timedelta(hours=8)
 
 # -------------------------
 # Pyrogram bot
@@ -96,412 +165,161 @@ app = Client("sara_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
 json_lock = threading.Lock()
 
 # -------------------------
-# Helpers: load/save JSON & settings
+# Metrics (served on /metrics)
+# -------------------------
+SEARCH_SECONDS = metrics.histogram("sara_search_seconds", "Search scoring time (queueing included)", ("tier",))
+OMDB_SECONDS = metrics.histogram("sara_omdb_fetch_seconds", "OMDb poster lookups")
+TELEGRAM_SEND_SECONDS = metrics.histogram("sara_telegram_send_seconds", "Telegram calls sending movies",
+                                          ("method",))
+SEARCHES = metrics.counter("sara_searches_total", "Searches answered, by matcher tier", ("tier",))
+SEARCH_MATCHES = metrics.counter("sara_search_matches_total", "Entries matched by searches")
+LOOP_LAG = metrics.gauge("sara_event_loop_lag_seconds", "How late the bot event loop woke up from a 1s sleep")
+metrics.counter("sara_query_cache_hits_total", "Searches answered from the query cache",
+                fn=lambda: query_cache.stats()["hits"])
+metrics.counter("sara_poster_cache_hits_total", "Posters answered from the poster cache",
+                fn=lambda: poster_cache.stats()["hits"])
+metrics.counter("sara_flood_waits_total", "FloodWait errors seen by the delivery scheduler",
+                fn=lambda: delivery.flood_waits)
+metrics.gauge("sara_catalog_entries", "Movies in the catalog", fn=lambda: len(catalog.snapshot().movies))
+metrics.counter("sara_log_records_dropped_total", "Log records dropped because the log queue was full",
+                fn=lambda: log_listener.queue_handler.dropped)
+metrics.counter("sara_log_records_suppressed_total", "Log records muted by the per-line rate limit",
+                fn=lambda: log_listener.rate_limit.suppressed)
+metrics.gauge("sara_delivery_queued", "Sends waiting in the delivery scheduler", fn=lambda: delivery.queued)
+
+# -------------------------
+# Movie catalog (loaded once, shared by bot + Flask)
+# -------------------------
+catalog_storage = make_storage(CATALOG_STORAGE, LOCAL_JSON_PATH, CATALOG_DB_PATH,
+                               max_records=JOURNAL_MAX_RECORDS, max_bytes=JOURNAL_MAX_BYTES)
+catalog = Catalog(LOCAL_JSON_PATH, reload_interval=CATALOG_RELOAD_INTERVAL, storage=catalog_storage,
+                  shared=SharedVersion(CATALOG_VERSION_PATH) if WEB_SERVER == "gunicorn" else None)
+# token/trigram postings, kept in sync through catalog change events
+search_index = SearchIndex(catalog)
+# base_series_title -> sorted parts/episodes, so a match brings its whole series
+series_index = SeriesIndex(catalog)
+# misspelled query words -> closest title words
+spell_index = SpellIndex(catalog, path=SPELL_INDEX_PATH, max_distance=SPELL_MAX_DISTANCE) \
+    if SPELL_MAX_DISTANCE > 0 else None
+# exact -> token overlap -> same with spelling corrected -> fuzzy (budgeted)
+matcher = Matcher(search_index, fuzzy_budget=SEARCH_FUZZY_BUDGET_MS / 1000.0, max_results=SEARCH_MAX_RESULTS,
+                  fts=catalog_storage.search if CATALOG_STORAGE == "sqlite" else None, spell=spell_index)
+# scoring runs here, never on the Pyrogram event loop
+# ranked matches of recent queries; any catalog change (new version) empties it
+query_cache = QueryCache(max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+# identical searches arriving together run once
+search_flights = SingleFlight()
+search_pool = SearchPool(matcher, mode=SEARCH_POOL_MODE, workers=SEARCH_WORKERS,
+                         max_pending=SEARCH_QUEUE_SIZE, timeout=SEARCH_TIMEOUT)
+
+# -------------------------
+# Helpers: load JSON
 # -------------------------
 def load_movies_local():
-    try:
-        with open(LOCAL_JSON_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-    except Exception:
-        logger.exception("load_movies_local error")
-        return []
-
-def save_movies_local(data):
-    try:
-        with open(LOCAL_JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception:
-        logger.exception("save_movies_local error")
-
-def load_settings():
-    default = {"auto_forward": False}
-    try:
-        if os.path.exists(SETTINGS_PATH):
-            with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-                s = json.load(f)
-                if "auto_forward" not in s:
-                    s["auto_forward"] = False
-                return s
-        else:
-            return default
-    except Exception:
-        logger.exception("load_settings error")
-        return default
-
-def save_settings(settings):
-    try:
-        with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
-            json.dump(settings, f, indent=4, ensure_ascii=False)
-    except Exception:
-        logger.exception("save_settings error")
+    # writers get a private copy; read-only code should use catalog.snapshot()
+    return catalog.load()
 
 # -------------------------
-# GitHub upload (optional)
+# Shared HTTP client (OMDb + GitHub): keep-alive, retries, per-host circuit breaker
 # -------------------------
-def github_get_file_sha():
-    if not (GITHUB_TOKEN and GITHUB_REPO):
-        return None
-    try:
-        url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{GITHUB_FILE_PATH}?ref={GITHUB_BRANCH}"
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        r = requests.get(url, headers=headers, timeout=10)
-        if r.status_code == 200:
-            return r.json().get("sha")
-        logger.warning("GitHub get SHA failed: %s %s", r.status_code, r.text[:200])
-    except Exception:
-        logger.exception("github_get_file_sha error")
-    return None
+http_client = HttpClient(timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, per_host=HTTP_PER_HOST,
+                         breaker_threshold=HTTP_BREAKER_THRESHOLD, breaker_reset=HTTP_BREAKER_RESET)
 
-def upload_json_to_github(data):
-    if not (GITHUB_TOKEN and GITHUB_REPO):
-        logger.info("GitHub not configured — skipping upload")
-        return False
-    try:
-        sha = github_get_file_sha()
-        content_str = json.dumps(data, indent=4, ensure_ascii=False)
-        content_b64 = b64encode(content_str.encode("utf-8")).decode("utf-8")
-        url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{GITHUB_FILE_PATH}"
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        payload = {"message": "Update movie_list.json via bot", "content": content_b64, "branch": GITHUB_BRANCH}
-        if sha:
-            payload["sha"] = sha
-        r = requests.put(url, json=payload, headers=headers, timeout=15)
-        if r.status_code in (200, 201):
-            logger.info("Uploaded movie_list.json to GitHub")
-            return True
-        logger.warning("GitHub upload failed: %s %s", r.status_code, r.text[:300])
-    except Exception:
-        logger.exception("upload_json_to_github error")
-    return False
+# -------------------------
+# GitHub sync (optional) - if not configured, uploads skipped
+# -------------------------
+# only the bot process uploads; it sees edits made in web workers through
+# catalog.on_remote_change
+github_sync = GitHubSync(GITHUB_TOKEN, GITHUB_REPO, GITHUB_FILE_PATH,
+                         get_data=load_movies_local, branch=GITHUB_BRANCH, api_url=GITHUB_API_URL,
+                         debounce=GITHUB_SYNC_DEBOUNCE, max_delay=GITHUB_SYNC_MAX_DELAY, http=http_client)
+catalog.on_remote_change(github_sync.mark_dirty)
 
 # -------------------------
 # Add movie helper
 # -------------------------
 def add_movie_to_json(title, msg_id=None, filename=None, file_url=None):
     with json_lock:
-        data = load_movies_local()
         title = (title or "Untitled").strip()
-        if msg_id and any(int(m.get("msg_id", 0)) == int(msg_id) and m.get("msg_id", 0) != 0 for m in data):
+        if msg_id and catalog.key_for_msg(msg_id) is not None:
             logger.info("Duplicate msg_id %s, skipping", msg_id)
             return False
-        if file_url and any(m.get("file_url") == file_url for m in data if m.get("file_url")):
+        if file_url and catalog.key_for_url(file_url) is not None:
             logger.info("Duplicate file_url %s, skipping", file_url)
             return False
         entry = {"title": title, "msg_id": int(msg_id) if msg_id else 0, "filename": filename or "", "file_url": file_url or ""}
-        data.append(entry)
-        save_movies_local(data)
-        uploaded = upload_json_to_github(data)
-        logger.info("Added movie: %s msg_id=%s file_url=%s github=%s", title, msg_id, file_url, uploaded)
-        return True
+        try:
+            catalog.add(entry)
+        except PersistError:
+            logger.exception("Could not add movie %s msg_id=%s file_url=%s", title, msg_id, file_url)
+            return False
+    github_sync.mark_dirty()
+    logger.info("Added movie: %s msg_id=%s file_url=%s", title, msg_id, file_url)
+    return True
 
 # -------------------------
-# Caption parse util
+# file_id cache for URL entries
 # -------------------------
-def parse_caption(caption_text):
-    if not caption_text:
-        return None, None
-    lines = caption_text.splitlines()
-    title = None
-    for line in lines:
-        s = line.strip()
-        if not s:
-            continue
-        if s.startswith("---") or s.startswith("📌") or s.lower().startswith("feedback") or s.lower().startswith("download"):
-            continue
-        title = s
-        break
-    urls = re.findall(r'https?://\S+', caption_text)
-    return title, (urls[0] if urls else None)
-
-# -------------------------
-# Text Normalization & Matching
-# -------------------------
-STOPWORDS = {
-    "the","and","a","an","of","in","on","at","to","for","by","with","from","part","pt","episode","ep","season","s","disk","disc","cd","movie","film","full","hd","hq","1080p","720p"
-}
-
-def normalize_title(s: str) -> str:
-    s = (s or "").lower()
-    s = re.sub(r"[\[\]\(\)\{\}\|:_\-\.]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-def token_words(s: str) -> List[str]:
-    s = normalize_title(s)
-    words = re.findall(r"[a-z0-9]+", s)
-    return [w for w in words if w not in STOPWORDS]
-
-def base_series_title(s: str) -> str:
-    s = normalize_title(s)
-    s = re.sub(r"\b(part|pt|episode|ep|season|s)\s*\d+\b", "", s)
-    s = re.sub(r"\b\d{4}\b", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-def is_exact_or_5words_match(query: str, title: str) -> Tuple[bool, int]:
-    qn = normalize_title(query)
-    tn = normalize_title(title)
-    if not qn or not tn:
-        return False, 0
-    if qn == tn:
-        return True, 999
-    qset = set(token_words(qn))
-    tset = set(token_words(tn))
-    overlap = len(qset & tset)
-    return (overlap >= 5), overlap
+def is_http_url(s: str) -> bool:
+    return bool(s) and s.startswith(("http://", "https://"))
+
+# learned file_ids live here, not in the catalog: a catalog write would bump
+# its version (query cache, ETags, search workers) and block the event loop
+file_ids = FileIdCache(FILE_ID_CACHE_PATH)
+
+def cached_file_id(entry: Dict) -> str:
+    learned = file_ids.get(entry.get("file_url") or "")
+    # entries from before the side cache may still carry one
+    return learned if learned is not None else entry.get("file_id") or ""
+
+def remember_file_id(file_url: str, file_id: str):
+    file_ids.set(file_url, file_id or "")
+    logger.info("Cached file_id for %s = %s", file_url, bool(file_id))
+
+def media_file_id(msg) -> str:
+    if msg is None:
+        return ""
+    media = msg.document or msg.video or msg.audio or msg.animation
+    return getattr(media, "file_id", "") or ""
 
 # -------------------------
 # OMDb Poster (LEGAL)
 # -------------------------
-def get_poster_url_omdb(title: str) -> str:
-    if not OMDB_API_KEY:
-        return ""
-    try:
-        # try exact title first
-        url = f"https://www.omdbapi.com/?apikey={OMDB_API_KEY}&t={quote_plus(title)}"
-        r = requests.get(url, timeout=8)
-        if r.status_code == 200:
-            data = r.json()
-            poster = data.get("Poster", "N/A")
-            if poster and poster != "N/A":
-                return poster
-        # fallback: search
-        url = f"https://www.omdbapi.com/?apikey={OMDB_API_KEY}&s={quote_plus(title)}"
-        r = requests.get(url, timeout=8)
-        if r.status_code == 200:
-            data = r.json()
-            results = data.get("Search", []) or []
-            # try to choose best match using fuzzy on Title
-            best = None
-            best_score = 0
-            for it in results:
-                t = it.get("Title", "")
-                score = fuzz.token_set_ratio(title.lower(), t.lower())
-                if score > best_score:
-                    best_score = score
-                    best = it
-            if best:
-                p = best.get("Poster", "")
-                if p and p != "N/A":
-                    return p
-    except Exception:
-        logger.exception("OMDb poster fetch failed")
+@metrics.timed(OMDB_SECONDS)
+async def fetch_poster_omdb(title: str) -> str:
+    # "" = OMDb has no poster; network/HTTP errors raise so they are not cached
+    # try exact title first
+    url = f"{OMDB_API_URL}?apikey={OMDB_API_KEY}&t={quote_plus(title)}"
+    r = await http_client.aget(url)
+    r.raise_for_status()
+    data = r.json()
+    poster = data.get("Poster", "N/A")
+    if poster and poster != "N/A":
+        return poster
+    # fallback: search
+    url = f"{OMDB_API_URL}?apikey={OMDB_API_KEY}&s={quote_plus(title)}"
+    r = await http_client.aget(url)
+    r.raise_for_status()
+    data = r.json()
+    results = data.get("Search", []) or []
+    # try to choose best match using fuzzy on Title
+    best = None
+    best_score = 0
+    for it in results:
+        t = it.get("Title", "")
+        score = fuzz.token_set_ratio(title.lower(), t.lower())
+        if score > best_score:
+            best_score = score
+            best = it
+    if best:
+        p = best.get("Poster", "")
+        if p and p != "N/A":
+            return p
     return ""
 
-# -------------------------
-# Flask templates
-# -------------------------
-login_template = """
-<!doctype html><title>Admin Login</title>
-<h2>Admin Login</h2>
-{% if error %}<p style="color:red">{{ error }}</p>{% endif %}
-<form method="post">
-  <input name="password" type="password" placeholder="Password" required>
-  <button type="submit">Login</button>
-</form>
-"""
-
-dashboard_template = """
-<!doctype html><title>Dashboard</title>
-<h2>Movie List ({{ count }})</h2>
-<p>
-  <a href="{{ url_for('admin_logout') }}">Logout</a> |
-  Auto-forward: <b>{{ 'ON' if settings.auto_forward else 'OFF' }}</b>
-  <form method="post" action="{{ url_for('toggle_forward') }}" style="display:inline">
-    <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
-    <button type="submit">{{ 'Disable' if settings.auto_forward else 'Enable' }} Auto-forward</button>
-  </form>
-</p>
-
-<h3>Bulk Add (one per line: title|file_url|filename(optional))</h3>
-<form method="post" action="{{ url_for('admin_bulk_add') }}">
-  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
-  <textarea name="bulk_data" rows="6" cols="80" placeholder="Movie Title | https://link.or.file_id | filename.mkv"></textarea><br>
-  <button type="submit">Add Bulk</button>
-</form>
-
-<h3>Bulk Delete (indexes)</h3>
-<form method="post" action="{{ url_for('admin_bulk_delete') }}">
-  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
-  <input name="bulk_delete_indexes" placeholder="e.g. 0,2,5-7"><button type="submit">Delete</button>
-</form>
-
-<table border=1 cellpadding=6>
-<tr><th>#</th><th>Title</th><th>Filename</th><th>Msg ID</th><th>File URL</th><th>Actions</th></tr>
-{% for movie in movies %}
-<tr>
-  <td>{{ loop.index0 }}</td>
-  <td>{{ movie.title }}</td>
-  <td>{{ movie.filename }}</td>
-  <td>{{ movie.msg_id }}</td>
-  <td style="max-width:300px;word-break:break-all">{{ movie.file_url }}</td>
-  <td>
-    <a href="{{ url_for('admin_edit_movie', index=loop.index0) }}">Edit</a> |
-    <a href="{{ url_for('admin_delete_movie', index=loop.index0) }}?password={{ session.get('pwd_token') }}" onclick="return confirm('Delete?')">Delete</a>
-  </td>
-</tr>
-{% endfor %}
-</table>
-"""
-
-edit_template = """
-<!doctype html><title>Edit Movie</title>
-<h2>Edit Movie #{{ index }}</h2>
-<form method="post">
-  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
-  Title:<br><input type="text" name="title" value="{{ movie.title }}" required><br>
-  Filename:<br><input type="text" name="filename" value="{{ movie.filename }}"><br>
-  File URL:<br><input type="text" name="file_url" value="{{ movie.file_url }}"><br>
-  <button type="submit">Save</button>
-</form>
-<a href="{{ url_for('admin_login') }}">Back</a>
-"""
-
-# -------------------------
-# Flask routes
-# -------------------------
-def require_login():
-    return session.get("logged", False)
-
-@flask_app.route("/admin", methods=["GET", "POST"])
-def admin_login():
-    if request.method == "POST":
-        pwd = request.form.get("password")
-        if pwd == ADMIN_PASSWORD:
-            session.permanent = True
-            session["logged"] = True
-            session["pwd_token"] = pwd
-            movies = load_movies_local()
-            settings = load_settings()
-            return render_template_string(dashboard_template, movies=movies, count=len(movies), session=session, settings=settings)
-        else:
-            return render_template_string(login_template, error="Wrong password!")
-    else:
-        if require_login():
-            movies = load_movies_local()
-            settings = load_settings()
-            return render_template_string(dashboard_template, movies=movies, count=len(movies), session=session, settings=settings)
-        return render_template_string(login_template, error=None)
-
-@flask_app.route("/admin/logout")
-def admin_logout():
-    session.clear()
-    return redirect(url_for("admin_login"))
-
-@flask_app.route("/admin/edit/<int:index>", methods=["GET", "POST"])
-def admin_edit_movie(index):
-    if not require_login():
-        return redirect(url_for("admin_login"))
-    data = load_movies_local()
-    if index < 0 or index >= len(data):
-        return "Invalid index"
-    if request.method == "POST":
-        data[index]["title"] = request.form.get("title", data[index].get("title","")).strip()
-        data[index]["filename"] = request.form.get("filename", data[index].get("filename",""))
-        data[index]["file_url"] = request.form.get("file_url", data[index].get("file_url",""))
-        save_movies_local(data)
-        upload_json_to_github(data)
-        logger.info("Admin edited movie index=%s", index)
-        return redirect(url_for("admin_login"))
-    return render_template_string(edit_template, movie=data[index], index=index)
-
-@flask_app.route("/admin/delete/<int:index>")
-def admin_delete_movie(index):
-    pwd = request.args.get("password")
-    if pwd != session.get("pwd_token"):
-        return redirect(url_for("admin_login"))
-    data = load_movies_local()
-    if 0 <= index < len(data):
-        removed = data.pop(index)
-        save_movies_local(data)
-        upload_json_to_github(data)
-        logger.info("Admin deleted movie index=%s title=%s", index, removed.get("title"))
-    return redirect(url_for("admin_login"))
-
-@flask_app.route("/admin/bulk_add", methods=["POST"])
-def admin_bulk_add():
-    if not require_login():
-        return redirect(url_for("admin_login"))
-    bulk = request.form.get("bulk_data", "").strip()
-    if not bulk:
-        return redirect(url_for("admin_login"))
-    data = load_movies_local()
-    added = 0
-    for line in bulk.splitlines():
-        parts = [p.strip() for p in line.split("|")]
-        if len(parts) >= 2:
-            title = parts[0]
-            file_url = parts[1]
-            filename = parts[2] if len(parts) >= 3 else ""
-            if any(m.get("file_url") == file_url for m in data):
-                continue
-            data.append({"title": title, "filename": filename, "file_url": file_url, "msg_id": 0})
-            added += 1
-    save_movies_local(data)
-    upload_json_to_github(data)
-    logger.info("Admin bulk added %d movies", added)
-    return redirect(url_for("admin_login"))
-
-def parse_indexes_spec(spec: str):
-    rv = set()
-    for part in spec.split(","):
-        part = part.strip()
-        if not part:
-            continue
-        if "-" in part:
-            try:
-                a,b = part.split("-",1)
-                a=int(a); b=int(b)
-                for i in range(a,b+1):
-                    rv.add(i)
-            except:
-                continue
-        else:
-            try:
-                rv.add(int(part))
-            except:
-                continue
-    return sorted(rv)
-
-@flask_app.route("/admin/bulk_delete", methods=["POST"])
-def admin_bulk_delete():
-    if not require_login():
-        return redirect(url_for("admin_login"))
-    spec = request.form.get("bulk_delete_indexes","").strip()
-    if not spec:
-        return redirect(url_for("admin_login"))
-    idxs = parse_indexes_spec(spec)
-    data = load_movies_local()
-    deleted = 0
-    for idx in sorted(idxs, reverse=True):
-        if 0 <= idx < len(data):
-            removed = data.pop(idx)
-            deleted += 1
-            logger.info("Admin bulk deleted idx=%s title=%s", idx, removed.get("title"))
-    save_movies_local(data)
-    upload_json_to_github(data)
-    return redirect(url_for("admin_login"))
-
-@flask_app.route("/toggle_forward", methods=["POST"])
-def toggle_forward():
-    if not require_login():
-        return redirect(url_for("admin_login"))
-    s = load_settings()
-    s["auto_forward"] = not bool(s.get("auto_forward", False))
-    save_settings(s)
-    logger.info("Auto-forward set to %s by admin", s["auto_forward"])
-    return redirect(url_for("admin_login"))
-
-@flask_app.route("/")
-def home():
-    return "✅ Sara bot Flask server running."
-
-@flask_app.route("/movies")
-def get_movies():
-    data = load_movies_local()
-    return {"count": len(data), "movies": data}
+# hits/misses cached per normalized title, persisted across restarts
+poster_cache = PosterCache(fetch_poster_omdb, path=POSTER_CACHE_PATH,
+                           hit_ttl=POSTER_HIT_TTL, miss_ttl=POSTER_MISS_TTL)
 
 # -------------------------
 # Bot handlers
@@ -531,9 +349,11 @@ conversation_triggers = [
     ("kya kar rahi ho", "Bas aapके लिए movies search कर रही हूँ."),
 ]
 
-user_message_history = {}
+# (chat, normalized query) pairs answered recently, for duplicate suppression in groups
+recent_requests = RecentRequests(window=GROUP_DUPLICATE_WINDOW)
 
 @app.on_message(filters.command("start"))
+@instrumented
 async def start(client, message):
     user = message.from_user.first_name or "User"
     try:
@@ -558,6 +378,7 @@ async def start(client, message):
     )
 
 @app.on_message((filters.document | filters.video) & filters.private)
+@instrumented
 async def handle_file(client, message: Message):
     try:
         title = message.caption or "Untitled Movie"
@@ -575,7 +396,7 @@ async def handle_file(client, message: Message):
         if settings.get("auto_forward"):
             try:
                 forwarded = await message.forward(CHANNEL_ID)
-                msg_id_to_save = forwarded.message_id
+                msg_id_to_save = message_id(forwarded)
                 file_url = ""
                 logger.info("Forwarded message to channel id=%s msg_id=%s", CHANNEL_ID, msg_id_to_save)
             except Exception:
@@ -594,72 +415,249 @@ async def handle_file(client, message: Message):
         logger.exception("handle_file error")
         await message.reply_text("❌ Error while saving movie. Check logs.")
 
+# -------------------------
+# Channel posts -> catalog
+# -------------------------
+channel_indexer = ChannelIndexer(catalog, on_commit=lambda added, updated: github_sync.mark_dirty(),
+                                 flush_interval=CHANNEL_INDEX_INTERVAL)
+
+@app.on_message(filters.chat(CHANNEL_ID) & filters.channel)
+@instrumented
+async def handle_channel_post(client, message: Message):
+    if not CHANNEL_AUTO_INDEX:
+        return
+    try:
+        await channel_indexer.submit(message)
+    except Exception:
+        logger.exception("channel post indexing failed")
+
 # -------------------------
 # SEND HELPERS
 # -------------------------
+# all result sends go through here: per-chat + global token buckets, FloodWait aware
+delivery = DeliveryScheduler(global_rate=DELIVERY_GLOBAL_RATE, chat_rate=DELIVERY_CHAT_RATE,
+                             group_rate=DELIVERY_GROUP_RATE_PER_MIN / 60.0,
+                             global_flood_chats=DELIVERY_GLOBAL_FLOOD_CHATS)
+
+# Telegram caption / message text limits
+PHOTO_CAPTION_LIMIT = 1024
+MESSAGE_TEXT_LIMIT = 4096
+
+# ranked result sets of recent searches, by query id (callback data of the page buttons)
+result_pages = TTLCache(max_size=RESULT_PAGES_MAX, ttl=RESULT_PAGES_TTL)
+
+def reraise_flood_wait(e: Exception):
+    # FloodWait must reach the delivery scheduler, not a fallback send
+    if flood_wait_seconds(e) is not None:
+        raise e
+
 async def send_movie_entry(client: Client, chat_id: int, entry: Dict):
     title = entry.get("title", "Movie")
     sent = False
     if int(entry.get("msg_id", 0)) > 0:
         try:
-            await client.forward_messages(chat_id, CHANNEL_ID, entry["msg_id"])
+            with TELEGRAM_SEND_SECONDS.time(method="forward"):
+                await client.forward_messages(chat_id, CHANNEL_ID, entry["msg_id"])
             sent = True
-        except Exception:
+        except Exception as e:
+            reraise_flood_wait(e)
             logger.exception("forward by msg_id failed")
-    if not sent and entry.get("file_url"):
+    file_url = entry.get("file_url") or ""
+    file_id = cached_file_id(entry) if is_http_url(file_url) else ""
+    if not sent and file_id:
+        # already uploaded once: Telegram serves it from its own storage
         try:
-            await client.send_document(chat_id, entry["file_url"], caption=f"🎬 {title}")
+            with TELEGRAM_SEND_SECONDS.time(method="document_cached"):
+                await client.send_document(chat_id, file_id, caption=f"🎬 {title}")
             sent = True
-        except Exception:
+        except Exception as e:
+            reraise_flood_wait(e)
+            logger.exception("send by cached file_id failed, falling back to URL")
+            remember_file_id(file_url, "")
+    if not sent and file_url:
+        try:
+            with TELEGRAM_SEND_SECONDS.time(method="document_url"):
+                msg = await client.send_document(chat_id, file_url, caption=f"🎬 {title}")
+            sent = True
+            if is_http_url(file_url):
+                file_id = media_file_id(msg)
+                if file_id:
+                    remember_file_id(file_url, file_id)
+        except Exception as e:
+            reraise_flood_wait(e)
             logger.exception("send_document failed")
             try:
-                await client.send_message(chat_id, f"🎬 {title}\n➡️ {entry['file_url']}")
+                with TELEGRAM_SEND_SECONDS.time(method="message"):
+                    await client.send_message(chat_id, f"🎬 {title}\n➡️ {entry['file_url']}")
                 sent = True
-            except Exception:
+            except Exception as e:
+                reraise_flood_wait(e)
                 logger.exception("send_message fallback failed")
     return sent
 
-async def send_group_of_movies_with_poster(client: Client, chat_id: int, group: List[Dict], query_title: str):
+def album_file_ref(entry: Dict) -> str:
+    # Telegram-side file reference usable in an album, "" if the entry needs a URL upload
+    if int(entry.get("msg_id", 0)) > 0:
+        return ""
+    file_url = entry.get("file_url") or ""
+    if is_http_url(file_url):
+        return cached_file_id(entry)
+    return file_url
+
+def send_one_by_one(client: Client, chat_id: int, entries: List[Dict]):
+    # fallback for a failed batch: one delivery job per entry, so each send
+    # waits for the buckets; queued first to keep the chat's order
+    for e in reversed(entries):
+        fut = delivery.submit(chat_id, lambda e=e: send_movie_entry(client, chat_id, e), label="file", first=True)
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+async def forward_movie_batch(client: Client, chat_id: int, entries: List[Dict]):
+    try:
+        with TELEGRAM_SEND_SECONDS.time(method="forward_batch"):
+            await client.forward_messages(chat_id, CHANNEL_ID, [int(e["msg_id"]) for e in entries])
+        return True
+    except Exception as e:
+        reraise_flood_wait(e)
+        logger.exception("batch forward failed, sending one by one")
+    send_one_by_one(client, chat_id, entries)
+    return True
+
+async def send_movie_album(client: Client, chat_id: int, entries: List[Dict]):
+    media = [InputMediaDocument(album_file_ref(e), caption=f"🎬 {e.get('title', 'Movie')}") for e in entries]
+    try:
+        with TELEGRAM_SEND_SECONDS.time(method="album"):
+            await client.send_media_group(chat_id, media)
+        return True
+    except Exception as e:
+        reraise_flood_wait(e)
+        logger.exception("send_media_group failed, sending one by one")
+    send_one_by_one(client, chat_id, entries)
+    return True
+
+def chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def unique_entries(entries: List[Dict]) -> List[Dict]:
+    # same channel post / same file only once, first (best ranked) wins
+    seen: Set[Tuple[int,str]] = set()
+    out: List[Dict] = []
+    for e in entries:
+        key = (int(e.get("msg_id",0)), e.get("file_url",""))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(e)
+    return out
+
+def fit_caption(lines: List[str], limit: int) -> str:
+    # Telegram rejects longer captions; drop trailing lines instead of failing
+    caption = "\n".join(lines)
+    if len(caption) <= limit:
+        return caption
+    more = "\n…"
+    while len(lines) > 1 and len("\n".join(lines)) + len(more) > limit:
+        lines = lines[:-1]
+    return ("\n".join(lines) + more)[:limit]
+
+async def send_group_of_movies_with_poster(client: Client, chat_id: int, group: List[Dict], query_title: str,
+                                           start: int = 1, footer: str = "", reply_markup=None,
+                                           with_poster: bool = True):
+    """Queue the caption and the files for ``chat_id``; returns the delivery futures.
+
+    ``start`` is the number of the first entry in the caption and ``footer`` /
+    ``reply_markup`` are attached to the caption message (used for paging).
+    """
     if not group:
-        return
+        return []
 
     poster_url = ""
     try:
-        poster_url = get_poster_url_omdb(query_title or group[0].get("title",""))
+        if OMDB_API_KEY and with_poster:
+            poster_url = await poster_cache.get(query_title or group[0].get("title",""))
     except Exception:
         logger.exception("poster fetch failed")
 
     cap_lines = [f"🎬 Matches for: {query_title}"]
-    for i, g in enumerate(group, 1):
+    for i, g in enumerate(group, start):
         fn = g.get("filename") or g.get("title") or f"Part {i}"
         link = g.get("file_url") or ""
         if link:
             cap_lines.append(f"{i}. {fn} — {link}")
         else:
             cap_lines.append(f"{i}. {fn}")
-    caption = "\n".join(cap_lines)
+    if footer:
+        cap_lines.append(footer)
 
-    if poster_url:
-        try:
-            await client.send_photo(chat_id, poster_url, caption=caption)
-        except Exception:
-            await client.send_message(chat_id, f"{caption}\n\nPoster: {poster_url}")
-    else:
-        await client.send_message(chat_id, caption)
-
-    seen: Set[Tuple[int,str]] = set()
-    for e in group:
-        key = (int(e.get("msg_id",0)), e.get("file_url",""))
-        if key in seen:
+    async def send_caption():
+        if poster_url:
+            caption = fit_caption(list(cap_lines), PHOTO_CAPTION_LIMIT)
+            try:
+                return await client.send_photo(chat_id, poster_url, caption=caption, reply_markup=reply_markup)
+            except Exception as e:
+                reraise_flood_wait(e)
+                return await client.send_message(chat_id, fit_caption(cap_lines + ["", f"Poster: {poster_url}"], MESSAGE_TEXT_LIMIT),
+                                                 reply_markup=reply_markup)
+        return await client.send_message(chat_id, fit_caption(list(cap_lines), MESSAGE_TEXT_LIMIT), reply_markup=reply_markup)
+
+    futures = [delivery.submit(chat_id, send_caption, label="caption")]
+
+    forwards: List[Dict] = []
+    album: List[Dict] = []
+    singles: List[Dict] = []
+    for e in unique_entries(group):
+        if int(e.get("msg_id",0)) > 0:
+            forwards.append(e)
+        elif album_file_ref(e):
+            album.append(e)
+        else:
+            singles.append(e)
+
+    # channel posts: one forward call per 100, cached files: albums of up to 10
+    for batch in chunks(forwards, 100):
+        futures.append(delivery.submit(chat_id, lambda b=batch: forward_movie_batch(client, chat_id, b),
+                                       cost=len(batch), label="forward"))
+    for batch in chunks(album, 10):
+        if len(batch) == 1:
+            singles.append(batch[0])
             continue
-        seen.add(key)
-        await send_movie_entry(client, chat_id, e)
-        await asyncio.sleep(0.4)
+        futures.append(delivery.submit(chat_id, lambda b=batch: send_movie_album(client, chat_id, b),
+                                       cost=len(batch), label="album"))
+    for e in singles:
+        futures.append(delivery.submit(chat_id, lambda e=e: send_movie_entry(client, chat_id, e), label="file"))
+    for fut in futures:
+        # failures are already logged by the scheduler
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+    return futures
 
 # -------------------------
 # Text handler
 # -------------------------
+async def find_matches(qkey: str):
+    """Ranked matches for the normalized query ``qkey``, grouped into series.
+
+    Served from the query cache or one shared search. The search runs on
+    ``qkey`` itself, so queries sharing a cache entry get the same answer no
+    matter which of them came first.
+    """
+    version = catalog.version
+    result = query_cache.get(qkey, version)
+    if result is not None:
+        return result
+
+    async def search():
+        started = time.perf_counter()
+        result = await search_pool.match(qkey)
+        SEARCH_SECONDS.observe(time.perf_counter() - started, tier=result.tier)
+        # SEARCH_MAX_RESULTS holds after whole series are pulled in, too
+        grouped = series_index.group(result.matches, limit=SEARCH_MAX_RESULTS)
+        result = MatchResult(result.tier, grouped, result.truncated)
+        query_cache.set(qkey, version, result)
+        return result
+
+    return await search_flights.do((qkey, version), search)
+
 @app.on_message(filters.text & (filters.private | filters.group))
+@instrumented
 async def handle_text(client, message: Message):
     if not message.from_user or message.from_user.is_bot:
         return
@@ -682,24 +680,115 @@ async def handle_text(client, message: Message):
     if len(lt) < 3:
         return  # ignore very short messages
 
-    data = load_movies_local()
+    data = catalog.snapshot().movies
     if not data:
         await message.reply_text("😔 अभी मूवी database खाली है।")
         return
 
-    matches: List[Dict] = []
-    for m in data:
-        title = m.get("title", "")
-        if not title:
-            continue
-        if len(lt) >= 3 and (lt in title.lower() or fuzz.token_set_ratio(lt, title.lower()) >= 70):
-            matches.append(m)
+    qkey = normalize_title(lt)
+    is_group = chat_id < 0
+    if is_group and not recent_requests.mark(chat_id, qkey):
+        # everyone in the group can already see the earlier answer
+        logger.info("Duplicate request %r in chat %s from user %s, skipped", text, chat_id, user_id)
+        return
+
+    try:
+        result = await find_matches(qkey)
+    except SearchBusy:
+        logger.warning("Search queue full, dropping query %r", text)
+        if is_group:
+            recent_requests.forget(chat_id, qkey)
+        await message.reply_text("⏳ अभी बहुत सारी searches चल रही हैं, थोड़ी देर बाद try करें।")
+        return
+    except asyncio.TimeoutError:
+        logger.warning("Search timed out for %r", text)
+        if is_group:
+            recent_requests.forget(chat_id, qkey)
+        await message.reply_text("⏳ Search में ज़्यादा समय लग गया, थोड़ा अलग नाम try करें।")
+        return
+    matches: List[Dict] = result.entries
+    logger.info("Search %r -> tier=%s matches=%d truncated=%s", text, result.tier, len(matches), result.truncated)
+    SEARCHES.inc(tier=result.tier)
+    SEARCH_MATCHES.inc(len(matches))
 
     if not matches:
         await message.reply_text("😔 कोई मूवी नहीं मिली।")
         return
 
-    await send_group_of_movies_with_poster(client, chat_id, matches, text)
+    # best series first, each in part/episode order; the rest stay in
+    # result_pages for the Next button
+    matches = unique_entries(matches)
+    qid = secrets.token_hex(4)
+    result_pages.set(qid, {"chat_id": chat_id, "query": text, "entries": matches})
+    await send_results_page(client, chat_id, qid, 0)
+
+# -------------------------
+# Result paging
+# -------------------------
+def page_count(total: int) -> int:
+    return max(1, (total + RESULTS_PAGE_SIZE - 1) // RESULTS_PAGE_SIZE)
+
+def page_keyboard(qid: str, page: int, pages: int):
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"pg:{qid}:{page - 1}"))
+    if page + 1 < pages:
+        buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"pg:{qid}:{page + 1}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+async def send_results_page(client: Client, chat_id: int, qid: str, page: int) -> bool:
+    results = result_pages.get(qid)
+    if results is None:
+        return False
+    entries = results["entries"]
+    pages = page_count(len(entries))
+    page = min(max(page, 0), pages - 1)
+    first = page * RESULTS_PAGE_SIZE
+    footer = f"📄 Page {page + 1}/{pages} · {len(entries)} results" if pages > 1 else ""
+    await send_group_of_movies_with_poster(client, chat_id, entries[first:first + RESULTS_PAGE_SIZE], results["query"],
+                                           start=first + 1, footer=footer,
+                                           reply_markup=page_keyboard(qid, page, pages), with_poster=page == 0)
+    return True
+
+@app.on_callback_query(filters.regex(r"^pg:"))
+@instrumented
+async def handle_page(client, callback_query: CallbackQuery):
+    try:
+        _, qid, page = callback_query.data.split(":")
+        page = int(page)
+    except ValueError:
+        await callback_query.answer()
+        return
+    results = result_pages.get(qid)
+    message = callback_query.message
+    if results is None or message is None or results["chat_id"] != message.chat.id:
+        await callback_query.answer("⌛ ये results पुराने हो गए, movie का नाम फिर से भेजें।", show_alert=True)
+        return
+    await callback_query.answer()
+    try:
+        # one page per button press: drop the keyboard of the page just used
+        await message.edit_reply_markup(None)
+    except Exception:
+        logger.debug("could not clear page keyboard", exc_info=True)
+    await send_results_page(client, message.chat.id, qid, page)
+
+# -------------------------
+# Flask app (web.py) on this process's catalog and caches
+# -------------------------
+def cache_stats() -> Dict:
+    return {
+        "queries": query_cache.stats(),
+        "search_flights": search_flights.stats(),
+        "recent_requests": recent_requests.stats(),
+        "result_pages": result_pages.stats(),
+        "posters": poster_cache.stats(),
+        "file_ids": file_ids.stats(),
+        "series": series_index.stats(),
+        "spell": spell_index.stats() if spell_index is not None else None,
+    }
+
+web.bind(catalog, sync=github_sync, http=http_client, index=search_index, stats=cache_stats)
+
 # -------------------------
 # Run Flask and bot
 # -------------------------
@@ -707,10 +796,42 @@ def run_flask():
     port = int(os.environ.get("PORT", 8080))
     flask_app.run(host="0.0.0.0", port=port, use_reloader=False)
 
+def follow_catalog():
+    # WEB_SERVER=gunicorn: pick up admin edits made in the web workers (and
+    # queue their GitHub upload) even while nobody is searching
+    while True:
+        time.sleep(CATALOG_RELOAD_INTERVAL)
+        try:
+            catalog.snapshot()
+        except Exception:
+            logger.exception("catalog follow error")
+
 if __name__ == "__main__":
-    if not os.path.exists(SETTINGS_PATH):
+    if not os.path.exists(web.SETTINGS_PATH):
         save_settings({"auto_forward": False})
-    t = threading.Thread(target=run_flask, daemon=True)
-    t.start()
-    logger.info("Flask thread started")
+    if WEB_SERVER == "gunicorn":
+        threading.Thread(target=follow_catalog, name="catalog-follow", daemon=True).start()
+        if METRICS_PORT:
+            metrics.start_http_server(METRICS_PORT, token=web.METRICS_TOKEN)
+            logger.info("Metrics on :%d/metrics", METRICS_PORT)
+    else:
+        t = threading.Thread(target=run_flask, daemon=True)
+        t.start()
+        logger.info("Flask thread started")
+    github_sync.start()
+    search_pool.warm()
+    app.loop.create_task(metrics.watch_loop_lag(LOOP_LAG))
     app.run()
+    search_pool.shutdown()
+    file_ids.save()
+    # channel posts still waiting for their batch commit
+    channel_indexer.drain()
+    if spell_index is not None and spell_index.dirty:
+        spell_index.save()
+    # push changes still waiting in the debounce window
+    github_sync.stop(flush=True)
+    if CATALOG_STORAGE == "journal":
+        # leave a complete movie_list.json behind
+        catalog.compact()
+    catalog.close()
+    http_client.close()
@@ -0,0 +1,164 @@
+# cache.py
+# Small in-process caches used by the bot.
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU mapping whose items expire ``ttl`` seconds after being set."""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": round(self.hits / total, 3) if total else 0.0}
+
+
+class QueryCache:
+    """Search results by normalized query, valid for one catalog version.
+
+    Results are stored together with the catalog version they were computed
+    against; the first lookup with a newer version drops everything, so an
+    add or edit can never serve stale matches.
+    """
+
+    def __init__(self, max_size: int = 500, ttl: float = 300.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._version: Optional[int] = None
+        self.invalidations = 0
+
+    def _check_version(self, version: int):
+        if version != self._version:
+            if self._version is not None and len(self._cache):
+                self.invalidations += 1
+            self._cache.clear()
+            self._version = version
+
+    def get(self, key: str, version: int) -> Any:
+        self._check_version(version)
+        return self._cache.get(key)
+
+    def set(self, key: str, version: int, value: Any):
+        # a result computed against an older version is not worth keeping
+        if version != self._version:
+            return
+        self._cache.set(key, value)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update(version=self._version, invalidations=self.invalidations)
+        return stats
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first caller of ``do(key, fn)`` runs ``fn()``; callers arriving while
+    it is in flight wait for that result (or exception) instead of running
+    their own. Nothing is kept once the call has finished.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.shared += 1
+            # shield: a waiter giving up must not cancel the call for the others
+            return await asyncio.shield(fut)
+        self.calls += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            # retrieved here so an unshared failure is not reported as unhandled
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": len(self._inflight), "calls": self.calls, "shared": self.shared}
+
+
+class RecentRequests:
+    """Remembers (chat, request) pairs for ``window`` seconds, at most ``max_size``."""
+
+    def __init__(self, window: float = 30.0, max_size: int = 10000):
+        self._seen = TTLCache(max_size=max_size, ttl=window)
+        self.suppressed = 0
+
+    def mark(self, chat_id: int, key: Hashable) -> bool:
+        """Record a request; False if the same one was already made within the window."""
+        if self._seen.get((chat_id, key)) is not None:
+            self.suppressed += 1
+            return False
+        self._seen.set((chat_id, key), time.time())
+        return True
+
+    def forget(self, chat_id: int, key: Hashable):
+        self._seen.pop((chat_id, key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._seen), "suppressed": self.suppressed}
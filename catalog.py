@@ -0,0 +1,537 @@
+# catalog.py
+# Process-wide in-memory movie catalog.
+#
+# movie_list.json is read once and kept in memory as an immutable snapshot.
+# Every write made through the bot (add_movie_to_json, admin routes) bumps
+# the catalog version; external edits of the file are picked up by
+# comparing its mtime/size. How changes reach the disk is up to the
+# storage backend (see storage.py).
+#
+# Several processes (the bot and gunicorn workers serving the Flask app) can
+# share one catalog through the storage backend plus a ``SharedVersion``:
+# writers change the storage under its file lock and publish the new
+# version, readers see the published number move and reload.
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+from contextlib import contextmanager
+from collections import deque
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import metrics
+from storage import JsonFileStorage
+
+try:
+    import fcntl
+except ImportError:  # not POSIX; SharedVersion is unavailable
+    fcntl = None
+
+logger = logging.getLogger("sara_bot")
+
+LOAD_SECONDS = metrics.histogram("sara_catalog_load_seconds", "Catalog reloads from storage (parse + reindex)")
+
+# how many per-movie changes changes_since() can look back over
+CHANGELOG_SIZE = 10000
+
+# change events passed to listeners: (event, key, entry)
+#   "add"    - entry appended under a new key
+#   "update" - entry under key replaced
+#   "delete" - entry under key removed (entry is the removed one)
+#   "reset"  - whole catalog replaced, key/entry are None
+Listener = Callable[[str, Optional[int], Optional[Dict]], None]
+
+
+class PersistError(Exception):
+    """The storage refused a change; the catalog was left as it was before it."""
+
+
+class SharedVersion:
+    """Catalog version shared by every process using the same storage.
+
+    The number lives in an 8-byte memory-mapped file, so readers can compare
+    it with the version they loaded on every request for the cost of a
+    memory read. ``lock()`` is an exclusive ``flock`` on the same file;
+    writers hold it while they change the storage and ``publish()`` the new
+    version. The lock nests within a process (the caller serializes threads).
+    """
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("a shared catalog needs fcntl (POSIX)")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < 8:
+            # a second process truncating too just writes the same zeros
+            os.ftruncate(self._fd, 8)
+        self._mm = mmap.mmap(self._fd, 8)
+        self._depth = 0
+
+    def read(self) -> int:
+        return struct.unpack_from("<q", self._mm, 0)[0]
+
+    def publish(self, version: int):
+        struct.pack_into("<q", self._mm, 0, version)
+
+    @contextmanager
+    def lock(self):
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+class CatalogSnapshot(NamedTuple):
+    version: int
+    movies: Tuple[Dict, ...]
+    # id of every movie, parallel to ``movies``
+    keys: Tuple[int, ...] = ()
+
+
+class Catalog:
+    """Thread-safe holder of the movie list.
+
+    Readers call ``snapshot()`` and get a ``CatalogSnapshot`` whose ``movies``
+    tuple must be treated as read-only. Writers either use the targeted
+    ``add``/``extend``/``update``/``delete`` methods (``write_batch`` for
+    several adds and updates in one persist), or take a private copy with
+    ``load()`` and hand the whole list back to ``save()``.
+
+    Every movie carries a stable integer ``id`` (its key here). Entries
+    without one get ``max id + 1`` in list order, so sorting by key gives the
+    order of movie_list.json.
+
+    With ``shared`` (a ``SharedVersion``) the catalog follows writes made by
+    other processes: ``snapshot()`` reloads as soon as the published version
+    moves, and the reload is diffed against the old entries so listeners and
+    ``changes_since()`` see per-movie changes under the writer's version.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 1.0, storage=None,
+                 changelog_size: int = CHANGELOG_SIZE, shared: Optional[SharedVersion] = None):
+        self.path = path
+        self.storage = storage or JsonFileStorage(path)
+        # how often (seconds) snapshot() may stat() the file for external edits
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._entries: Dict[int, Dict] = {}
+        # file_url -> keys of the entries with it, for O(1) lookups of
+        # URL-based entries (a set, so deleting one of two entries sharing a
+        # URL keeps the other findable)
+        self._by_url: Dict[str, Set[int]] = {}
+        # channel msg_id -> keys, same idea
+        self._by_msg: Dict[int, Set[int]] = {}
+        self._next_key = 1
+        # start from the clock so versions keep growing across restarts and
+        # a client's old version is never mistaken for a current one
+        self._version = int(time.time() * 1000)
+        self.modified_at = time.time()
+        # (version, key) of recent add/update/delete; versions <= _log_floor
+        # can no longer be answered with a delta
+        self._changelog: deque = deque(maxlen=changelog_size)
+        self._log_floor = self._version
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._file_sig: Optional[Tuple[int, int]] = None
+        self._loaded = False
+        self._last_check = 0.0
+        self._listeners: List[Listener] = []
+        self.shared = shared
+        # shared version this process last loaded or published
+        self._seen_shared = 0
+        self._remote_listeners: List[Callable[[], None]] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def subscribe(self, listener: Listener):
+        """Call ``listener(event, key, entry)`` after every change."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def on_remote_change(self, fn: Callable[[], None]):
+        """Call ``fn()`` after picking up a change another process made (shared catalogs only)."""
+        with self._lock:
+            self._remote_listeners.append(fn)
+
+    def _notify(self, event: str, key: Optional[int] = None, entry: Optional[Dict] = None):
+        for fn in self._listeners:
+            try:
+                fn(event, key, entry)
+            except Exception:
+                logger.exception("catalog listener failed")
+
+    # ---- disk ----
+    def _persist(self, changes=None) -> bool:
+        """Hand ``changes`` (or the whole catalog when None) to the storage."""
+        movies = lambda: list(self._entries.values())
+        if changes is None:
+            ok = self.storage.write_all(movies())
+        else:
+            ok = self.storage.record(changes, movies)
+        self._file_sig = self.storage.signature()
+        self._last_check = time.monotonic()
+        return ok
+
+    # ---- internal state ----
+    def _bump(self):
+        self._version += 1
+        self._snapshot = None
+        self.modified_at = time.time()
+
+    def _log_changes(self, keys: Iterable[int]):
+        for key in keys:
+            if len(self._changelog) == self._changelog.maxlen:
+                self._log_floor = max(self._log_floor, self._changelog[0][0])
+            self._changelog.append((self._version, key))
+
+    @staticmethod
+    def _msg_id(entry: Dict) -> int:
+        try:
+            return int(entry.get("msg_id") or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _index_entry(self, key: int, entry: Dict):
+        url = entry.get("file_url")
+        if url:
+            self._by_url.setdefault(url, set()).add(key)
+        msg_id = self._msg_id(entry)
+        if msg_id:
+            self._by_msg.setdefault(msg_id, set()).add(key)
+
+    def _unindex_entry(self, key: int, entry: Dict):
+        for index, value in ((self._by_url, entry.get("file_url")), (self._by_msg, self._msg_id(entry))):
+            keys = index.get(value) if value else None
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def _restore(self, old: Dict[int, Optional[Dict]]):
+        """Put back the entries in ``old`` (None = key was absent) after a refused persist."""
+        for key, entry in old.items():
+            cur = self._entries.pop(key, None)
+            if cur is not None:
+                self._unindex_entry(key, cur)
+            if entry is not None:
+                self._entries[key] = entry
+                self._index_entry(key, entry)
+
+    def _load_entries(self, movies: Iterable[Dict]) -> int:
+        """Replace all entries without touching the version; returns how many needed a new id."""
+        movies = [dict(m) for m in movies]
+        self._entries = {}
+        self._by_url = {}
+        self._by_msg = {}
+        ids = [m.get("id") for m in movies]
+        self._next_key = max([i for i in ids if isinstance(i, int) and i > 0] or [0]) + 1
+        assigned = 0
+        for m in movies:
+            key = m.get("id")
+            if not isinstance(key, int) or key <= 0 or key in self._entries:
+                key = m["id"] = self._next_key
+                self._next_key += 1
+                assigned += 1
+            self._entries[key] = m
+            self._index_entry(key, m)
+        return assigned
+
+    def _reset(self, movies: Iterable[Dict]) -> int:
+        """Replace all entries; returns how many needed a new id."""
+        assigned = self._load_entries(movies)
+        self._bump()
+        # a full replace is not expressible as a delta
+        self._changelog.clear()
+        self._log_floor = self._version
+        return assigned
+
+    @contextmanager
+    def _writing(self):
+        # caller holds self._lock; other processes are kept out of the
+        # storage and their last change is loaded before ours is applied
+        if self.shared is None:
+            yield
+            return
+        with self.shared.lock():
+            self._follow()
+            yield
+            if self._version != self._seen_shared:
+                self.shared.publish(self._version)
+                self._seen_shared = self._version
+
+    def _follow(self):
+        """Load what other processes wrote since our last look (shared catalogs)."""
+        events = []
+        with self.shared.lock():
+            version = self.shared.read()
+            sig = self.storage.signature()
+            if self._loaded and version == self._seen_shared and sig == self._file_sig:
+                return
+            started = time.perf_counter()
+            data = self.storage.load()
+            if data is None:
+                self._loaded = True
+                return
+            was_loaded = self._loaded
+            if version == self._seen_shared:
+                # first process on this storage, or the file was edited by
+                # hand: announce it under a new version
+                version = max(version, self._version) + 1
+                self.shared.publish(version)
+            old = self._entries
+            assigned = self._load_entries(data)
+            if assigned and self.storage.persist_ids:
+                self._persist()
+            self._version = version
+            self._seen_shared = version
+            self._snapshot = None
+            self.modified_at = time.time()
+            self._file_sig = self.storage.signature()
+            self._loaded = True
+            LOAD_SECONDS.observe(time.perf_counter() - started)
+            changed = [k for k in old.keys() | self._entries.keys() if old.get(k) != self._entries.get(k)]
+            if not was_loaded or len(changed) > max(100, len(self._entries) // 10):
+                self._changelog.clear()
+                self._log_floor = version
+                events.append(("reset", None, None))
+            else:
+                self._log_changes(changed)
+                for k in changed:
+                    entry = self._entries.get(k)
+                    if entry is None:
+                        events.append(("delete", k, old[k]))
+                    else:
+                        events.append(("add" if k not in old else "update", k, entry))
+        if was_loaded:
+            logger.info("Catalog follows version %s (%d movies changed)", version, len(changed))
+        for event in events:
+            self._notify(*event)
+        if was_loaded and changed:
+            for fn in self._remote_listeners:
+                try:
+                    fn()
+                except Exception:
+                    logger.exception("catalog remote-change listener failed")
+
+    def _refresh(self):
+        if self.shared is not None:
+            self._follow()
+            return
+        sig = self.storage.signature()
+        if self._loaded and sig == self._file_sig:
+            return
+        started = time.perf_counter()
+        data = self.storage.load()
+        if data is None:
+            # half-written or broken file: keep serving the old snapshot and
+            # try again on the next check
+            self._loaded = True
+            return
+        was_loaded = self._loaded
+        assigned = self._reset(data)
+        LOAD_SECONDS.observe(time.perf_counter() - started)
+        self._file_sig = sig
+        self._loaded = True
+        if assigned and self.storage.persist_ids:
+            # later journal records refer to these ids
+            self._persist()
+        if was_loaded:
+            logger.info("Catalog reloaded from disk (version=%s, %d movies)", self._version, len(data))
+        self._notify("reset")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._refresh()
+
+    # ---- readers ----
+    def snapshot(self) -> CatalogSnapshot:
+        now = time.monotonic()
+        snap = self._snapshot
+        moved = self.shared is not None and self.shared.read() != self._seen_shared
+        if snap is not None and self._loaded and not moved and now - self._last_check < self.reload_interval:
+            return snap
+        with self._lock:
+            if now - self._last_check >= self.reload_interval or not self._loaded or moved:
+                self._last_check = now
+                self._refresh()
+            if self._snapshot is None:
+                keys = tuple(self._entries)
+                self._snapshot = CatalogSnapshot(self._version, tuple(self._entries.values()), keys)
+            return self._snapshot
+
+    def items(self) -> List[Tuple[int, Dict]]:
+        snap = self.snapshot()
+        return list(zip(snap.keys, snap.movies))
+
+    def changes_since(self, version: int) -> Optional[Tuple[int, Dict[int, Optional[Dict]]]]:
+        """Movies added/changed/deleted after ``version``.
+
+        Returns ``(current_version, {key: entry or None if deleted})``, or
+        None when ``version`` is older than the change log reaches (or the
+        catalog was replaced since), so the caller needs a full copy.
+        """
+        self.snapshot()
+        with self._lock:
+            if version < self._log_floor or version > self._version:
+                return None
+            changed: Dict[int, Optional[Dict]] = {}
+            for v, key in reversed(self._changelog):
+                if v <= version:
+                    break
+                if key not in changed:
+                    changed[key] = self._entries.get(key)
+            return self._version, changed
+
+    def load(self) -> List[Dict]:
+        """Return a private, mutable copy of the movie list for writers."""
+        return [dict(m) for m in self.snapshot().movies]
+
+    # ---- writers ----
+    def save(self, movies: List[Dict]) -> bool:
+        """Replace the whole catalog with ``movies`` and persist it."""
+        with self._lock, self._writing():
+            # _load_entries() builds new dicts, so these stay untouched
+            before = (self._loaded, self._entries, self._by_url, self._by_msg, self._next_key,
+                      self._version, self.modified_at, self._snapshot, self._log_floor, list(self._changelog))
+            self._loaded = True
+            self._reset(movies)
+            if not self._persist():
+                # nothing changed: same entries, version and changelog, no
+                # listener call, and _writing() publishes nothing
+                (self._loaded, self._entries, self._by_url, self._by_msg, self._next_key,
+                 self._version, self.modified_at, self._snapshot, self._log_floor, changelog) = before
+                self._changelog.extend(changelog)
+                return False
+            self._notify("reset")
+            return True
+
+    def compact(self) -> bool:
+        """Write the whole catalog as a fresh snapshot (folds in any journal)."""
+        with self._lock, self._writing():
+            self._ensure_loaded()
+            return self._persist()
+
+    def close(self):
+        with self._lock:
+            self.storage.close()
+            if self.shared is not None:
+                self.shared.close()
+
+    def add(self, entry: Dict) -> int:
+        return self.extend([entry])[0]
+
+    def extend(self, entries: List[Dict]) -> List[int]:
+        """Append ``entries``, persist once and return their keys.
+
+        Raises ``PersistError`` (and adds nothing) if the storage refuses them.
+        """
+        return self.write_batch(entries)
+
+    def write_batch(self, adds: List[Dict] = (), updates: Optional[Dict[int, Dict]] = None) -> List[int]:
+        """Merge ``updates`` ({key: fields}) and append ``adds`` in one persist; returns the new keys.
+
+        Keys that are not in the catalog are skipped. Raises ``PersistError``
+        (and changes nothing) if the storage refuses the batch.
+        """
+        with self._lock, self._writing():
+            self._ensure_loaded()
+            first_key = self._next_key
+            # key -> entry before this batch (None = added by it)
+            old: Dict[int, Optional[Dict]] = {}
+            changes = []
+            for key, fields in (updates or {}).items():
+                cur = self._entries.get(key)
+                if cur is None:
+                    continue
+                new = dict(cur)
+                new.update(fields)
+                new["id"] = key
+                old[key] = cur
+                self._unindex_entry(key, cur)
+                self._entries[key] = new
+                self._index_entry(key, new)
+                changes.append(("update", key, new))
+            keys = []
+            for e in adds:
+                key = self._next_key
+                self._next_key += 1
+                self._entries[key] = dict(e, id=key)
+                self._index_entry(key, self._entries[key])
+                old[key] = None
+                changes.append(("add", key, self._entries[key]))
+                keys.append(key)
+            if not changes:
+                return keys
+            if not self._persist(changes):
+                self._restore(old)
+                self._next_key = first_key
+                raise PersistError(f"storage refused {len(keys)} new and {len(changes) - len(keys)} changed movies")
+            self._bump()
+            self._log_changes(key for _, key, _ in changes)
+            for event, key, entry in changes:
+                self._notify(event, key, entry)
+            return keys
+
+    def get(self, key: int) -> Optional[Dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._entries.get(key)
+
+    def key_for_url(self, file_url: str) -> Optional[int]:
+        with self._lock:
+            self._ensure_loaded()
+            keys = self._by_url.get(file_url)
+            # the oldest entry, as before when the first one won
+            return min(keys) if keys else None
+
+    def key_for_msg(self, msg_id: int) -> Optional[int]:
+        """Key of the (oldest) movie posted as channel message ``msg_id``."""
+        with self._lock:
+            self._ensure_loaded()
+            keys = self._by_msg.get(int(msg_id or 0))
+            return min(keys) if keys else None
+
+    def update(self, key: int, fields: Dict) -> Optional[Dict]:
+        """Merge ``fields`` into the movie under ``key``; returns the new entry.
+
+        Raises ``PersistError`` (and keeps the old entry) if the storage refuses it.
+        """
+        with self._lock:
+            self.write_batch(updates={key: fields})
+            return self._entries.get(key)
+
+    def delete(self, keys: Iterable[int]) -> List[Dict]:
+        """Remove the movies under ``keys``; returns the removed entries.
+
+        Raises ``PersistError`` (and removes nothing) if the storage refuses it.
+        """
+        with self._lock, self._writing():
+            self._ensure_loaded()
+            removed = []
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._unindex_entry(key, entry)
+                    removed.append((key, entry))
+            if not removed:
+                return []
+            if not self._persist([("delete", k, None) for k, _ in removed]):
+                self._restore(dict(removed))
+                raise PersistError(f"storage refused deleting {len(removed)} movies")
+            self._bump()
+            self._log_changes(k for k, _ in removed)
+            for key, entry in removed:
+                self._notify("delete", key, entry)
+            return [e for _, e in removed]
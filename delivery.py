@@ -0,0 +1,271 @@
+# delivery.py
+# Outbound Telegram send scheduler.
+#
+# Every outgoing send is a job queued per chat. A single dispatcher walks the
+# chats round-robin, so one chat with 50 results cannot starve the others,
+# and only starts a job when both the chat's and the global token bucket
+# allow it. A FloodWait from Telegram pauses that chat for the requested
+# time and the job is retried; other chats keep going. Only FloodWaits from
+# several chats in a short window (the bot-wide limit, not one chat's) pause
+# every chat.
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger("sara_bot")
+
+try:
+    from pyrogram.errors import FloodWait
+except ImportError:  # fake clients in tests/benchmarks
+    FloodWait = None
+
+
+def flood_wait_seconds(exc: BaseException) -> Optional[float]:
+    """Retry-after of a FloodWait error, None for any other exception."""
+    if (FloodWait is not None and isinstance(exc, FloodWait)) or type(exc).__name__ == "FloodWait":
+        value = getattr(exc, "value", None)
+        if value is None:
+            value = getattr(exc, "x", 0)  # pyrogram 1.x
+        try:
+            return float(value or 0)
+        except (TypeError, ValueError):
+            return 0.0
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until ``cost`` tokens are available (0 = now)."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        # jobs bigger than the bucket go through once it is full
+        need = min(cost, self.capacity)
+        if self.tokens >= need:
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    def take(self, cost: float = 1.0):
+        self._refill(time.monotonic())
+        # a job bigger than the bucket (an album) leaves at most one bucket of
+        # debt, so it can't hold the chat, or everyone on the global bucket,
+        # back for longer than an empty-to-full refill
+        self.tokens = max(self.tokens - cost, -self.capacity)
+
+    def drain(self):
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0)
+
+    @property
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("chat_id", "send", "cost", "future", "attempts", "label")
+
+    def __init__(self, chat_id: int, send: Callable[[], Awaitable], cost: float, future: asyncio.Future, label: str):
+        self.chat_id = chat_id
+        self.send = send
+        self.cost = cost
+        self.future = future
+        self.attempts = 0
+        self.label = label
+
+
+class DeliveryScheduler:
+    """Fair, rate-limited dispatcher for outgoing sends.
+
+    ``submit(chat_id, send, cost)`` queues ``send()`` (a coroutine factory)
+    and returns a future with its result. Jobs of one chat run strictly in
+    order, one at a time; different chats interleave.
+    """
+
+    def __init__(self, global_rate: float = 25.0, global_burst: float = 30.0,
+                 chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 group_rate: float = 20 / 60.0, group_burst: float = 5.0,
+                 max_inflight: int = 8, max_retries: int = 3,
+                 global_flood_chats: int = 3, global_flood_window: float = 5.0):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.max_inflight = max_inflight
+        self.max_retries = max_retries
+        # FloodWaits from this many chats within global_flood_window seconds
+        # pause all chats
+        self.global_flood_chats = global_flood_chats
+        self.global_flood_window = global_flood_window
+        self._recent_floods: Deque[Tuple[float, int]] = deque()
+        self._queues: Dict[int, Deque[_Job]] = {}
+        self._order: Deque[int] = deque()
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._paused_until: Dict[int, float] = {}
+        self._global_paused_until = 0.0
+        self._busy_chats = set()
+        self._inflight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self.global_pauses = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> Dict:
+        return {"queued": self.queued, "inflight": self._inflight, "chats": len(self._queues),
+                "sent": self.sent, "failed": self.failed, "flood_waits": self.flood_waits,
+                "global_pauses": self.global_pauses}
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        b = self._buckets.get(chat_id)
+        if b is None:
+            # negative ids are groups/channels, which Telegram limits harder
+            if chat_id < 0:
+                b = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                b = TokenBucket(self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = b
+        return b
+
+    def _prune_buckets(self):
+        for chat_id in [c for c, b in self._buckets.items() if c not in self._queues and b.full]:
+            del self._buckets[chat_id]
+
+    def submit(self, chat_id: int, send: Callable[[], Awaitable], cost: float = 1.0,
+               label: str = "send", first: bool = False) -> asyncio.Future:
+        """Queue ``send()`` for ``chat_id``; ``first`` puts it ahead of the chat's other jobs."""
+        loop = asyncio.get_running_loop()
+        job = _Job(chat_id, send, cost, loop.create_future(), label)
+        if len(self._buckets) > 1000:
+            self._prune_buckets()
+        q = self._queues.get(chat_id)
+        if q is None:
+            q = self._queues[chat_id] = deque()
+            self._order.append(chat_id)
+        if first:
+            q.appendleft(job)
+        else:
+            q.append(job)
+        self._ensure_running()
+        self._wakeup.set()
+        return job.future
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _pick(self, now: float):
+        """Next runnable job in round-robin order, else seconds to wait."""
+        wait = None
+        gwait = max(self._global_paused_until - now, 0.0)
+        for _ in range(len(self._order)):
+            chat_id = self._order[0]
+            self._order.rotate(-1)
+            if chat_id in self._busy_chats:
+                continue
+            job = self._queues[chat_id][0]
+            w = max(self._paused_until.get(chat_id, 0.0) - now,
+                    self._bucket(chat_id).wait_time(job.cost, now),
+                    gwait,
+                    self.global_bucket.wait_time(job.cost, now))
+            if w <= 0:
+                self._queues[chat_id].popleft()
+                return job, None
+            wait = w if wait is None else min(wait, w)
+        return None, wait
+
+    async def _dispatch(self):
+        while self._order:
+            if self._inflight >= self.max_inflight:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job, wait = self._pick(time.monotonic())
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait if wait is not None else None)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._bucket(job.chat_id).take(job.cost)
+            self.global_bucket.take(job.cost)
+            self._busy_chats.add(job.chat_id)
+            self._inflight += 1
+            asyncio.get_running_loop().create_task(self._run(job))
+
+    def _flood_chats(self, chat_id: int, now: float) -> int:
+        """Note a FloodWait in ``chat_id``; returns how many chats got one in the last window."""
+        recent = self._recent_floods
+        recent.append((now, chat_id))
+        while recent and now - recent[0][0] > self.global_flood_window:
+            recent.popleft()
+        return len({c for _, c in recent})
+
+    async def _run(self, job: _Job):
+        requeue = False
+        try:
+            job.attempts += 1
+            result = await job.send()
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            delay = flood_wait_seconds(e)
+            if delay is not None and job.attempts <= self.max_retries:
+                self.flood_waits += 1
+                now = time.monotonic()
+                until = now + delay
+                self._paused_until[job.chat_id] = max(self._paused_until.get(job.chat_id, 0.0), until)
+                # resume at the chat's rate, not with a burst
+                self._bucket(job.chat_id).drain()
+                chats = self._flood_chats(job.chat_id, now)
+                if chats >= self.global_flood_chats:
+                    self.global_pauses += 1
+                    self._global_paused_until = max(self._global_paused_until, until)
+                    logger.warning("FloodWait %.1fs on chat %s (%s), %d chats within %.0fs: pausing all sends",
+                                   delay, job.chat_id, job.label, chats, self.global_flood_window)
+                else:
+                    logger.warning("FloodWait %.1fs on chat %s (%s), retrying", delay, job.chat_id, job.label)
+                requeue = True
+            else:
+                self.failed += 1
+                logger.warning("Delivery of %s to chat %s failed: %r", job.label, job.chat_id, e)
+                if not job.future.done():
+                    job.future.set_exception(e)
+        finally:
+            self._inflight -= 1
+            self._busy_chats.discard(job.chat_id)
+            q = self._queues.get(job.chat_id)
+            if requeue:
+                if q is None:
+                    q = self._queues[job.chat_id] = deque()
+                    self._order.append(job.chat_id)
+                q.appendleft(job)
+            elif q is not None and not q:
+                # chat drained: forget its queue; keep the bucket only while it is refilling
+                del self._queues[job.chat_id]
+                self._order.remove(job.chat_id)
+                self._paused_until.pop(job.chat_id, None)
+                if self._bucket(job.chat_id).full:
+                    self._buckets.pop(job.chat_id, None)
+            if self._order:
+                self._ensure_running()
+            self._wakeup.set()
@@ -0,0 +1,151 @@
+# fake_github.py
+# Local stand-in for the GitHub contents API (GET/PUT one file per path),
+# enough for github_sync.py and updater.py to talk to.
+#
+#   python fake_github.py --port 8765
+#   GITHUB_API_URL=http://127.0.0.1:8765 GITHUB_TOKEN=x GITHUB_REPO=me/repo python bot.py
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from base64 import b64decode, b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+CONTENTS_RE = re.compile(r"^/repos/([^/]+/[^/]+)/contents/(.+)$")
+
+
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeGitHub:
+    """In-memory contents API served from a background thread.
+
+    ``latency`` delays every response; ``fail_next(n, status)`` makes the next
+    ``n`` requests fail, for exercising retries.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.files: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def puts(self) -> int:
+        return sum(1 for m, _ in self.requests if m == "PUT")
+
+    def content(self, repo: str, path: str) -> Optional[bytes]:
+        item = self.files.get((repo, path))
+        return item[0] if item else None
+
+    def fail_next(self, n: int = 1, status: int = 500):
+        with self._lock:
+            self._failures.extend([status] * n)
+
+    def start(self) -> "FakeGitHub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _begin(self) -> Optional[Tuple[str, str]]:
+                fake.requests.append((self.command, self.path))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    status = fake._failures.pop(0) if fake._failures else None
+                if status:
+                    self._reply(status, {"message": "injected failure"})
+                    return None
+                if not self.headers.get("Authorization"):
+                    self._reply(401, {"message": "Requires authentication"})
+                    return None
+                m = CONTENTS_RE.match(urlparse(self.path).path)
+                if not m:
+                    self._reply(404, {"message": "Not Found"})
+                    return None
+                return m.group(1), m.group(2)
+
+            def do_GET(self):
+                key = self._begin()
+                if key is None:
+                    return
+                item = fake.files.get(key)
+                if item is None:
+                    self._reply(404, {"message": "Not Found"})
+                    return
+                self._reply(200, {"path": key[1], "sha": item[1], "content": b64encode(item[0]).decode()})
+
+            def do_PUT(self):
+                key = self._begin()
+                if key is None:
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    current = fake.files.get(key)
+                    if current is not None and payload.get("sha") != current[1]:
+                        self._reply(409, {"message": f"{key[1]} does not match {payload.get('sha')}"})
+                        return
+                    if current is None and payload.get("sha"):
+                        self._reply(422, {"message": "sha was supplied for a new file"})
+                        return
+                    data = b64decode(payload.get("content", ""))
+                    sha = git_blob_sha(data)
+                    fake.files[key] = (data, sha)
+                self._reply(200 if current else 201, {"content": {"path": key[1], "sha": sha},
+                                                      "commit": {"message": payload.get("message", "")}})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the GitHub contents API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server = FakeGitHub(args.host, args.port, args.latency)
+    print(f"Fake GitHub API on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
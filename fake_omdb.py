@@ -0,0 +1,116 @@
+# fake_omdb.py
+# Local stand-in for the OMDb API (?t= title lookup and ?s= search), enough
+# for the poster lookups in bot.py.
+#
+#   python fake_omdb.py --port 8766 --latency 0.2
+#   OMDB_API_URL=http://127.0.0.1:8766/ OMDB_API_KEY=x python bot.py
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+
+class FakeOMDb:
+    """Answers every title lookup from a background thread.
+
+    One title in ``miss_every`` (chosen by a hash of the title, so the answer
+    is stable) has no poster, like OMDb's "N/A". ``latency`` delays every
+    response; ``fail_next(n, status)`` makes the next ``n`` requests fail.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, miss_every: int = 5):
+        self.latency = latency
+        self.miss_every = miss_every
+        self.requests: List[Tuple[str, str]] = []
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def fail_next(self, n: int = 1, status: int = 503):
+        with self._lock:
+            self._failures.extend([status] * n)
+
+    def poster(self, title: str) -> str:
+        if self.miss_every and zlib.crc32(title.lower().encode("utf-8")) % self.miss_every == 0:
+            return "N/A"
+        return f"{self.url}posters/{quote(title)}.jpg"
+
+    def start(self) -> "FakeOMDb":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-omdb", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                fake.requests.append((self.command, self.path))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    status = fake._failures.pop(0) if fake._failures else None
+                if status:
+                    self._reply(status, {"Response": "False", "Error": "injected failure"})
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                if not query.get("apikey"):
+                    self._reply(401, {"Response": "False", "Error": "No API key provided."})
+                    return
+                if "t" in query:
+                    title = query["t"][0]
+                    self._reply(200, {"Title": title, "Poster": fake.poster(title), "Response": "True"})
+                elif "s" in query:
+                    title = query["s"][0]
+                    poster = fake.poster(title + " (search)")
+                    self._reply(200, {"Search": [{"Title": title, "Poster": poster}], "Response": "True"})
+                else:
+                    self._reply(200, {"Response": "False", "Error": "Incorrect IMDb ID."})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OMDb API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server = FakeOMDb(args.host, args.port, args.latency)
+    print(f"Fake OMDb API on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,116 @@
+# fake_telegram.py
+# In-memory stand-in for the parts of pyrogram.Client the bot uses, so the
+# backfill indexer and the handlers can run without Telegram.
+#
+#   client = FakeClient(channel={101: fake_post(101, "Movie (2020)", "movie.mkv")})
+#   await client.get_messages(CHANNEL_ID, range(100, 110))
+import time
+import zlib
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+
+def fake_user(user_id: int = 1, first_name: str = "User") -> SimpleNamespace:
+    return SimpleNamespace(id=user_id, first_name=first_name, is_bot=False)
+
+
+def fake_document(file_name: str, file_id: Optional[str] = None) -> SimpleNamespace:
+    return SimpleNamespace(file_name=file_name, file_id=file_id or f"BQAC{zlib.crc32(file_name.encode()):010d}")
+
+
+def fake_message(msg_id: int, chat_id: int, text: Optional[str] = None, caption: Optional[str] = None,
+                 document=None, video=None, from_user=None, client=None) -> SimpleNamespace:
+    msg = SimpleNamespace(id=msg_id, chat=SimpleNamespace(id=chat_id), text=text, caption=caption,
+                          document=document, video=video, audio=None, animation=None,
+                          from_user=from_user, empty=False, date=time.time())
+
+    async def reply_text(text, **kwargs):
+        return await client.send_message(chat_id, text, **kwargs)
+
+    async def forward(to_chat_id, **kwargs):
+        return (await client.forward_messages(to_chat_id, chat_id, msg_id, **kwargs))[0]
+
+    async def edit_reply_markup(reply_markup=None):
+        client.sent.append(("edit_markup", chat_id, msg_id))
+        return msg
+    msg.reply_text = reply_text
+    msg.forward = forward
+    msg.edit_reply_markup = edit_reply_markup
+    return msg
+
+
+def fake_post(msg_id: int, caption: str, file_name: Optional[str] = None, chat_id: int = -1001) -> SimpleNamespace:
+    """A channel post: a document with a caption (or a text post without file_name)."""
+    doc = fake_document(file_name) if file_name else None
+    if doc is None:
+        return fake_message(msg_id, chat_id, text=caption)
+    return fake_message(msg_id, chat_id, caption=caption, document=doc)
+
+
+def fake_callback(data: str, message, from_user=None) -> SimpleNamespace:
+    """A button press on ``message``; answer() calls are kept in ``answers`` as (text, show_alert)."""
+    query = SimpleNamespace(data=data, message=message, from_user=from_user or fake_user(), answers=[])
+
+    async def answer(text=None, show_alert=False, **kwargs):
+        query.answers.append((text, show_alert))
+    query.answer = answer
+    return query
+
+
+def empty_message(msg_id: int) -> SimpleNamespace:
+    # what get_messages returns for deleted / never existing ids
+    return SimpleNamespace(id=msg_id, empty=True)
+
+
+class FakeClient:
+    """Records every send in ``sent`` as (method, chat_id, payload).
+
+    ``latency`` (seconds) is awaited in every call, like a network round trip.
+    """
+
+    def __init__(self, channel: Optional[Dict[int, SimpleNamespace]] = None, latency: float = 0.0):
+        self.channel = channel or {}
+        self.latency = latency
+        self.sent: List[tuple] = []
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    async def _call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _message(self, chat_id: int, **kwargs) -> SimpleNamespace:
+        return fake_message(next(self._ids), chat_id, client=self, **kwargs)
+
+    async def get_messages(self, chat_id: int, message_ids: Iterable[int]):
+        await self._call()
+        return [self.channel.get(i) or empty_message(i) for i in message_ids]
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await self._call()
+        self.sent.append(("message", chat_id, text))
+        return self._message(chat_id, text=text)
+
+    async def send_photo(self, chat_id: int, photo: str, caption: str = "", **kwargs):
+        await self._call()
+        self.sent.append(("photo", chat_id, photo))
+        return self._message(chat_id, caption=caption)
+
+    async def send_document(self, chat_id: int, document: str, caption: str = "", **kwargs):
+        await self._call()
+        self.sent.append(("document", chat_id, document))
+        return self._message(chat_id, caption=caption, document=fake_document(str(document)))
+
+    async def send_media_group(self, chat_id: int, media: list, **kwargs):
+        await self._call()
+        self.sent.append(("album", chat_id, len(media)))
+        return [self._message(chat_id) for _ in media]
+
+    async def forward_messages(self, chat_id: int, from_chat_id: int, message_ids, **kwargs):
+        await self._call()
+        ids = message_ids if isinstance(message_ids, list) else [message_ids]
+        self.sent.append(("forward", chat_id, list(ids)))
+        return [self._message(chat_id) for _ in ids]
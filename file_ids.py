@@ -0,0 +1,93 @@
+# file_ids.py
+# Telegram file_ids learned for URL entries, kept beside the catalog.
+#
+# The first send of a URL entry uploads the file; Telegram answers with a
+# file_id that later sends can reuse. Storing it in the catalog entry would
+# bump the catalog version on every first send (clearing the query cache,
+# changing the /movies ETag, shipping a delta to every search worker) and
+# rewrite movie_list.json on the event loop. Here it is a dict update; the
+# JSON file is written from the default executor, one write per burst.
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger("sara_bot")
+
+
+class FileIdCache:
+    """file_url -> file_id; "" marks a file_id Telegram no longer accepts."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._save_pending = False
+        self.dirty = False
+        self.saves = 0
+        self._load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def stats(self) -> Dict:
+        return {"size": len(self._ids), "saves": self.saves, "dirty": self.dirty}
+
+    # ---- disk ----
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._ids = {str(k): str(v) for k, v in json.load(f).items()}
+        except Exception:
+            logger.exception("file_id cache load error")
+
+    def save(self) -> bool:
+        with self._lock:
+            self._save_pending = False
+            if not self.path or not self.dirty:
+                return False
+            items = dict(self._ids)
+            self.dirty = False
+        with self._file_lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(items, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                logger.exception("file_id cache save error")
+                self.dirty = True
+                return False
+        self.saves += 1
+        return True
+
+    def _schedule_save(self):
+        with self._lock:
+            if self._save_pending or not self.path:
+                return
+            self._save_pending = True
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.save)
+        except RuntimeError:
+            # no event loop here (admin routes, scripts): write right away
+            self.save()
+
+    # ---- lookup ----
+    def get(self, file_url: str) -> Optional[str]:
+        """Learned file_id, "" if the last one failed, None if nothing learned."""
+        return self._ids.get(file_url) if file_url else None
+
+    def set(self, file_url: str, file_id: str):
+        if not file_url:
+            return
+        with self._lock:
+            if self._ids.get(file_url) == file_id:
+                return
+            self._ids[file_url] = file_id
+            self.dirty = True
+        self._schedule_save()
@@ -0,0 +1,220 @@
+# github_sync.py
+# Background upload of movie_list.json to GitHub.
+#
+# Writers only call mark_dirty(). A worker thread waits until no change has
+# arrived for `debounce` seconds (or `max_delay` has passed since the first
+# unsynced change) and then commits the current catalog once, so a burst of
+# edits becomes one commit. The blob SHA returned by each PUT is kept for the
+# next one; the contents API is only asked for the SHA again after a
+# conflict.
+import json
+import time
+import random
+import logging
+import threading
+from base64 import b64encode
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from http_client import HttpClient
+
+logger = logging.getLogger("sara_bot")
+
+SYNC_SECONDS = metrics.histogram("sara_github_sync_seconds", "GitHub uploads of movie_list.json", ("result",))
+
+
+class GitHubSync:
+    def __init__(self, token: Optional[str], repo: Optional[str], file_path: str,
+                 get_data: Callable[[], List[Dict]], branch: str = "main",
+                 api_url: str = "https://api.github.com", debounce: float = 10.0,
+                 max_delay: float = 60.0, backoff: float = 2.0, max_backoff: float = 300.0,
+                 timeout: float = 15.0, http: Optional[HttpClient] = None):
+        self.token = token
+        self.repo = repo
+        self.file_path = file_path
+        self.branch = branch
+        self.api_url = api_url.rstrip("/")
+        self.get_data = get_data
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.http = http or HttpClient(timeout=timeout)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._sha: Optional[str] = None
+        # monotonic time of the oldest / newest change not yet on GitHub
+        self._dirty_since: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._pending_changes = 0
+        self._failures = 0
+        # after a failed upload, no new attempt before this monotonic time
+        self._retry_at: Optional[float] = None
+        self._syncing = False
+        self.commits = 0
+        self.last_synced_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token and self.repo)
+
+    @property
+    def _contents_url(self) -> str:
+        return f"{self.api_url}/repos/{self.repo}/contents/{self.file_path}"
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"token {self.token}"}
+
+    # ---- writer side ----
+    def mark_dirty(self):
+        if not self.enabled:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_change = now
+            self._pending_changes += 1
+            self._cond.notify_all()
+        self.start()
+
+    def lag(self) -> float:
+        """Seconds the oldest unsynced change has been waiting (0 = in sync)."""
+        since = self._dirty_since
+        return 0.0 if since is None else time.monotonic() - since
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "lag_seconds": round(self.lag(), 3),
+            "pending_changes": self._pending_changes,
+            "commits": self.commits,
+            "failures": self._failures,
+            "last_synced_at": self.last_synced_at,
+            "last_error": self.last_error,
+        }
+
+    # ---- worker ----
+    def start(self):
+        if not self.enabled:
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="github-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 30.0):
+        if flush:
+            self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Sync now instead of waiting for the debounce window; True if in sync."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._dirty_since is not None:
+                self._last_change = self._dirty_since - self.debounce
+                self._retry_at = None
+                self._cond.notify_all()
+            while (self._dirty_since is not None or self._syncing) and self._thread and self._thread.is_alive():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+            return self._dirty_since is None
+
+    def _due_in(self, now: float) -> float:
+        quiet = self._last_change + self.debounce - now
+        hard = self._dirty_since + self.max_delay - now
+        due = min(quiet, hard)
+        if self._retry_at is not None:
+            due = max(due, self._retry_at - now)
+        return max(0.0, due)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and self._dirty_since is None:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                wait = self._due_in(time.monotonic())
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                # everything marked so far goes into this commit
+                batch = self._pending_changes
+                dirty_since = self._dirty_since
+                self._dirty_since = None
+                self._last_change = None
+                self._pending_changes = 0
+                self._syncing = True
+            ok = False
+            started = time.perf_counter()
+            try:
+                ok = self._upload(self.get_data())
+            except Exception as e:
+                logger.exception("GitHub sync error")
+                self.last_error = repr(e)
+            SYNC_SECONDS.observe(time.perf_counter() - started, result="ok" if ok else "error")
+            with self._cond:
+                self._syncing = False
+                if ok:
+                    self._failures = 0
+                    self._retry_at = None
+                    self.commits += 1
+                    self.last_synced_at = time.time()
+                    self.last_error = None
+                    logger.info("GitHub sync: committed %d change(s)", batch)
+                else:
+                    # put the batch back and retry after backoff
+                    self._failures += 1
+                    self._pending_changes += batch
+                    self._dirty_since = dirty_since if self._dirty_since is None else min(dirty_since, self._dirty_since)
+                    if self._last_change is None:
+                        self._last_change = dirty_since
+                    delay = min(self.max_backoff, self.backoff * (2 ** (self._failures - 1)))
+                    delay *= random.uniform(0.8, 1.2)
+                    self._retry_at = time.monotonic() + delay
+                    logger.warning("GitHub sync failed (%d in a row), retrying in %.1fs", self._failures, delay)
+                self._cond.notify_all()
+
+    # ---- GitHub contents API ----
+    def _fetch_sha(self) -> Optional[str]:
+        r = self.http.get(self._contents_url, headers=self._headers, params={"ref": self.branch})
+        if r.status_code == 200:
+            return r.json().get("sha")
+        if r.status_code == 404:
+            return None
+        raise RuntimeError(f"GitHub get SHA failed: {r.status_code} {r.text[:200]}")
+
+    def _upload(self, data: List[Dict]) -> bool:
+        content_str = json.dumps(data, indent=4, ensure_ascii=False)
+        content_b64 = b64encode(content_str.encode("utf-8")).decode("utf-8")
+        for attempt in (1, 2):
+            if self._sha is None:
+                self._sha = self._fetch_sha()
+            payload = {"message": "Update movie_list.json via bot", "content": content_b64, "branch": self.branch}
+            if self._sha:
+                payload["sha"] = self._sha
+            r = self.http.put(self._contents_url, json=payload, headers=self._headers)
+            if r.status_code in (200, 201):
+                self._sha = (r.json().get("content") or {}).get("sha")
+                return True
+            if r.status_code in (409, 422) and attempt == 1:
+                # someone else changed the file: refresh the SHA and try once more
+                logger.info("GitHub SHA conflict, refetching")
+                self._sha = None
+                continue
+            self.last_error = f"{r.status_code} {r.text[:300]}"
+            logger.warning("GitHub upload failed: %s", self.last_error)
+            return False
+        return False
@@ -0,0 +1,203 @@
+# http_client.py
+# One pooled HTTP client for OMDb, GitHub and the updater.
+#
+# Connections are kept alive in a requests.Session. Each host gets a
+# concurrency limit and a circuit breaker: after `breaker_threshold`
+# consecutive failures (connection errors, timeouts, 5xx) calls to that host
+# fail immediately with CircuitOpen for `breaker_reset` seconds, then one
+# trial call decides whether it closes again. Idempotent requests are
+# retried with jittered exponential backoff. `arequest()` runs the same
+# thing on a small thread pool so handlers never block the event loop.
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("sara_bot")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class CircuitOpen(requests.ConnectionError):
+    """Raised without calling the host while its circuit breaker is open."""
+
+
+class HostBusy(requests.Timeout):
+    """Raised when no per-host slot frees up within the request timeout."""
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                # let exactly one call through to probe the host
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release(self):
+        """The allowed call never reached the host; let another one probe it."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class _Host:
+    __slots__ = ("slots", "breaker", "requests", "failures", "rejected")
+
+    def __init__(self, limit: int, breaker: CircuitBreaker):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.breaker = breaker
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+
+class HttpClient:
+    def __init__(self, timeout: float = 10.0, connect_timeout: float = 3.05, retries: int = 2,
+                 backoff: float = 0.5, max_backoff: float = 8.0, per_host: int = 4,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES, async_workers: int = 8):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.retry_statuses = frozenset(retry_statuses)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(per_host, async_workers))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: Dict[str, _Host] = {}
+        self._hosts_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix="http")
+
+    def _host(self, url: str) -> _Host:
+        netloc = urlsplit(url).netloc
+        with self._hosts_lock:
+            host = self._hosts.get(netloc)
+            if host is None:
+                host = self._hosts[netloc] = _Host(self.per_host, CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+            return host
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """Blocking request; returns the last response or raises requests.RequestException."""
+        method = method.upper()
+        host = self._host(url)
+        netloc = urlsplit(url).netloc
+        kwargs.setdefault("timeout", (self.connect_timeout, self.timeout))
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            if not host.slots.acquire(timeout=self.timeout):
+                host.rejected += 1
+                raise HostBusy(f"no free connection slot for {netloc}")
+            if not host.breaker.allow():
+                host.slots.release()
+                host.rejected += 1
+                raise CircuitOpen(f"circuit open for {netloc}")
+            response = None
+            error = None
+            try:
+                host.requests += 1
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except Exception:
+                # bad URL / arguments: says nothing about the host
+                host.breaker.release()
+                raise
+            finally:
+                host.slots.release()
+
+            failed = error is not None or response.status_code >= 500
+            if failed:
+                host.failures += 1
+                host.breaker.record_failure()
+            else:
+                host.breaker.record_success()
+            retryable = error is not None or response.status_code in self.retry_statuses
+            if not retryable or attempt >= retries:
+                if error is not None:
+                    raise error
+                return response
+            delay = self._delay(attempt, response)
+            attempt += 1
+            logger.info("%s %s failed (%s), retry %d/%d in %.1fs", method, netloc,
+                        error.__class__.__name__ if error is not None else response.status_code,
+                        attempt, retries, delay)
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self.request(method, url, **kwargs))
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._hosts_lock:
+            hosts = list(self._hosts.items())
+        return {netloc: {"state": h.breaker.state, "requests": h.requests, "failures": h.failures,
+                         "rejected": h.rejected} for netloc, h in hosts}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,278 @@
+# importer.py
+# Streaming bulk import of movies into the catalog.
+#
+# Input is read line by line, so uploads of any size use constant memory:
+#   pipe   title | file_url | filename            (the admin "Bulk Add" format)
+#   csv    header with title,file_url,filename,msg_id (any order), or those
+#          columns positionally without a header
+#   jsonl  one {"title": ..., "file_url": ..., ...} object per line
+#   json   a movie_list.json-style array (read whole, not streamed)
+# Duplicates are detected with hash sets (msg_id, file_url, and normalized
+# title + filename) built once from the catalog and extended as rows are
+# accepted, so rows in the same upload are checked against each other too.
+# Accepted rows are committed with one Catalog.extend() per batch; a batch
+# the storage refuses is retried row by row and the refused rows reported.
+import io
+import csv
+import json
+import time
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from catalog import PersistError
+from textutils import normalize_title
+
+logger = logging.getLogger("sara_bot")
+
+FORMATS = ("pipe", "csv", "jsonl", "json")
+CSV_FIELDS = ("title", "file_url", "filename", "msg_id")
+# rows per Catalog.extend(); movie_list.json is rewritten whole on every
+# commit, so it gets fewer, bigger batches than the append-only backends
+BATCH_SIZES = {"json": 25000}
+DEFAULT_BATCH_SIZE = 5000
+
+
+class ImportReport:
+    def __init__(self, max_rejects: int = 1000):
+        self.max_rejects = max_rejects
+        self.lines = 0
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.batches = 0
+        self.seconds = 0.0
+        # (line number, reason, raw line) of the first max_rejects rejected rows
+        self.rejects: List[Tuple[int, str, str]] = []
+
+    def reject(self, line_no: int, reason: str, raw: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.invalid += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append((line_no, reason, raw[:300]))
+
+    @property
+    def rate(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict:
+        return {"lines": self.lines, "added": self.added, "duplicates": self.duplicates,
+                "invalid": self.invalid, "batches": self.batches, "seconds": round(self.seconds, 3),
+                "lines_per_second": round(self.rate), "rejects": self.rejects}
+
+
+def _msg_id(entry: Dict) -> int:
+    try:
+        return int(entry.get("msg_id", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class DedupIndex:
+    """Hash sets of what the catalog (plus rows accepted so far) already has."""
+
+    def __init__(self, movies: Iterable[Dict] = ()):
+        self.msg_ids = set()
+        self.file_urls = set()
+        self.titles = set()
+        for m in movies:
+            self.add(m)
+
+    @staticmethod
+    def _title_key(entry: Dict) -> Tuple[str, str, str]:
+        # parts of one movie share a title, so the filename is part of the key;
+        # without a filename only the link tells such rows apart
+        filename = (entry.get("filename") or "").strip().lower()
+        return normalize_title(entry.get("title", "")), filename, "" if filename else entry.get("file_url") or ""
+
+    def duplicate_of(self, entry: Dict) -> Optional[str]:
+        """Why ``entry`` is a duplicate, or None if it is new."""
+        msg_id = _msg_id(entry)
+        if msg_id > 0 and msg_id in self.msg_ids:
+            return f"duplicate msg_id {msg_id}"
+        file_url = entry.get("file_url") or ""
+        if file_url and file_url in self.file_urls:
+            return "duplicate file_url"
+        if self._title_key(entry) in self.titles:
+            return "duplicate title/filename"
+        return None
+
+    def add(self, entry: Dict):
+        msg_id = _msg_id(entry)
+        if msg_id > 0:
+            self.msg_ids.add(msg_id)
+        if entry.get("file_url"):
+            self.file_urls.add(entry["file_url"])
+        self.titles.add(self._title_key(entry))
+
+
+def detect_format(first_line: str, filename: str = "") -> str:
+    name = filename.lower()
+    line = first_line.lstrip("\ufeff").strip()
+    if line.startswith("["):
+        return "json"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    if line.startswith("{"):
+        return "jsonl"
+    if "|" in line:
+        return "pipe"
+    return "csv"
+
+
+def _peek(stream: TextIO) -> Tuple[str, Iterator[str]]:
+    """First non-empty line and an iterator that still yields it."""
+    skipped = []
+    for line in stream:
+        skipped.append(line)
+        if line.strip():
+            break
+
+    def rest():
+        yield from skipped
+        yield from stream
+    return (skipped[-1] if skipped else ""), rest()
+
+
+def _make_entry(title, file_url="", filename="", msg_id=0) -> Dict:
+    title = (title or "").strip()
+    if not title:
+        raise ValueError("missing title")
+    try:
+        msg_id = int(str(msg_id or 0).strip() or 0)
+    except ValueError:
+        raise ValueError(f"bad msg_id {msg_id!r}")
+    file_url = (file_url or "").strip()
+    if msg_id <= 0 and not file_url:
+        raise ValueError("needs file_url or msg_id")
+    return {"title": title, "filename": (filename or "").strip(), "file_url": file_url,
+            "msg_id": max(msg_id, 0)}
+
+
+def iter_records(stream: TextIO, fmt: str = "auto", filename: str = "") -> Iterator[Tuple[int, Optional[Dict], str, str]]:
+    """Yield ``(line_no, entry or None, error, raw)`` for every non-empty line."""
+    first, lines = _peek(stream)
+    if fmt == "auto":
+        fmt = detect_format(first, filename)
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format: {fmt}")
+
+    if fmt == "json":
+        text = "".join(lines).lstrip("\ufeff")
+        try:
+            items = json.loads(text) if text.strip() else []
+        except ValueError as e:
+            yield 1, None, f"invalid JSON: {e}", text[:300]
+            return
+        if not isinstance(items, list):
+            yield 1, None, "expected a JSON array", text[:300]
+            return
+        # "line" numbers are item numbers here
+        for item_no, obj in enumerate(items, 1):
+            raw = json.dumps(obj, ensure_ascii=False)
+            try:
+                if not isinstance(obj, dict):
+                    raise ValueError("not a JSON object")
+                yield item_no, _make_entry(obj.get("title"), obj.get("file_url"), obj.get("filename"), obj.get("msg_id")), "", raw
+            except ValueError as e:
+                yield item_no, None, str(e), raw
+        return
+
+    if fmt == "csv":
+        reader = csv.reader(lines)
+        header = None
+        for row in reader:
+            raw = ",".join(row)
+            if not any(c.strip() for c in row):
+                continue
+            if header is None:
+                cols = [c.strip().lstrip("\ufeff").lower() for c in row]
+                if "title" in cols:
+                    header = cols
+                    continue
+                header = list(CSV_FIELDS)
+            fields = dict(zip(header, row))
+            try:
+                yield reader.line_num, _make_entry(fields.get("title"), fields.get("file_url"),
+                                                   fields.get("filename"), fields.get("msg_id")), "", raw
+            except ValueError as e:
+                yield reader.line_num, None, str(e), raw
+        return
+
+    for line_no, line in enumerate(lines, 1):
+        raw = line.rstrip("\r\n")
+        if not raw.strip():
+            continue
+        try:
+            if fmt == "jsonl":
+                obj = json.loads(raw.lstrip("\ufeff"))
+                if not isinstance(obj, dict):
+                    raise ValueError("not a JSON object")
+                entry = _make_entry(obj.get("title"), obj.get("file_url"), obj.get("filename"), obj.get("msg_id"))
+            else:
+                parts = [p.strip() for p in raw.lstrip("\ufeff").split("|")]
+                if len(parts) < 2:
+                    raise ValueError("expected title | file_url | filename")
+                entry = _make_entry(parts[0], parts[1], parts[2] if len(parts) >= 3 else "")
+        except ValueError as e:
+            yield line_no, None, str(e), raw
+            continue
+        yield line_no, entry, "", raw
+
+
+def import_stream(catalog, stream: TextIO, fmt: str = "auto", filename: str = "",
+                  batch_size: Optional[int] = None, max_rejects: int = 1000, on_batch=None) -> ImportReport:
+    """Import ``stream`` into ``catalog``; ``on_batch(report)`` runs after each commit."""
+    if not batch_size:
+        batch_size = BATCH_SIZES.get(getattr(catalog.storage, "kind", ""), DEFAULT_BATCH_SIZE)
+    report = ImportReport(max_rejects)
+    started = time.perf_counter()
+    seen = DedupIndex(catalog.snapshot().movies)
+    # (line number, entry, raw line) waiting for the next commit
+    batch: List[Tuple[int, Dict, str]] = []
+
+    def commit():
+        if batch:
+            try:
+                catalog.extend([entry for _, entry, _ in batch])
+                report.added += len(batch)
+            except PersistError:
+                # the storage refused the batch: find the rows it objects to
+                logger.warning("Import: batch of %d refused by the storage, retrying row by row", len(batch))
+                for line_no, entry, raw in batch:
+                    try:
+                        catalog.add(entry)
+                        report.added += 1
+                    except PersistError:
+                        report.reject(line_no, "refused by the storage", raw)
+            report.batches += 1
+            batch.clear()
+            report.seconds = time.perf_counter() - started
+            if on_batch is not None:
+                on_batch(report)
+
+    for line_no, entry, error, raw in iter_records(stream, fmt, filename):
+        report.lines += 1
+        if entry is None:
+            report.reject(line_no, error, raw)
+            continue
+        reason = seen.duplicate_of(entry)
+        if reason:
+            report.reject(line_no, reason, raw, duplicate=True)
+            continue
+        seen.add(entry)
+        batch.append((line_no, entry, raw))
+        if len(batch) >= batch_size:
+            commit()
+    commit()
+    report.seconds = time.perf_counter() - started
+    logger.info("Import: %d lines, %d added, %d duplicates, %d invalid in %.2fs",
+                report.lines, report.added, report.duplicates, report.invalid, report.seconds)
+    return report
+
+
+def import_text(catalog, text: str, fmt: str = "auto", **kwargs) -> ImportReport:
+    return import_stream(catalog, io.StringIO(text), fmt, **kwargs)
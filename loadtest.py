@@ -0,0 +1,283 @@
+# loadtest.py
+# End-to-end load replay through the real bot handlers.
+#
+# A stream of updates (text searches in private chats and groups, files
+# sent to the bot) is dispatched into bot.handle_text / bot.handle_file with
+# at most `concurrency` handlers in flight. Telegram is a FakeClient;
+# OMDb and GitHub are local stub servers (fake_omdb.py, fake_github.py)
+# with configurable latency, so posters, GitHub sync and catalog writes all
+# take their real code paths. Measured:
+#   reply latency   update arrival -> first message sent back to that chat
+#   handler time    how long the handler coroutine itself ran
+#   loop lag        how late a 10 ms asyncio.sleep() wakes up, i.e. how long
+#                   something blocked the event loop
+#   msgs/s          updates handled per second of wall time
+#
+#   python loadtest.py --messages 2000 --concurrency 50
+#   python loadtest.py --omdb-latency 0.3 --github-latency 0.2 --unthrottled
+#   python loadtest.py --save-stream stream.jsonl      # record the synthetic stream
+#   python loadtest.py --stream stream.jsonl           # replay it (or a recorded one)
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import platform
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+from bench import git_commit, query_workload, synthetic_catalog, synthetic_titles
+from fake_github import FakeGitHub
+from fake_omdb import FakeOMDb
+from fake_telegram import FakeClient, fake_document, fake_message, fake_user
+
+logger = logging.getLogger("sara_bot")
+
+QUERY_MIX = (("exact", 0.4), ("partial", 0.3), ("typo", 0.2), ("miss", 0.1))
+
+
+# -------------------------
+# Update streams
+# -------------------------
+def synthetic_stream(movies: List[Dict], n: int, rate: float = 0.0, group_ratio: float = 0.2,
+                     file_ratio: float = 0.02, users: int = 500, groups: int = 10, seed: int = 3) -> List[Dict]:
+    """``n`` updates; ``rate`` > 0 spaces them as Poisson arrivals of ``rate`` per second."""
+    rng = random.Random(seed)
+    queries = {kind: query_workload(movies, n, kind, seed) for kind, _ in QUERY_MIX}
+    new_titles = synthetic_titles(max(1, int(n * file_ratio) + 1), seed + 7)
+    stream = []
+    at = 0.0
+    for i in range(n):
+        if rate > 0:
+            at += rng.expovariate(rate)
+        user_id = 1000 + rng.randrange(users)
+        if rng.random() < file_ratio:
+            title = new_titles[i % len(new_titles)]
+            stream.append({"at": round(at, 4), "kind": "file", "chat_id": user_id, "user_id": user_id,
+                           "caption": title, "file_name": f"{title.replace(' ', '.')}.{i}.mkv"})
+            continue
+        kind = rng.choices([k for k, _ in QUERY_MIX], [w for _, w in QUERY_MIX])[0]
+        chat_id = -1000000 - rng.randrange(groups) if rng.random() < group_ratio else user_id
+        stream.append({"at": round(at, 4), "kind": "text", "chat_id": chat_id, "user_id": user_id,
+                       "text": queries[kind][i]})
+    return stream
+
+
+def load_stream(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_stream(path: str, stream: List[Dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for update in stream:
+            f.write(json.dumps(update, ensure_ascii=False) + "\n")
+
+
+# -------------------------
+# Replay
+# -------------------------
+class _Tap:
+    """One update's view of the FakeClient; notes when its replies went out."""
+
+    def __init__(self, client: FakeClient):
+        self._client = client
+        self.first_send: Optional[float] = None
+        self.sends = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith(("send_", "forward_")):
+            return attr
+
+        async def call(*args, **kwargs):
+            result = await attr(*args, **kwargs)
+            self.sends += 1
+            if self.first_send is None:
+                self.first_send = time.perf_counter()
+            return result
+        return call
+
+
+def summary(values: List[float]) -> Dict:
+    """count / p50 / p90 / p99 / max of ``values`` (seconds) in milliseconds."""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))] * 1000, 3)
+    return {"count": len(values), "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99),
+            "max_ms": round(values[-1] * 1000, 3)}
+
+
+async def _watch_loop_lag(interval: float, samples: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - t - interval))
+
+
+async def replay(bot, stream: List[Dict], concurrency: int, telegram_latency: float,
+                 drain_timeout: float = 60.0) -> Dict:
+    client = FakeClient(latency=telegram_latency)
+    gate = asyncio.Semaphore(concurrency)
+    lag: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.get_running_loop().create_task(_watch_loop_lag(0.01, lag, stop))
+    done: List[tuple] = []
+    errors = 0
+
+    async def handle(i: int, update: Dict, arrived: float):
+        nonlocal errors
+        tap = _Tap(client)
+        user = fake_user(update.get("user_id", update["chat_id"]))
+        if update["kind"] == "file":
+            msg = fake_message(i + 1, update["chat_id"], caption=update.get("caption"), from_user=user,
+                               document=fake_document(update.get("file_name") or "movie.mkv"), client=tap)
+            handler = bot.handle_file
+        else:
+            msg = fake_message(i + 1, update["chat_id"], text=update.get("text", ""), from_user=user, client=tap)
+            handler = bot.handle_text
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await handler(tap, msg)
+            except Exception:
+                errors += 1
+                logger.exception("handler failed for update %d", i)
+            done.append((update["kind"], arrived, time.perf_counter() - started, tap))
+
+    started = time.perf_counter()
+    tasks = []
+    for i, update in enumerate(stream):
+        delay = started + float(update.get("at", 0)) - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(i, update, time.perf_counter())))
+    await asyncio.gather(*tasks)
+    handled = time.perf_counter()
+    # replies still queued in the rate limiter count towards reply latency
+    deadline = handled + drain_timeout
+    while bot.delivery.queued and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(telegram_latency + 0.05)
+    finished = time.perf_counter()
+    stop.set()
+    await watcher
+
+    replies = {"text": [], "file": []}
+    for kind, arrived, _, tap in done:
+        if tap.first_send is not None:
+            replies[kind].append(tap.first_send - arrived)
+    sends: Dict[str, int] = {}
+    for method, _, _ in client.sent:
+        sends[method] = sends.get(method, 0) + 1
+    return {
+        "updates": len(stream),
+        "errors": errors,
+        "no_reply": sum(1 for *_, tap in done if tap.first_send is None),
+        "handle_seconds": round(handled - started, 3),
+        "total_seconds": round(finished - started, 3),
+        "msgs_per_second": round(len(stream) / max(handled - started, 1e-9), 1),
+        "reply_latency": summary(replies["text"] + replies["file"]),
+        "search_reply_latency": summary(replies["text"]),
+        "file_reply_latency": summary(replies["file"]),
+        "handler_time": summary([d[2] for d in done]),
+        "loop_lag": summary(lag),
+        "sends": sends,
+        "undelivered": bot.delivery.queued,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an update stream through the bot handlers")
+    parser.add_argument("--messages", type=int, default=1000, help="synthetic updates to generate")
+    parser.add_argument("--stream", help="replay this JSONL stream instead of a synthetic one")
+    parser.add_argument("--save-stream", help="write the synthetic stream here as JSONL and replay it")
+    parser.add_argument("--rate", type=float, default=0.0, help="arrivals per second (0 = all at once)")
+    parser.add_argument("--concurrency", type=int, default=50, help="handlers in flight at most")
+    parser.add_argument("--catalog-size", type=int, default=10000, help="synthetic catalog entries")
+    parser.add_argument("--catalog", help="use a copy of this movie_list.json instead")
+    parser.add_argument("--group-ratio", type=float, default=0.2)
+    parser.add_argument("--file-ratio", type=float, default=0.02)
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per fake Telegram call")
+    parser.add_argument("--omdb-latency", type=float, default=0.2)
+    parser.add_argument("--github-latency", type=float, default=0.2)
+    parser.add_argument("--unthrottled", action="store_true",
+                        help="lift the delivery rate limits so only handler cost is measured")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="seconds to wait for queued replies after the last handler returned")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix="sara_load_")
+    if args.catalog:
+        with open(args.catalog, "r", encoding="utf-8") as f:
+            movies = json.load(f)
+    else:
+        movies = synthetic_catalog(args.catalog_size)
+    with open(os.path.join(workdir, "movie_list.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(movies, ensure_ascii=False))
+    stream = load_stream(args.stream) if args.stream else synthetic_stream(
+        movies, args.messages, args.rate, args.group_ratio, args.file_ratio, seed=args.seed)
+    if args.save_stream:
+        save_stream(args.save_stream, stream)
+
+    omdb = FakeOMDb(latency=args.omdb_latency).start()
+    github = FakeGitHub(latency=args.github_latency).start()
+    env = {"API_ID": "1", "API_HASH": "load", "BOT_TOKEN": "1:load", "ADMIN_PASSWORD": "load",
+           "CHANNEL_ID": "-1001", "OMDB_API_KEY": "load", "OMDB_API_URL": omdb.url,
+           "GITHUB_TOKEN": "load", "GITHUB_REPO": "load/test", "GITHUB_API_URL": github.url,
+           "GITHUB_SYNC_DEBOUNCE": "1", "SPELL_INDEX_PATH": os.path.join(workdir, "spell_index.json")}
+    if args.unthrottled:
+        env.update(DELIVERY_GLOBAL_RATE="1000000", DELIVERY_CHAT_RATE="1000000",
+                   DELIVERY_GROUP_RATE_PER_MIN="60000000")
+    os.environ.update(env)
+    os.chdir(workdir)
+
+    import bot
+    logger.setLevel(logging.WARNING)
+    bot.github_sync.start()
+    try:
+        result = asyncio.run(replay(bot, stream, args.concurrency, args.telegram_latency, args.drain_timeout))
+    finally:
+        bot.github_sync.stop(flush=True)
+        bot.search_pool.shutdown()
+        bot.http_client.close()
+        bot.catalog.close()
+        omdb.stop()
+        github.stop()
+        os.chdir(here)
+        shutil.rmtree(workdir, ignore_errors=True)
+    result["omdb_requests"] = len(omdb.requests)
+    result["github_puts"] = github.puts
+
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "catalog_size": len(movies), "stream": args.stream or "synthetic",
+                       "concurrency": args.concurrency, "rate": args.rate, "unthrottled": args.unthrottled,
+                       "telegram_latency": args.telegram_latency, "omdb_latency": args.omdb_latency,
+                       "github_latency": args.github_latency},
+              "result": result}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    r = result
+    print(f"{r['updates']} updates in {r['handle_seconds']}s ({r['msgs_per_second']}/s), "
+          f"reply p50 {r['reply_latency'].get('p50_ms')}ms p99 {r['reply_latency'].get('p99_ms')}ms, "
+          f"loop lag p99 {r['loop_lag'].get('p99_ms')}ms max {r['loop_lag'].get('max_ms')}ms, "
+          f"{r['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
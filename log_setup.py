@@ -0,0 +1,162 @@
+# log_setup.py
+# Logging that never blocks the caller: records are put on a bounded queue
+# and written by a listener thread to the console and a rotating log file.
+#
+#   listener = setup_logging(logging.getLogger("sara_bot"), "bot.log", json_lines=True)
+#   ...
+#   listener.stop()   # flushes what is still queued
+#
+# In the calling thread a record only costs the rate-limit check and the
+# message/traceback formatting; file writes and rotation happen in the
+# listener. A full queue drops records (counted in ``dropped``) instead of
+# making the caller wait, and a call site that logs warnings or errors
+# faster than ``burst`` records per ``window`` seconds is muted until the
+# window ends, so a burst of per-send exceptions costs a dict lookup each.
+# INFO records (admin audit lines, progress) are never rate limited.
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+import traceback
+import logging.handlers
+from typing import Dict, Optional, Tuple
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most ``burst`` records per call site through in each ``window`` seconds.
+
+    Only records at ``level`` or above are limited. The first record after a
+    muted stretch says how many were suppressed. ``burst=0`` turns the limit off.
+    """
+
+    def __init__(self, burst: int = 20, window: float = 10.0, level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        # call site -> [window start, records passed, records suppressed]
+        self._sites: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                muted = site[2] if site else 0
+                if len(self._sites) > 4096:
+                    self._sites.clear()
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                return True
+            else:
+                site[2] += 1
+                self.suppressed += 1
+                return False
+        if muted:
+            record.suppressed = muted
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg (+ exc, suppressed)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                "msg": record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        if getattr(record, "suppressed", 0):
+            data["suppressed"] = record.suppressed
+        return json.dumps(data, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # the note goes on the message line, before any traceback
+        text = super().formatMessage(record)
+        if getattr(record, "suppressed", 0):
+            text += f" ({record.suppressed} similar messages suppressed)"
+        return text
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking."""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # unlike the stock prepare(), keep the traceback apart from the
+        # message so the JSON formatter can put it in its own field
+        if record.exc_info and not record.exc_text:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip("\n")
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def file_handler(path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 when: str = "") -> logging.Handler:
+    """Rotating file handler: by time if ``when`` is set ("midnight", "h", ...), else by size."""
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count,
+                                                         encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(path, mode="a", maxBytes=max_bytes, backupCount=backup_count,
+                                                encoding="utf-8")
+
+
+def setup_logging(logger: logging.Logger, path: Optional[str], level: int = logging.INFO,
+                  json_lines: bool = False, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  when: str = "", queue_size: int = 10000, burst: int = 20,
+                  window: float = 10.0) -> logging.handlers.QueueListener:
+    """Route ``logger`` through a queue to the console and ``path``; returns the started listener.
+
+    The listener exposes the queue handler as ``listener.queue_handler`` and
+    the rate limiter as ``listener.rate_limit``.
+    """
+    formatter = JsonFormatter() if json_lines else TextFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if path:
+        handlers.append(file_handler(path, max_bytes, backup_count, when))
+    for h in handlers:
+        h.setLevel(level)
+        h.setFormatter(formatter)
+
+    q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    qh = DroppingQueueHandler(q)
+    rate_limit = RateLimitFilter(burst, window)
+    qh.addFilter(rate_limit)
+
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+        old.close()
+    logger.setLevel(level)
+    logger.addHandler(qh)
+    # the queue handler is the only way out; don't also go through root
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    listener.queue_handler = qh
+    listener.rate_limit = rate_limit
+    listener.start()
+    return listener
@@ -0,0 +1,120 @@
+# posters.py
+# Async poster lookup with an in-memory LRU backed by a JSON file on disk.
+#
+# Entries are keyed by normalize_title(title). Found posters and "no poster"
+# answers are cached with separate TTLs; fetch errors are not cached. While a
+# title is being fetched, other lookups of the same title wait for that
+# fetch instead of starting their own.
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from cache import SingleFlight
+from textutils import normalize_title
+
+logger = logging.getLogger("sara_bot")
+
+
+class PosterCache:
+    def __init__(self, fetch: Callable[[str], str], path: Optional[str] = None,
+                 hit_ttl: float = 30 * 86400, miss_ttl: float = 86400, max_size: int = 2048):
+        # fetch(title) -> poster url or "" when OMDb has none; raises on errors.
+        # A coroutine function is awaited, a plain one runs in the executor.
+        self.fetch = fetch
+        self.path = path
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        # key -> {"url": str, "expires": float}
+        self._mem: "OrderedDict[str, Dict]" = OrderedDict()
+        self._flights = SingleFlight()
+        self._file_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def stats(self) -> Dict:
+        return {"size": len(self._mem), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "fetches": self._flights.calls, "shared": self._flights.shared}
+
+    # ---- disk ----
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.exception("poster cache load error")
+            return
+        now = time.time()
+        live = sorted(((k, v) for k, v in data.items() if v.get("expires", 0) > now),
+                      key=lambda kv: kv[1]["expires"])
+        for k, v in live[-self.max_size:]:
+            self._mem[k] = v
+
+    def _save(self, items: Dict[str, Dict]):
+        if not self.path:
+            return
+        with self._file_lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(items, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                logger.exception("poster cache save error")
+
+    # ---- memory ----
+    def get_cached(self, title: str) -> Optional[str]:
+        """Cached poster url ("" = known miss), or None if not cached / expired."""
+        key = normalize_title(title)
+        item = self._mem.get(key)
+        if item is None:
+            return None
+        if item["expires"] <= time.time():
+            self._mem.pop(key, None)
+            return None
+        self._mem.move_to_end(key)
+        return item["url"]
+
+    def _put(self, key: str, url: str):
+        ttl = self.hit_ttl if url else self.miss_ttl
+        self._mem[key] = {"url": url, "expires": time.time() + ttl}
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_size:
+            self._mem.popitem(last=False)
+
+    # ---- lookup ----
+    async def get(self, title: str) -> str:
+        key = normalize_title(title)
+        if not key:
+            return ""
+        cached = self.get_cached(title)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        # concurrent requests for the same title share one OMDb call
+        return await self._flights.do(key, lambda: self._fetch(key, title))
+
+    async def _fetch(self, key: str, title: str) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            if asyncio.iscoroutinefunction(self.fetch):
+                url = await self.fetch(title)
+            else:
+                url = await loop.run_in_executor(None, self.fetch, title)
+        except Exception:
+            # not cached: the next request tries OMDb again
+            logger.exception("poster fetch failed for %r", title)
+            return ""
+        url = url or ""
+        self._put(key, url)
+        loop.run_in_executor(None, self._save, dict(self._mem))
+        return url
@@ -0,0 +1,292 @@
+# search.py
+# Inverted index over movie titles used to prune candidates before fuzzy scoring.
+#
+# Two posting maps are kept per title:
+#   * tokens   - token_words() of the title (STOPWORDS removed)
+#   * trigrams - character 3-grams of the lowercased, space-padded title
+# A query only gets fuzzy-scored against titles that share a token with it,
+# contain it as a substring (all of its trigrams present), or share enough
+# trigrams to be a plausible misspelling.
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from fuzzywuzzy import fuzz
+
+from textutils import normalize_title, token_words
+
+logger = logging.getLogger("sara_bot")
+
+FUZZY_THRESHOLD = 70
+# share of the query's trigrams a title must contain to be fuzzy-scored
+MIN_TRIGRAM_OVERLAP = 0.2
+
+
+def trigrams(s: str) -> Set[str]:
+    # padded so that word starts/ends count too ("sarkar" -> " sa" ... "ar ")
+    s = f" {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def title_matches(query_lower: str, title_lower: str, threshold: int = FUZZY_THRESHOLD) -> bool:
+    """The match rule handle_text has always used."""
+    return query_lower in title_lower or fuzz.token_set_ratio(query_lower, title_lower) >= threshold
+
+
+class SearchIndex:
+    """Token + trigram postings keyed by catalog key.
+
+    Subscribe it to a ``Catalog`` with ``catalog.subscribe(index.on_change)``
+    so it follows every add/update/delete, and rebuilds on "reset".
+    """
+
+    def __init__(self, catalog=None):
+        self._lock = threading.RLock()
+        self._titles: Dict[int, str] = {}
+        self._entries: Dict[int, Dict] = {}
+        self._exact: Dict[str, Set[int]] = defaultdict(set)
+        self._tokens: Dict[str, Set[int]] = defaultdict(set)
+        self._grams: Dict[str, Set[int]] = defaultdict(set)
+        self.catalog = catalog
+        if catalog is not None:
+            catalog.subscribe(self.on_change)
+            self.rebuild(catalog.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---- maintenance ----
+    def rebuild(self, items: Iterable[Tuple[int, Dict]]):
+        with self._lock:
+            self._titles = {}
+            self._entries = {}
+            self._exact = defaultdict(set)
+            self._tokens = defaultdict(set)
+            self._grams = defaultdict(set)
+            for key, entry in items:
+                self._add(key, entry)
+            logger.info("Search index built: %d titles, %d tokens, %d trigrams",
+                        len(self._entries), len(self._tokens), len(self._grams))
+
+    def _add(self, key: int, entry: Dict):
+        title = (entry.get("title") or "").lower()
+        if not title:
+            return
+        self._titles[key] = title
+        self._entries[key] = entry
+        self._exact[normalize_title(title)].add(key)
+        for tok in token_words(title):
+            self._tokens[tok].add(key)
+        for g in trigrams(title):
+            self._grams[g].add(key)
+
+    def _remove(self, key: int):
+        title = self._titles.pop(key, None)
+        self._entries.pop(key, None)
+        if title is None:
+            return
+        _discard(self._exact, normalize_title(title), key)
+        for tok in token_words(title):
+            _discard(self._tokens, tok, key)
+        for g in trigrams(title):
+            _discard(self._grams, g, key)
+
+    def add(self, key: int, entry: Dict):
+        with self._lock:
+            self._remove(key)
+            self._add(key, entry)
+
+    def remove(self, key: int):
+        with self._lock:
+            self._remove(key)
+
+    def on_change(self, event: str, key: Optional[int], entry: Optional[Dict]):
+        if event == "reset":
+            self.rebuild(self.catalog.items() if self.catalog is not None else ())
+        elif event in ("add", "update"):
+            self.add(key, entry)
+        elif event == "delete":
+            self.remove(key)
+
+    # ---- lookup ----
+    def exact(self, query: str) -> List[int]:
+        """Keys whose normalized title equals the normalized query."""
+        with self._lock:
+            return sorted(self._exact.get(normalize_title(query), ()))
+
+    def all_tokens(self, tokens: Iterable[str]) -> List[int]:
+        """Keys whose title contains every one of ``tokens``."""
+        with self._lock:
+            sets = [self._tokens.get(t) for t in set(tokens)]
+            if not sets or any(not p for p in sets):
+                return []
+            sets.sort(key=len)
+            found = set(sets[0])
+            for p in sets[1:]:
+                found &= p
+                if not found:
+                    break
+            return sorted(found)
+
+    def entry(self, key: int) -> Optional[Dict]:
+        return self._entries.get(key)
+
+    def title(self, key: int) -> str:
+        return self._titles.get(key, "")
+
+    def candidates(self, query: str) -> List[int]:
+        """Keys worth scoring for ``query``, in catalog order."""
+        q = (query or "").strip().lower()
+        if not q:
+            return []
+        with self._lock:
+            found: Set[int] = set()
+            for tok in token_words(q):
+                found |= self._tokens.get(tok, set())
+            qgrams = trigrams(q)
+            counts: Dict[int, int] = defaultdict(int)
+            for g in qgrams:
+                for key in self._grams.get(g, ()):
+                    counts[key] += 1
+            need = max(1, int(len(qgrams) * MIN_TRIGRAM_OVERLAP))
+            found.update(k for k, c in counts.items() if c >= need)
+            return sorted(found)
+
+    def search(self, query: str, threshold: int = FUZZY_THRESHOLD) -> List[Dict]:
+        """Entries matching ``query`` with the classic substring/fuzzy rule."""
+        q = (query or "").strip().lower()
+        with self._lock:
+            pool = [(self._titles[k], self._entries[k]) for k in self.candidates(q)]
+        return [e for t, e in pool if title_matches(q, t, threshold)]
+
+
+def _discard(postings: Dict[str, Set[int]], term: str, key: int):
+    keys = postings.get(term)
+    if keys is None:
+        return
+    keys.discard(key)
+    if not keys:
+        del postings[term]
+
+
+# -------------------------
+# Tiered matcher
+# -------------------------
+TIER_EXACT = "exact"
+TIER_TOKENS = "tokens"
+TIER_CORRECTED = "corrected"
+TIER_FUZZY = "fuzzy"
+TIER_NONE = "none"
+
+
+class MatchResult(NamedTuple):
+    tier: str
+    # (score, entry) pairs, best first
+    matches: List[Tuple[int, Dict]]
+    # fuzzy tier ran out of its CPU budget before scoring every candidate
+    truncated: bool = False
+
+    @property
+    def entries(self) -> List[Dict]:
+        return [e for _, e in self.matches]
+
+
+class Matcher:
+    """Answers a query from the cheapest tier that finds something.
+
+    1. exact  - normalized title lookup in a dict, O(1)
+    2. tokens - titles containing every query token (posting intersection)
+    3. corrected - tiers 1 and 2 again with misspelled words replaced by
+                ``spell.correct_query()`` (a spell.SpellIndex), if given
+    4. fuzzy  - substring/token_set_ratio over index candidates, limited by
+                ``fuzzy_budget`` seconds of thread CPU time
+
+    ``fts(tokens, limit)`` may replace the in-memory posting intersection of
+    the token tier (e.g. SqliteStorage.search).
+    """
+
+    def __init__(self, index: SearchIndex, fuzzy_budget: float = 0.05, max_results: int = 50,
+                 threshold: int = FUZZY_THRESHOLD, fts: Optional[Callable[[Iterable[str], int], List[int]]] = None,
+                 spell=None):
+        self.index = index
+        self.fts = fts
+        self.spell = spell
+        self.fuzzy_budget = fuzzy_budget
+        self.max_results = max_results
+        self.threshold = threshold
+
+    def match(self, query: str) -> MatchResult:
+        q = (query or "").strip().lower()
+        if not q:
+            return MatchResult(TIER_NONE, [])
+
+        result = self._exact_or_tokens(q)
+        if result is not None:
+            return result
+
+        if self.spell is not None:
+            corrected = self.spell.correct_query(q)
+            if corrected != q:
+                result = self._exact_or_tokens(corrected)
+                if result is not None:
+                    logger.debug("Spelling %r -> %r", q, corrected)
+                    return MatchResult(TIER_CORRECTED, result.matches)
+
+        scored, truncated = self._fuzzy(q)
+        if truncated:
+            logger.info("Fuzzy budget exhausted for %r (%d matches so far)", q, len(scored))
+        return MatchResult(TIER_FUZZY if scored else TIER_NONE, self._collect(scored), truncated)
+
+    def _exact_or_tokens(self, q: str) -> Optional[MatchResult]:
+        index = self.index
+        keys = index.exact(q)
+        if keys:
+            return MatchResult(TIER_EXACT, self._collect((100, k) for k in keys))
+
+        qtokens = set(token_words(q))
+        if qtokens:
+            keys = self._token_keys(qtokens)
+            if keys:
+                scored = []
+                for k in keys:
+                    # fewer extra words in the title = closer to what was asked
+                    n = len(set(token_words(index.title(k)))) or 1
+                    scored.append((int(100 * len(qtokens) / max(n, len(qtokens))), k))
+                return MatchResult(TIER_TOKENS, self._collect(scored))
+        return None
+
+    def _token_keys(self, qtokens: Set[str]) -> List[int]:
+        if self.fts is None:
+            return self.index.all_tokens(qtokens)
+        try:
+            return [k for k in self.fts(qtokens, 1000) if self.index.entry(k) is not None]
+        except Exception:
+            logger.exception("FTS lookup failed, using in-memory postings")
+            return self.index.all_tokens(qtokens)
+
+    def _fuzzy(self, q: str) -> Tuple[List[Tuple[int, int]], bool]:
+        index = self.index
+        deadline = time.thread_time() + self.fuzzy_budget
+        scored = []
+        for i, k in enumerate(index.candidates(q)):
+            if i % 16 == 0 and time.thread_time() > deadline:
+                return scored, True
+            title = index.title(k)
+            if not title:
+                continue
+            score = 100 if q in title else fuzz.token_set_ratio(q, title)
+            if score >= self.threshold:
+                scored.append((score, k))
+        return scored, False
+
+    def _collect(self, scored: Iterable[Tuple[int, int]]) -> List[Tuple[int, Dict]]:
+        # best score first, catalog order among equals
+        ranked = sorted(scored, key=lambda sk: (-sk[0], sk[1]))[:self.max_results]
+        out = []
+        for score, k in ranked:
+            entry = self.index.entry(k)
+            if entry is not None:
+                out.append((score, entry))
+        return out
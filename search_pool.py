@@ -0,0 +1,231 @@
+# search_pool.py
+# Runs Matcher.match() off the Pyrogram event loop.
+#
+# "thread" mode shares the live SearchIndex with a ThreadPoolExecutor.
+# "process" mode gives every worker process its own index: the parent
+# pickles the catalog into a "base" temp file once, then appends each later
+# catalog version to a delta file as (seq, changed entries). A worker builds
+# from the base once and afterwards only applies the delta records it has
+# not seen yet (reading on from where it stopped), so a catalog change costs
+# it a few index updates rather than a rebuild, and a query only ships
+# (base, seq, query) across the process boundary. A new base is written
+# when the deltas outgrow a fraction of the catalog.
+import os
+import pickle
+import asyncio
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from search import SearchIndex, Matcher, MatchResult
+from spell import SpellIndex
+
+logger = logging.getLogger("sara_bot")
+
+
+class SearchBusy(Exception):
+    """Raised when too many searches are already queued."""
+
+
+# -------------------------
+# process worker side
+# -------------------------
+# base: id of the base snapshot the matcher was built from; seq: last delta
+# record applied; offset: where the next record starts in the delta file
+_worker_state: Dict = {"base": None, "seq": None, "offset": 0, "matcher": None}
+
+
+def _worker_sync(base: Tuple[int, str, str], seq: int, options: Dict):
+    base_id, base_path, delta_path = base
+    state = _worker_state
+    if state["base"] != base_id:
+        with open(base_path, "rb") as f:
+            items = pickle.load(f)
+        index = SearchIndex()
+        index.rebuild(items)
+        spell = None
+        if options["spell_distance"]:
+            spell = SpellIndex(max_distance=options["spell_distance"])
+            spell.sync(items)
+        state.update(base=base_id, seq=base_id, offset=0, matcher=Matcher(index, spell=spell))
+    if state["seq"] >= seq:
+        return
+    matcher = state["matcher"]
+    with open(delta_path, "rb") as f:
+        f.seek(state["offset"])
+        # records past ``seq`` may still be being written; stop at ours
+        while state["seq"] < seq:
+            rec_seq, changes = pickle.load(f)
+            for key, entry in changes:
+                if entry is None:
+                    matcher.index.remove(key)
+                    if matcher.spell is not None:
+                        matcher.spell.remove(key)
+                else:
+                    matcher.index.add(key, entry)
+                    if matcher.spell is not None:
+                        matcher.spell.add(key, entry)
+            state["seq"], state["offset"] = rec_seq, f.tell()
+
+
+def _worker_match(base: Tuple[int, str, str], seq: int, query: str, options: Dict) -> MatchResult:
+    _worker_sync(base, seq, options)
+    matcher = _worker_state["matcher"]
+    matcher.fuzzy_budget = options["fuzzy_budget"]
+    matcher.max_results = options["max_results"]
+    return matcher.match(query)
+
+
+# -------------------------
+# parent side
+# -------------------------
+class SearchPool:
+    # a new base snapshot once the deltas since the last one add up to this
+    # share of the catalog (workers then rebuild once instead of replaying)
+    DELTA_RATIO = 0.5
+
+    def __init__(self, matcher: Matcher, mode: str = "thread", workers: int = 2,
+                 max_pending: int = 64, timeout: float = 3.0):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"unknown search pool mode: {mode}")
+        self.matcher = matcher
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._snapshot_dir = None
+        # catalog version last published to the workers, and what it held
+        self._published_version: Optional[int] = None
+        self._published: Dict[int, Dict] = {}
+        # (id, base path, delta path) of the current base; seq of the last record
+        self._base: Optional[Tuple[int, str, str]] = None
+        self._seq = 0
+        self._delta_changes = 0
+        # older base/delta files still kept for workers with queued tasks
+        self._old_paths: List[str] = []
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._snapshot_dir = tempfile.mkdtemp(prefix="sara_search_")
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    # ---- slots ----
+    def _release(self, _fut=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, fn, *args) -> Future:
+        """Run ``fn`` in the pool; its slot stays taken until the job itself ends,
+        even if the caller stopped waiting for it."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise SearchBusy(f"{self._pending} searches pending")
+            self._pending += 1
+        try:
+            fut = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        fut.add_done_callback(self._release)
+        return fut
+
+    # ---- process mode: base + deltas ----
+    def _new_base(self, items: Dict[int, Dict]):
+        self._seq += 1
+        base_id = self._seq
+        base_path = os.path.join(self._snapshot_dir, f"catalog.{base_id}.pkl")
+        delta_path = os.path.join(self._snapshot_dir, f"catalog.{base_id}.delta")
+        with open(base_path, "wb") as f:
+            pickle.dump(list(items.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+        open(delta_path, "wb").close()
+        if self._base is not None:
+            self._old_paths.extend(self._base[1:])
+        self._base = (base_id, base_path, delta_path)
+        self._delta_changes = 0
+        while len(self._old_paths) > 4:
+            try:
+                os.remove(self._old_paths.pop(0))
+            except OSError:
+                pass
+
+    def _publish_snapshot(self) -> Tuple[Tuple[int, str, str], int]:
+        """Bring the files the workers read up to the current catalog version."""
+        snap = self.matcher.index.catalog.snapshot()
+        with self._lock:
+            if self._published_version == snap.version:
+                return self._base, self._seq
+            current = dict(zip(snap.keys, snap.movies))
+            old = self._published
+            changes = [(k, e) for k, e in current.items() if old.get(k) is not e and old.get(k) != e]
+            changes.extend((k, None) for k in old.keys() - current.keys())
+            if self._base is None or self._delta_changes + len(changes) > max(1000, len(current) * self.DELTA_RATIO):
+                self._new_base(current)
+                # build the new base in idle workers now, so the next queries
+                # don't wait for it (or time out) in the pool
+                for _ in range(self.workers):
+                    self._executor.submit(_worker_sync, self._base, self._seq, self._options())
+            elif changes:
+                self._seq += 1
+                with open(self._base[2], "ab") as f:
+                    pickle.dump((self._seq, changes), f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._delta_changes += len(changes)
+            self._published, self._published_version = current, snap.version
+            return self._base, self._seq
+
+    def _options(self) -> Dict:
+        spell = self.matcher.spell
+        return {"fuzzy_budget": self.matcher.fuzzy_budget, "max_results": self.matcher.max_results,
+                "spell_distance": spell.max_distance if spell is not None else 0}
+
+    def warm(self):
+        """Process mode: publish the catalog and start the workers' index builds in the background."""
+        if self.mode == "process":
+            threading.Thread(target=self._publish_snapshot, name="search-warm", daemon=True).start()
+
+    async def match(self, query: str) -> MatchResult:
+        """Score ``query`` in the pool; raises SearchBusy or asyncio.TimeoutError."""
+        if self._pending >= self.max_pending:
+            raise SearchBusy(f"{self._pending} searches pending")
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            return await asyncio.wait_for(self._match_in_process(loop, query), self.timeout)
+        fut = self._submit(self.matcher.match, query)
+        return await asyncio.wait_for(asyncio.wrap_future(fut), self.timeout)
+
+    async def _match_in_process(self, loop, query: str) -> MatchResult:
+        options = self._options()
+        for attempt in (1, 2):
+            with self._lock:
+                # base and seq must come from the same publish
+                current = self._base is not None and self.matcher.index.catalog.version == self._published_version
+                base, seq = self._base, self._seq
+            if not current:
+                base, seq = await loop.run_in_executor(None, self._publish_snapshot)
+            try:
+                fut = self._submit(_worker_match, base, seq, query, options)
+                return await asyncio.wrap_future(fut)
+            except FileNotFoundError:
+                # base rotated away while the task was queued
+                if attempt == 2:
+                    raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._snapshot_dir:
+            for name in os.listdir(self._snapshot_dir):
+                try:
+                    os.remove(os.path.join(self._snapshot_dir, name))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(self._snapshot_dir)
+            except OSError:
+                pass
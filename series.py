@@ -0,0 +1,181 @@
+# series.py
+# Groups catalog entries into series by base_series_title().
+#
+# "Dude Season 1" and "Dude Season 2", "Pushpa Part 1" / "Pushpa Part 2" and
+# "Superman (1978)" / "Superman (2025)" share a base title and form one
+# cluster. Each cluster is sorted by (season, part/episode, year) once and
+# the order is kept until one of its members changes, so a search only has
+# to map its matches to clusters. Within a cluster, uploads with the same
+# normalized title and file name count as one (the first in order wins).
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from textutils import base_series_title, normalize_title
+
+_SEASON_EPISODE = re.compile(r"\bs(\d{1,3})\s*e(\d{1,4})\b")
+_SEASON = re.compile(r"\b(?:season|s)\s*(\d{1,3})\b")
+_EPISODE = re.compile(r"\b(?:episode|ep|e)\s*(\d{1,4})\b")
+_PART = re.compile(r"\b(?:part|pt|vol|volume|chapter)\s*(\d{1,3})\b")
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+def _first(pattern, s: str) -> int:
+    m = pattern.search(s)
+    return int(m.group(1)) if m else 0
+
+
+def part_key(title: str) -> Tuple[int, int, int, int]:
+    """(season, episode, part, year) found in ``title``, 0 where missing."""
+    s = normalize_title(title)
+    m = _SEASON_EPISODE.search(s)
+    if m:
+        season, episode = int(m.group(1)), int(m.group(2))
+    else:
+        season, episode = _first(_SEASON, s), _first(_EPISODE, s)
+    return season, episode, _first(_PART, s), _first(_YEAR, s)
+
+
+def upload_key(entry: Dict) -> Tuple[str, str]:
+    # same title and same file name (case and separators ignored); without a
+    # file name only the same link / channel post counts as the same upload
+    filename = normalize_title(entry.get("filename") or "")
+    if not filename:
+        filename = entry.get("file_url") or f"msg:{entry.get('msg_id', 0)}"
+    return normalize_title(entry.get("title", "")), filename
+
+
+class SeriesIndex:
+    """base_series_title -> catalog keys, with a cached sorted order per cluster.
+
+    Subscribe it to a ``Catalog`` with ``catalog.subscribe(index.on_change)``
+    so it follows every add/update/delete, and rebuilds on "reset".
+    """
+
+    def __init__(self, catalog=None):
+        self._lock = threading.RLock()
+        self._base: Dict[int, str] = {}
+        self._entries: Dict[int, Dict] = {}
+        self._members: Dict[str, Set[int]] = defaultdict(set)
+        # base -> sorted, de-duplicated keys; dropped when a member changes
+        self._sorted: Dict[str, List[int]] = {}
+        self.sorts = 0
+        self.catalog = catalog
+        if catalog is not None:
+            catalog.subscribe(self.on_change)
+            self.rebuild(catalog.items())
+
+    def __len__(self):
+        return len(self._members)
+
+    # ---- maintenance ----
+    def rebuild(self, items: Iterable[Tuple[int, Dict]]):
+        with self._lock:
+            self._base = {}
+            self._entries = {}
+            self._members = defaultdict(set)
+            self._sorted = {}
+            for key, entry in items:
+                self._add(key, entry)
+
+    def _add(self, key: int, entry: Dict):
+        base = base_series_title(entry.get("title", ""))
+        self._base[key] = base
+        self._entries[key] = entry
+        self._members[base].add(key)
+        self._sorted.pop(base, None)
+
+    def _remove(self, key: int):
+        base = self._base.pop(key, None)
+        self._entries.pop(key, None)
+        if base is None:
+            return
+        members = self._members.get(base)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._members[base]
+        self._sorted.pop(base, None)
+
+    def add(self, key: int, entry: Dict):
+        with self._lock:
+            self._remove(key)
+            self._add(key, entry)
+
+    def remove(self, key: int):
+        with self._lock:
+            self._remove(key)
+
+    def on_change(self, event: str, key: Optional[int], entry: Optional[Dict]):
+        if event == "reset":
+            self.rebuild(self.catalog.items() if self.catalog is not None else ())
+        elif event in ("add", "update"):
+            self.add(key, entry)
+        elif event == "delete":
+            self.remove(key)
+
+    # ---- lookup ----
+    def _cluster_keys(self, base: str) -> List[int]:
+        keys = self._sorted.get(base)
+        if keys is None:
+            entries = self._entries
+
+            def order(k):
+                e = entries[k]
+                return part_key(e.get("title", "")) + (k,)
+
+            keys, seen = [], set()
+            for k in sorted(self._members.get(base, ()), key=order):
+                ident = upload_key(entries[k])
+                if ident not in seen:
+                    seen.add(ident)
+                    keys.append(k)
+            self._sorted[base] = keys
+            self.sorts += 1
+        return keys
+
+    def base_of(self, key: int) -> Optional[str]:
+        return self._base.get(key)
+
+    def cluster(self, base: str) -> List[Dict]:
+        """Entries of the series ``base`` in (season, episode, part, year) order."""
+        with self._lock:
+            return [self._entries[k] for k in self._cluster_keys(base)]
+
+    def group(self, matches: List[Tuple[int, Dict]], limit: Optional[int] = None) -> List[Tuple[int, Dict]]:
+        """Replace every match by its whole sorted series, best match's series first.
+
+        Each member keeps the score of the best match in its series; a series
+        shows up once however many of its members matched. With ``limit`` at
+        most that many entries come back: a series that doesn't fit in what is
+        left is cut to the matched entry and the ones after it.
+        """
+        out: List[Tuple[int, Dict]] = []
+        done: Set[str] = set()
+        with self._lock:
+            for score, entry in matches:
+                if limit is not None and len(out) >= limit:
+                    break
+                key = entry.get("id")
+                base = self._base.get(key)
+                if not base:
+                    out.append((score, entry))
+                    continue
+                if base in done:
+                    continue
+                done.add(base)
+                keys = self._cluster_keys(base)
+                room = len(keys) if limit is None else limit - len(out)
+                if len(keys) > room:
+                    start = keys.index(key) if key in keys else 0
+                    start = min(start, len(keys) - room)
+                    keys = keys[start:start + room]
+                out.extend((score, self._entries[k]) for k in keys)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sizes = [len(m) for m in self._members.values()]
+            return {"entries": len(self._entries), "series": sum(1 for n in sizes if n > 1),
+                    "largest": max(sizes, default=0), "sorted": len(self._sorted), "sorts": self.sorts}
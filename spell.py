@@ -0,0 +1,254 @@
+# spell.py
+# Spelling correction for query words over the title vocabulary.
+#
+# Symmetric-delete lookup (as in SymSpell): every vocabulary word is stored
+# under all strings obtained by deleting up to `max_distance` characters
+# from its first `prefix_length` characters. A query word generates its own
+# deletes the same way; any vocabulary word sharing one of them is a
+# candidate and gets checked with a real edit distance. A lookup touches a
+# few dozen dict keys whatever the vocabulary size.
+#
+# The vocabulary is token_words() of every title. It follows the catalog
+# through change events and is saved to a JSON file, so a restart only
+# re-checks titles that changed instead of regenerating every delete. The
+# delete map is the bulk of the index (about 20 keys per word); its values
+# are the words joined by SEP rather than sets, which keeps it small in
+# memory and lets it be saved and loaded as two long strings.
+import os
+import re
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from textutils import STOPWORDS, normalize_title, token_words
+
+logger = logging.getLogger("sara_bot")
+
+FORMAT = 1
+SEP = "\x00"
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance of ``a`` and ``b``, or ``limit + 1`` if larger."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        best = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            best = min(best, d)
+        if best > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    found = {word}
+    edge = {word}
+    for _ in range(distance):
+        nxt = set()
+        for w in edge:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= found
+        found |= nxt
+        edge = nxt
+    return found
+
+
+def _indexable(word: str) -> bool:
+    # years, part numbers and such are never "misspelled"
+    return len(word) >= 3 and not word.isdigit()
+
+
+class SpellIndex:
+    """Word -> title count, plus the symmetric-delete map used by ``correct()``.
+
+    Subscribe it to a ``Catalog`` with ``catalog.subscribe(index.on_change)``
+    so it follows every add/update/delete, and rebuilds on "reset".
+    """
+
+    def __init__(self, catalog=None, path: Optional[str] = None, max_distance: int = 2, prefix_length: int = 7):
+        self._lock = threading.RLock()
+        self.path = path
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._counts: Dict[str, int] = {}
+        # delete -> SEP-joined words it was generated from
+        self._deletes: Dict[str, str] = {}
+        self._key_words: Dict[int, Tuple[str, ...]] = {}
+        self.dirty = False
+        self.lookups = 0
+        self.corrections = 0
+        self.catalog = catalog
+        if catalog is not None:
+            loaded = self.load()
+            catalog.subscribe(self.on_change)
+            self.sync(catalog.items())
+            if self.dirty or not loaded:
+                self.save()
+
+    def __len__(self):
+        return len(self._counts)
+
+    # ---- maintenance ----
+    def _words(self, entry: Dict) -> Tuple[str, ...]:
+        return tuple(sorted({w for w in token_words(entry.get("title", "")) if _indexable(w)}))
+
+    def _add_word(self, word: str):
+        n = self._counts.get(word, 0)
+        self._counts[word] = n + 1
+        if n == 0:
+            deletes = self._deletes
+            for d in _deletes(word[:self.prefix_length], self.max_distance):
+                words = deletes.get(d)
+                deletes[d] = word if words is None else words + SEP + word
+
+    def _remove_word(self, word: str):
+        n = self._counts.get(word, 0)
+        if n > 1:
+            self._counts[word] = n - 1
+            return
+        self._counts.pop(word, None)
+        for d in _deletes(word[:self.prefix_length], self.max_distance):
+            words = self._deletes.get(d)
+            if words is None:
+                continue
+            rest = [w for w in words.split(SEP) if w != word]
+            if rest:
+                self._deletes[d] = SEP.join(rest)
+            else:
+                del self._deletes[d]
+
+    def _set_words(self, key: int, words: Tuple[str, ...]):
+        old = self._key_words.get(key, ())
+        if old == words:
+            return
+        for w in old:
+            self._remove_word(w)
+        for w in words:
+            self._add_word(w)
+        if words:
+            self._key_words[key] = words
+        else:
+            self._key_words.pop(key, None)
+        self.dirty = True
+
+    def add(self, key: int, entry: Dict):
+        with self._lock:
+            self._set_words(key, self._words(entry))
+
+    def remove(self, key: int):
+        with self._lock:
+            self._set_words(key, ())
+
+    def sync(self, items: Iterable[Tuple[int, Dict]]):
+        """Bring the index in line with ``items``; only changed titles are re-indexed."""
+        with self._lock:
+            seen = set()
+            for key, entry in items:
+                seen.add(key)
+                self._set_words(key, self._words(entry))
+            for key in [k for k in self._key_words if k not in seen]:
+                self._set_words(key, ())
+
+    def on_change(self, event: str, key: Optional[int], entry: Optional[Dict]):
+        if event == "reset":
+            self.sync(self.catalog.items() if self.catalog is not None else ())
+        elif event in ("add", "update"):
+            self.add(key, entry)
+        elif event == "delete":
+            self.remove(key)
+
+    # ---- disk ----
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.exception("spell index load error")
+            return False
+        if (data.get("format"), data.get("max_distance"), data.get("prefix_length")) != \
+                (FORMAT, self.max_distance, self.prefix_length):
+            logger.info("spell index %s was built with other settings, rebuilding", self.path)
+            return False
+        with self._lock:
+            self._counts = data["counts"]
+            keys, words = data["deletes"]
+            self._deletes = dict(zip(keys.split("\n"), words.split("\n"))) if keys else {}
+            self._key_words = {int(k): tuple(ws) for k, ws in data["keys"].items()}
+            self.dirty = False
+        return True
+
+    def save(self) -> bool:
+        if not self.path:
+            return False
+        with self._lock:
+            data = {"format": FORMAT, "max_distance": self.max_distance, "prefix_length": self.prefix_length,
+                    "counts": self._counts, "keys": self._key_words,
+                    "deletes": ["\n".join(self._deletes), "\n".join(self._deletes.values())]}
+            text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            logger.exception("spell index save error")
+            self.dirty = True
+            return False
+        return True
+
+    # ---- lookup ----
+    def _limit(self, word: str) -> int:
+        if len(word) < 3:
+            return 0
+        return 1 if len(word) <= 4 else self.max_distance
+
+    def correct(self, word: str) -> str:
+        """Closest vocabulary word to ``word`` (fewest edits, then most titles), else ``word``."""
+        limit = self._limit(word)
+        with self._lock:
+            self.lookups += 1
+            if not limit or word in self._counts or not _indexable(word):
+                return word
+            candidates: Set[str] = set()
+            for d in _deletes(word[:self.prefix_length], limit):
+                words = self._deletes.get(d)
+                if words is not None:
+                    candidates.update(words.split(SEP))
+            best: Optional[Tuple[int, int, str]] = None
+            for cand in candidates:
+                dist = edit_distance(word, cand, limit)
+                if dist > limit:
+                    continue
+                rank = (dist, -self._counts.get(cand, 0), cand)
+                if best is None or rank < best:
+                    best = rank
+        if best is None:
+            return word
+        self.corrections += 1
+        return best[2]
+
+    def correct_query(self, query: str) -> str:
+        """``query`` with every unknown word replaced by its correction (``query`` itself if none)."""
+        words = re.findall(r"[a-z0-9]+", normalize_title(query))
+        fixed = [w if w in STOPWORDS else self.correct(w) for w in words]
+        return " ".join(fixed) if fixed != words else query
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"words": len(self._counts), "deletes": len(self._deletes), "titles": len(self._key_words),
+                    "lookups": self.lookups, "corrections": self.corrections, "dirty": self.dirty}
@@ -1,2 +1,24 @@
 #!/bin/bash
-python bot.py
+# Default: the bot with Flask's server in a thread (what render.yaml deploys).
+# Opt-in WEB_SERVER=gunicorn: run the bot and a gunicorn pool for the Flask app
+# (wsgi.py) as separate processes; if either exits, stop the other so the
+# service restarts. Deploy it as a web service then.
+if [ "$WEB_SERVER" != "gunicorn" ]; then
+    exec python bot.py
+fi
+
+python bot.py &
+BOT_PID=$!
+gunicorn wsgi:application \
+    --bind "0.0.0.0:${PORT:-8080}" \
+    --workers "${WEB_WORKERS:-2}" \
+    --threads "${WEB_THREADS:-4}" \
+    --timeout "${WEB_TIMEOUT:-60}" &
+WEB_PID=$!
+
+trap 'kill -TERM $BOT_PID $WEB_PID 2>/dev/null' TERM INT
+wait -n
+status=$?
+kill -TERM $BOT_PID $WEB_PID 2>/dev/null
+wait
+exit $status
@@ -0,0 +1,440 @@
+# storage.py
+# Persistence backends for catalog.Catalog.
+#
+#   JsonFileStorage - movie_list.json rewritten on every change (classic)
+#   JournalStorage  - movie_list.json is a snapshot; each change is appended
+#                     to a JSONL journal and replayed on load. Once the journal
+#                     passes a record/size threshold it is compacted into a new
+#                     snapshot (atomic replace) and truncated.
+#   SqliteStorage   - SQLite database (WAL) with an FTS5 index over
+#                     normalized titles; see import_json/export_json.
+#
+# The JSON snapshot keeps the plain movie_list.json list format, so exports
+# and GitHub sync keep working with any backend.
+import os
+import json
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from textutils import normalize_title
+
+logger = logging.getLogger("sara_bot")
+
+# (event, key, entry) - same events catalog listeners get
+Change = Tuple[str, int, Optional[Dict]]
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def _msg_id(entry: Dict) -> int:
+    try:
+        return int(entry.get("msg_id") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = 4, fsync: bool = False):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # one dumps() + write is several times faster than json.dump()'s
+        # chunk-by-chunk writes for a large indented list
+        f.write(json.dumps(data, indent=indent, ensure_ascii=False))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JsonFileStorage:
+    kind = "json"
+    # entries loaded without an "id" are written back with the id they were
+    # given, so a restart or an external edit can't renumber them under the
+    # admin panel's edit/delete links
+    persist_ids = True
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def signature(self):
+        """Changes whenever the data on disk changes (mtime/size)."""
+        return _file_sig(self.path)
+
+    def load(self) -> Optional[List[Dict]]:
+        """Stored movies, or None if the data is unreadable right now."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                logger.warning("catalog file %s is not a JSON list, ignoring", self.path)
+                return None
+            return data
+        except FileNotFoundError:
+            return []
+        except Exception:
+            logger.exception("catalog read error")
+            return None
+
+    def write_all(self, movies: List[Dict]) -> bool:
+        try:
+            write_json_atomic(self.path, movies)
+            return True
+        except Exception:
+            logger.exception("catalog save error")
+            return False
+
+    def record(self, changes: List[Change], movies: Callable[[], List[Dict]]) -> bool:
+        return self.write_all(movies())
+
+    def close(self):
+        pass
+
+
+class JournalStorage(JsonFileStorage):
+    kind = "journal"
+
+    def __init__(self, path: str, journal_path: Optional[str] = None,
+                 max_records: int = 5000, max_bytes: int = 8 * 1024 * 1024, fsync: bool = False):
+        super().__init__(path)
+        self.journal_path = journal_path or f"{path}.journal"
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._records = 0
+        self._journal = None
+        self.compactions = 0
+
+    def signature(self):
+        return (_file_sig(self.path), _file_sig(self.journal_path))
+
+    def load(self) -> Optional[List[Dict]]:
+        base = super().load()
+        if base is None:
+            return None
+        self._records = 0
+        if not os.path.exists(self.journal_path):
+            return base
+        movies: Dict[int, Dict] = {}
+        loose: List[Dict] = []
+        for m in base:
+            if isinstance(m.get("id"), int):
+                movies[m["id"]] = m
+            else:
+                loose.append(m)
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # torn last write after a crash; everything before it is good
+                    logger.warning("journal %s: skipping unreadable line %d", self.journal_path, lineno)
+                    continue
+                self._records += 1
+                op, key = rec.get("op"), rec.get("id")
+                if op in ("add", "update") and isinstance(rec.get("entry"), dict):
+                    # replay is idempotent: a crash between compaction and
+                    # truncation just re-applies changes already in the snapshot
+                    movies[key] = rec["entry"]
+                elif op == "delete":
+                    movies.pop(key, None)
+        return loose + list(movies.values())
+
+    def _open_journal(self):
+        if self._journal is None:
+            torn = False
+            if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path):
+                with open(self.journal_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if torn:
+                # don't glue the next record onto a half-written one
+                self._journal.write("\n")
+        return self._journal
+
+    def write_all(self, movies: List[Dict]) -> bool:
+        """Write a fresh snapshot and start an empty journal."""
+        if not super().write_all(movies):
+            return False
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            with open(self.journal_path, "w", encoding="utf-8"):
+                pass
+            self._records = 0
+            return True
+        except Exception:
+            logger.exception("journal truncate error")
+            return False
+
+    def record(self, changes: List[Change], movies: Callable[[], List[Dict]]) -> bool:
+        try:
+            f = self._open_journal()
+            for event, key, entry in changes:
+                rec = {"op": event, "id": key}
+                if event != "delete":
+                    rec["entry"] = entry
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self._records += len(changes)
+        except Exception:
+            logger.exception("journal append error")
+            return False
+        if self._records >= self.max_records or f.tell() >= self.max_bytes:
+            self.compact(movies())
+        return True
+
+    def compact(self, movies: Iterable[Dict]) -> bool:
+        records = self._records
+        ok = self.write_all(list(movies))
+        if ok:
+            self.compactions += 1
+            logger.info("Journal compacted (%d records folded into %s)", records, self.path)
+        return ok
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# -------------------------
+# SQLite backend
+# -------------------------
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    norm_title TEXT NOT NULL DEFAULT '',
+    msg_id INTEGER NOT NULL DEFAULT 0,
+    file_url TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS movies_msg_id ON movies(msg_id) WHERE msg_id > 0;
+CREATE UNIQUE INDEX IF NOT EXISTS movies_file_url ON movies(file_url) WHERE file_url <> '';
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(norm_title, content='movies', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS movies_ai AFTER INSERT ON movies BEGIN
+    INSERT INTO movies_fts(rowid, norm_title) VALUES (new.id, new.norm_title);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_ad AFTER DELETE ON movies BEGIN
+    INSERT INTO movies_fts(movies_fts, rowid, norm_title) VALUES ('delete', old.id, old.norm_title);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_au AFTER UPDATE ON movies BEGIN
+    INSERT INTO movies_fts(movies_fts, rowid, norm_title) VALUES ('delete', old.id, old.norm_title);
+    INSERT INTO movies_fts(rowid, norm_title) VALUES (new.id, new.norm_title);
+END;
+"""
+
+
+def split_duplicates(movies: Iterable[Dict]) -> Tuple[List[Dict], List[Tuple[Dict, int]]]:
+    """Split ``movies`` into what SQLite can store and the later duplicates.
+
+    A movie is a duplicate when an earlier one has its msg_id (> 0) or
+    file_url (non-empty); duplicates come back as ``(movie, id of the earlier one)``.
+    """
+    kept: List[Dict] = []
+    dupes: List[Tuple[Dict, int]] = []
+    by_msg: Dict[int, int] = {}
+    by_url: Dict[str, int] = {}
+    for m in movies:
+        msg_id = _msg_id(m)
+        url = m.get("file_url") or ""
+        earlier = by_msg.get(msg_id) if msg_id > 0 else None
+        if earlier is None and url:
+            earlier = by_url.get(url)
+        if earlier is not None:
+            dupes.append((m, earlier))
+            continue
+        kept.append(m)
+        if msg_id > 0:
+            by_msg[msg_id] = m.get("id")
+        if url:
+            by_url[url] = m.get("id")
+    return kept, dupes
+
+
+def log_duplicates(what: str, dupes: List[Tuple[Dict, int]], limit: int = 20):
+    logger.warning("%s: %d movies", what, len(dupes))
+    for m, earlier in dupes[:limit]:
+        logger.warning("  id=%s msg_id=%s file_url=%s title=%r repeats id=%s", m.get("id"), m.get("msg_id"),
+                       m.get("file_url"), m.get("title"), earlier)
+    if len(dupes) > limit:
+        logger.warning("  ... %d more", len(dupes) - limit)
+
+
+class SqliteStorage:
+    """Movies in a WAL-mode SQLite database with an FTS5 title index.
+
+    Each thread gets its own connection, so the Flask thread and the bot
+    read concurrently; writes are serialized by a lock. ``msg_id`` and
+    ``file_url`` are unique (ignoring 0 / empty).
+    """
+
+    kind = "sqlite"
+    persist_ids = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._sig_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SQLITE_SCHEMA)
+        conn.commit()
+        # PRAGMA data_version only moves when *another* connection commits,
+        # so this one is kept just for signature()
+        self._sig_conn = sqlite3.connect(path, check_same_thread=False)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(key: int, entry: Dict) -> Tuple:
+        title = entry.get("title") or ""
+        return (key, title, normalize_title(title), _msg_id(entry), entry.get("file_url") or "",
+                json.dumps(entry, ensure_ascii=False))
+
+    def signature(self):
+        with self._sig_lock:
+            return self._sig_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self) -> Optional[List[Dict]]:
+        try:
+            rows = self._conn().execute("SELECT data FROM movies ORDER BY id").fetchall()
+        except Exception:
+            logger.exception("catalog read error")
+            return None
+        return [json.loads(r[0]) for r in rows]
+
+    def write_all(self, movies: List[Dict]) -> bool:
+        """Replace every row with ``movies``; refuses (False) a list with duplicates."""
+        _, dupes = split_duplicates(movies)
+        if dupes:
+            log_duplicates("sqlite: catalog not saved, duplicate msg_id/file_url", dupes)
+            return False
+        conn = self._conn()
+        try:
+            with self._write_lock, conn:
+                conn.execute("DELETE FROM movies")
+                conn.executemany(
+                    "INSERT INTO movies(id, title, norm_title, msg_id, file_url, data) VALUES (?,?,?,?,?,?)",
+                    [self._row(m["id"], m) for m in movies])
+            return True
+        except Exception:
+            logger.exception("catalog save error")
+            return False
+
+    def record(self, changes: List[Change], movies: Callable[[], List[Dict]]) -> bool:
+        conn = self._conn()
+        try:
+            with self._write_lock, conn:
+                for event, key, entry in changes:
+                    if event == "add":
+                        conn.execute("INSERT INTO movies(id, title, norm_title, msg_id, file_url, data) "
+                                     "VALUES (?,?,?,?,?,?)", self._row(key, entry))
+                    elif event == "update":
+                        row = self._row(key, entry)
+                        conn.execute("UPDATE movies SET title=?, norm_title=?, msg_id=?, file_url=?, data=? "
+                                     "WHERE id=?", row[1:] + (key,))
+                    elif event == "delete":
+                        conn.execute("DELETE FROM movies WHERE id=?", (key,))
+            return True
+        except sqlite3.IntegrityError as e:
+            logger.warning("sqlite: change rejected (%s): %s", e, [(ev, k) for ev, k, _ in changes])
+            return False
+        except Exception:
+            logger.exception("catalog save error")
+            return False
+
+    def search(self, tokens: Iterable[str], limit: int = 200) -> List[int]:
+        """Ids whose normalized title contains every token (FTS5 MATCH)."""
+        terms = [t for t in tokens if t]
+        if not terms:
+            return []
+        match = " ".join('"%s"' % t.replace('"', '""') for t in terms)
+        rows = self._conn().execute(
+            "SELECT rowid FROM movies_fts WHERE movies_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def make_storage(kind: str, json_path: str = "movie_list.json", db_path: str = "movies.db",
+                 max_records: int = 5000, max_bytes: int = 8 * 1024 * 1024):
+    """Backend for a CATALOG_STORAGE value: "json", "journal" or "sqlite"."""
+    if kind == "sqlite":
+        return SqliteStorage(db_path)
+    if kind == "journal":
+        return JournalStorage(json_path, max_records=max_records, max_bytes=max_bytes)
+    if kind != "json":
+        raise ValueError(f"Unknown CATALOG_STORAGE: {kind}")
+    return JsonFileStorage(json_path)
+
+
+# -------------------------
+# movie_list.json <-> SQLite
+# -------------------------
+def import_json(json_path: str, db_path: str) -> Tuple[int, int]:
+    """Load movie_list.json into the database; returns (stored, skipped)."""
+    from catalog import Catalog
+    movies, dupes = split_duplicates(Catalog(json_path).snapshot().movies)
+    if dupes:
+        log_duplicates("import: skipped, duplicate msg_id/file_url", dupes)
+    db = SqliteStorage(db_path)
+    ok = db.write_all(movies)
+    db.close()
+    if not ok:
+        raise RuntimeError(f"could not write {db_path}")
+    return len(movies), len(dupes)
+
+
+def export_json(db_path: str, json_path: str) -> int:
+    """Write the database out in movie_list.json format; returns the count."""
+    db = SqliteStorage(db_path)
+    movies = db.load() or []
+    db.close()
+    write_json_atomic(json_path, movies)
+    return len(movies)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Move the movie catalog between movie_list.json and SQLite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("import", help="movie_list.json -> SQLite")
+    p.add_argument("json_path")
+    p.add_argument("db_path")
+    p = sub.add_parser("export", help="SQLite -> movie_list.json")
+    p.add_argument("db_path")
+    p.add_argument("json_path")
+    args = parser.parse_args()
+    if args.cmd == "import":
+        stored, skipped = import_json(args.json_path, args.db_path)
+        print(f"✅ Imported {stored} movies into {args.db_path} ({skipped} duplicates skipped)")
+    else:
+        count = export_json(args.db_path, args.json_path)
+        print(f"✅ Exported {count} movies to {args.json_path}")
@@ -0,0 +1,44 @@
+# Tests import the top-level modules (catalog.py, storage.py, ...) directly.
+import os
+import sys
+import asyncio
+import logging
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    # pyrogram queues handler registrations on a loop that never runs here
+    config.addinivalue_line("filterwarnings", "ignore:coroutine 'Dispatcher.add_handler:RuntimeWarning")
+
+
+BOT_ENV = {"ADMIN_PASSWORD": "pw", "API_ID": "1", "API_HASH": "x", "BOT_TOKEN": "1:x", "CHANNEL_ID": "-1001",
+           "LOG_FILE": "", "METRICS_TOKEN": "secret"}
+
+
+@pytest.fixture(scope="session")
+def bot_loop():
+    """Event loop for bot.py: its scheduler and caches stay bound to one loop."""
+    loop = asyncio.new_event_loop()
+    # pyrogram's Client wants a current event loop when bot.py creates it
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory, bot_loop):
+    """bot.py imported once, with its files (movie_list.json, caches) in a temp dir."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp("bot"))
+        for name, value in BOT_ENV.items():
+            mp.setenv(name, value)
+        import bot
+        # let pytest see the records again instead of bot's queue handler
+        logger = logging.getLogger("sara_bot")
+        logger.removeHandler(bot.log_listener.queue_handler)
+        logger.propagate = True
+        yield bot
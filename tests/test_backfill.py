@@ -0,0 +1,125 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+from backfill import Backfill, ChannelIndexer
+from catalog import Catalog, PersistError
+from fake_telegram import FakeClient, fake_post
+from storage import JsonFileStorage, SqliteStorage
+
+CHAT_ID = -1001
+
+
+def post(msg_id, title, url="", file_name=None):
+    caption = f"{title}\n{url}" if url else title
+    return fake_post(msg_id, caption, file_name or f"{title.replace(' ', '.')}.mkv", CHAT_ID)
+
+
+def entry(msg_id, title, url=""):
+    return {"title": title, "msg_id": msg_id, "filename": f"{title}.mkv", "file_url": url}
+
+
+def sqlite_catalog(tmp_path):
+    return Catalog(str(tmp_path / "movies.db"), storage=SqliteStorage(str(tmp_path / "movies.db")))
+
+
+def test_same_url_in_one_batch_becomes_one_entry(tmp_path):
+    catalog = sqlite_catalog(tmp_path)
+    indexer = ChannelIndexer(catalog)
+
+    # a re-post of the same link, and an edited post, inside one commit
+    added, updated = indexer.upsert([entry(10, "Kantara", "https://x/k.mkv"), entry(11, "Kantara HD", "https://x/k.mkv"),
+                                     entry(12, "Leo"), entry(12, "Leo (2023)")])
+
+    assert (added, updated) == (2, 0)
+    assert sorted((m["msg_id"], m["title"]) for m in catalog.snapshot().movies) == [
+        (11, "Kantara HD"), (12, "Leo (2023)")]
+
+
+def test_known_url_links_the_entry_to_the_new_post(tmp_path):
+    catalog = sqlite_catalog(tmp_path)
+    key = catalog.add({"title": "Kantara", "file_url": "https://x/k.mkv"})
+    indexer = ChannelIndexer(catalog)
+
+    assert indexer.upsert([entry(20, "Kantara", "https://x/k.mkv")]) == (0, 1)
+    assert catalog.key_for_msg(20) == key
+    # lookups follow the catalog: once the entry is deleted the post is added again
+    catalog.delete([key])
+    assert indexer.upsert([entry(20, "Kantara", "https://x/k.mkv")]) == (1, 0)
+
+
+def test_refused_batch_leaves_the_catalog_unchanged(tmp_path):
+    catalog = sqlite_catalog(tmp_path)
+    catalog.extend([entry(1, "Kantara"), entry(2, "Leo")])
+    before = catalog.snapshot()
+    indexer = ChannelIndexer(catalog)
+
+    def refuse(changes, movies):
+        return False
+    catalog.storage.record = refuse
+
+    # two edited posts and a new one: nothing of it may stick
+    with pytest.raises(PersistError):
+        indexer.upsert([entry(1, "Kantara Chapter 1"), entry(2, "Leo (2023)"), entry(3, "Jailer")])
+
+    after = catalog.snapshot()
+    assert (after.version, after.movies) == (before.version, before.movies)
+    assert catalog.key_for_msg(3) is None
+    assert (indexer.added, indexer.updated) == (0, 0)
+    assert [m["title"] for m in SqliteStorage(str(tmp_path / "movies.db")).load()] == ["Kantara", "Leo"]
+
+
+def test_batch_is_one_json_write(tmp_path):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps([dict(entry(i, f"Movie {i}"), id=i) for i in range(1, 6)]), encoding="utf-8")
+    storage = JsonFileStorage(str(path))
+    writes = []
+    write_all = storage.write_all
+    storage.write_all = lambda movies: writes.append(len(movies)) or write_all(movies)
+    indexer = ChannelIndexer(Catalog(str(path), storage=storage))
+
+    assert indexer.upsert([entry(i, f"Movie {i} HD") for i in range(1, 6)] + [entry(6, "Movie 6")]) == (1, 5)
+    assert writes == [6]
+
+
+def test_refused_batch_is_not_counted_or_checkpointed(tmp_path):
+    catalog = sqlite_catalog(tmp_path)
+    commits = []
+    indexer = ChannelIndexer(catalog, on_commit=lambda added, updated: commits.append((added, updated)))
+    refused = []
+
+    def refuse(changes, movies):
+        refused.append(changes)
+        return False
+    catalog.storage.record = refuse
+
+    channel = {i: post(i, f"Movie {i}") for i in range(1, 6)}
+    checkpoint = str(tmp_path / "checkpoint.json")
+    backfill = Backfill(FakeClient(channel), indexer, CHAT_ID, checkpoint, batch_size=10, max_empty=1)
+
+    with pytest.raises(PersistError):
+        asyncio.run(backfill.run())
+
+    assert refused and not os.path.exists(checkpoint)
+    assert (indexer.added, commits, backfill.stats["added"]) == (0, [], 0)
+    assert catalog.snapshot().movies == ()
+
+
+def test_backfill_resumes_after_the_checkpoint(tmp_path):
+    catalog = sqlite_catalog(tmp_path)
+    channel = {i: post(i, f"Movie {i}") for i in range(1, 6)}
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    stats = asyncio.run(Backfill(FakeClient(channel), ChannelIndexer(catalog), CHAT_ID, checkpoint,
+                                 batch_size=10, max_empty=1).run())
+    assert stats["added"] == 5
+    assert json.load(open(checkpoint, encoding="utf-8"))["last_msg_id"] == 5
+
+    channel[6] = post(6, "Movie 6")
+    stats = asyncio.run(Backfill(FakeClient(channel), ChannelIndexer(catalog), CHAT_ID, checkpoint,
+                                 batch_size=10, max_empty=1).run())
+    # only msg 6 was read again
+    assert (stats["added"], stats["posts"]) == (1, 1)
+    assert len(catalog.snapshot().movies) == 6
@@ -0,0 +1,84 @@
+import pytest
+
+from delivery import DeliveryScheduler
+from fake_telegram import FakeClient, fake_callback, fake_message
+from test_bot_search import ask, settle
+
+QID = "0a1b2c3d"
+
+
+@pytest.fixture
+def paged(bot, bot_loop, monkeypatch):
+    """Chat 5 asked for "leo" and got page 1 of 3 (2 results per page)."""
+    bot.catalog.save([{"title": f"Leo Part {i}", "msg_id": 10 + i} for i in range(1, 6)])
+    bot.result_pages.clear()
+    monkeypatch.setattr(bot, "RESULTS_PAGE_SIZE", 2)
+    monkeypatch.setattr(bot.secrets, "token_hex", lambda n: QID)
+    # no rate limits: pages are sent back to back
+    monkeypatch.setattr(bot, "delivery", DeliveryScheduler(global_rate=1000, global_burst=1000,
+                                                           chat_rate=1000, chat_burst=1000))
+    client = FakeClient()
+    ask(bot, bot_loop, client, "leo")
+    return client
+
+
+def press(bot, bot_loop, client, data, chat_id=5):
+    query = fake_callback(data, fake_message(99, chat_id, client=client))
+
+    async def run():
+        await bot.handle_page(client, query)
+        await settle(bot)
+    bot_loop.run_until_complete(run())
+    return query
+
+
+def forwards(client):
+    return [ids for kind, _, ids in client.sent if kind == "forward"]
+
+
+def test_next_button_sends_the_next_page(bot, bot_loop, paged):
+    assert forwards(paged) == [[11, 12]]
+    paged.sent.clear()
+
+    query = press(bot, bot_loop, paged, f"pg:{QID}:1")
+
+    assert query.answers == [(None, False)]
+    assert forwards(paged) == [[13, 14]]
+    caption = [text for kind, _, text in paged.sent if kind == "message"][0]
+    assert caption.startswith("🎬 Matches for: leo\n3. ") and "Page 2/3 · 5 results" in caption
+    # the pressed page loses its buttons
+    assert ("edit_markup", 5, 99) in paged.sent
+
+
+def test_page_past_the_end_sends_the_last_page(bot, bot_loop, paged):
+    paged.sent.clear()
+    press(bot, bot_loop, paged, f"pg:{QID}:7")
+    assert forwards(paged) == [[15]]
+
+
+def test_expired_results_only_get_an_alert(bot, bot_loop, paged):
+    bot.result_pages.clear()
+    paged.sent.clear()
+
+    query = press(bot, bot_loop, paged, f"pg:{QID}:1")
+
+    assert len(query.answers) == 1 and query.answers[0][1] is True
+    assert paged.sent == []
+
+
+def test_button_from_another_chat_is_refused(bot, bot_loop, paged):
+    paged.sent.clear()
+
+    query = press(bot, bot_loop, paged, f"pg:{QID}:1", chat_id=6)
+
+    assert query.answers[0][1] is True
+    assert paged.sent == []
+
+
+def test_malformed_callback_data_is_ignored(bot, bot_loop, paged):
+    paged.sent.clear()
+
+    query = press(bot, bot_loop, paged, "pg:nonsense")
+
+    assert query.answers == [(None, False)]
+    assert paged.sent == []
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from fake_telegram import FakeClient, fake_message, fake_user
+
+
+async def settle(bot):
+    # let the delivery scheduler send what the handler queued
+    await asyncio.sleep(0)
+    while bot.delivery.queued or bot.delivery.stats()["inflight"]:
+        await asyncio.sleep(0.01)
+
+
+def ask(bot, bot_loop, client, text, chat_id=5, user_id=1, msg_id=1):
+    msg = fake_message(msg_id, chat_id, text=text, from_user=fake_user(user_id), client=client)
+
+    async def run():
+        await bot.handle_text(client, msg)
+        await settle(bot)
+    bot_loop.run_until_complete(run())
+
+
+@pytest.fixture
+def searches(bot, monkeypatch):
+    bot.catalog.save([{"title": "Kantara (2022)", "msg_id": 1}, {"title": "Leo", "msg_id": 2}])
+    bot.query_cache.clear()
+    calls = []
+    match = bot.search_pool.match
+
+    async def recording_match(query):
+        calls.append(query)
+        return await match(query)
+    monkeypatch.setattr(bot.search_pool, "match", recording_match)
+    return calls
+
+
+def test_queries_sharing_a_cache_key_search_that_key(bot, bot_loop, searches):
+    client = FakeClient()
+    ask(bot, bot_loop, client, "Kantara (2022)")
+    ask(bot, bot_loop, client, "kantara: 2022", msg_id=2)
+
+    # one search, on the normalized text, answers both
+    assert searches == ["kantara 2022"]
+    assert [p for kind, _, p in client.sent if kind == "forward"] == [[1], [1]]
+
+
+def test_group_duplicates_are_skipped_unless_the_search_failed(bot, bot_loop, searches, monkeypatch):
+    monkeypatch.setattr(bot, "recent_requests", bot.RecentRequests(window=60))
+    client = FakeClient()
+
+    async def busy(query):
+        raise bot.SearchBusy()
+    with monkeypatch.context() as m:
+        m.setattr(bot.search_pool, "match", busy)
+        ask(bot, bot_loop, client, "Leo", chat_id=-100)
+    # the failed request was forgotten: asking again gets an answer
+    ask(bot, bot_loop, client, "Leo", chat_id=-100, user_id=2, msg_id=2)
+    ask(bot, bot_loop, client, "leo", chat_id=-100, user_id=3, msg_id=3)
+
+    assert [p for kind, _, p in client.sent if kind == "forward"] == [[2]]
+    assert bot.recent_requests.suppressed == 1
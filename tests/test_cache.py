@@ -0,0 +1,43 @@
+import time
+
+from cache import RecentRequests
+
+
+def test_second_request_in_the_window_is_refused():
+    recent = RecentRequests(window=60)
+
+    assert recent.mark(-100, "kantara")
+    assert not recent.mark(-100, "kantara")
+    # other chats and other titles are separate
+    assert recent.mark(-200, "kantara")
+    assert recent.mark(-100, "leo")
+    assert recent.stats() == {"size": 3, "suppressed": 1}
+
+
+def test_forget_lets_the_request_through_again():
+    recent = RecentRequests(window=60)
+    recent.mark(-100, "kantara")
+
+    recent.forget(-100, "kantara")
+    recent.forget(-100, "never marked")
+
+    assert recent.mark(-100, "kantara")
+
+
+def test_requests_expire_after_the_window():
+    recent = RecentRequests(window=0.05)
+    recent.mark(-100, "kantara")
+
+    time.sleep(0.06)
+
+    assert recent.mark(-100, "kantara")
+    assert recent.suppressed == 0
+
+
+def test_oldest_requests_are_dropped_past_max_size():
+    recent = RecentRequests(window=60, max_size=2)
+    for title in ("a", "b", "c"):
+        recent.mark(-100, title)
+
+    assert recent.mark(-100, "a")
+    assert not recent.mark(-100, "c")
@@ -0,0 +1,48 @@
+import json
+
+from catalog import Catalog
+
+
+def make_catalog(tmp_path, movies=()):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps(list(movies)), encoding="utf-8")
+    return Catalog(str(path))
+
+
+def test_key_for_url_survives_deleting_one_of_two_entries(tmp_path):
+    catalog = make_catalog(tmp_path)
+    first = catalog.add({"title": "A", "file_url": "https://x/a.mkv"})
+    second = catalog.add({"title": "A (again)", "file_url": "https://x/a.mkv"})
+    assert catalog.key_for_url("https://x/a.mkv") == first
+
+    catalog.delete([first])
+    assert catalog.key_for_url("https://x/a.mkv") == second
+
+    catalog.update(second, {"file_url": "https://x/b.mkv"})
+    assert catalog.key_for_url("https://x/a.mkv") is None
+    assert catalog.key_for_url("https://x/b.mkv") == second
+
+
+def test_key_for_msg(tmp_path):
+    catalog = make_catalog(tmp_path, [{"title": "Old", "msg_id": 7}, {"title": "No post", "msg_id": 0}])
+    assert catalog.key_for_msg(7) == catalog.snapshot().keys[0]
+    assert catalog.key_for_msg(0) is None
+
+    key = catalog.add({"title": "New", "msg_id": "12"})
+    assert catalog.key_for_msg(12) == key
+    catalog.delete([key])
+    assert catalog.key_for_msg(12) is None
+
+
+def test_ids_given_at_load_are_written_back(tmp_path):
+    catalog = make_catalog(tmp_path, [{"title": "Kantara"}, {"title": "Leo"}])
+    ids = {m["title"]: m["id"] for m in catalog.snapshot().movies}
+    path = tmp_path / "movie_list.json"
+    assert {m["title"]: m["id"] for m in json.loads(path.read_text(encoding="utf-8"))} == ids
+
+    # a hand edit puts a new movie first; the admin panel's ids still point at the same movies
+    movies = json.loads(path.read_text(encoding="utf-8"))
+    path.write_text(json.dumps([{"title": "Jailer"}] + movies), encoding="utf-8")
+    restarted = Catalog(str(path))
+    assert restarted.get(ids["Leo"])["title"] == "Leo"
+    assert restarted.get(ids["Kantara"])["title"] == "Kantara"
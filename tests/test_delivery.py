@@ -0,0 +1,108 @@
+import time
+import asyncio
+
+from delivery import DeliveryScheduler, TokenBucket
+
+
+class FloodWait(Exception):
+    # delivery.flood_wait_seconds() also recognizes FloodWait by name
+    def __init__(self, value):
+        super().__init__(f"wait {value}s")
+        self.value = value
+
+
+def scheduler(**kwargs):
+    return DeliveryScheduler(global_rate=1000, global_burst=1000, chat_rate=1000, chat_burst=1000, **kwargs)
+
+
+def flooding_send(log, name, delay):
+    """Send that gets one FloodWait of ``delay`` seconds, then succeeds."""
+    state = {"flooded": False}
+
+    async def send():
+        if not state["flooded"]:
+            state["flooded"] = True
+            raise FloodWait(delay)
+        log.append((name, time.monotonic()))
+        return name
+    return send
+
+
+def plain_send(log, name):
+    async def send():
+        log.append((name, time.monotonic()))
+        return name
+    return send
+
+
+def test_flood_wait_pauses_only_its_chat():
+    async def run():
+        d = scheduler()
+        log = []
+        started = time.monotonic()
+        flooded = d.submit(1, flooding_send(log, "a", 0.3))
+        others = [d.submit(2, plain_send(log, f"b{i}")) for i in range(3)]
+        await asyncio.gather(flooded, *others)
+        return d, log, started
+
+    d, log, started = asyncio.run(run())
+    times = dict(log)
+    assert all(times[f"b{i}"] - started < 0.2 for i in range(3))
+    assert times["a"] - started >= 0.3
+    assert d.flood_waits == 1 and d.global_pauses == 0
+
+
+def test_flood_waits_in_many_chats_pause_everything():
+    async def run():
+        d = scheduler(global_flood_chats=3)
+        log = []
+        started = time.monotonic()
+        flooded = [d.submit(chat, flooding_send(log, f"c{chat}", 0.3)) for chat in (1, 2, 3)]
+        await asyncio.sleep(0.05)
+        late = d.submit(4, plain_send(log, "late"))
+        await asyncio.gather(late, *flooded)
+        return d, log, started
+
+    d, log, started = asyncio.run(run())
+    assert dict(log)["late"] - started >= 0.3
+    assert d.flood_waits == 3 and d.global_pauses == 1
+
+
+def test_first_jobs_run_before_the_rest_of_the_chat():
+    async def run():
+        d = scheduler()
+        log = []
+
+        async def batch():
+            # a failed batch re-queues its items one by one, ahead of later jobs
+            for name in reversed(["item1", "item2"]):
+                d.submit(1, plain_send(log, name), first=True)
+            log.append(("batch", 0))
+
+        futures = [d.submit(1, batch), d.submit(1, plain_send(log, "next"))]
+        await asyncio.gather(*futures)
+        while d.queued or d.stats()["inflight"]:
+            await asyncio.sleep(0.01)
+        return log
+
+    assert [name for name, _ in asyncio.run(run())] == ["batch", "item1", "item2", "next"]
+
+
+def test_a_job_bigger_than_the_bucket_leaves_one_bucket_of_debt():
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert bucket.wait_time(10) == 0
+    bucket.take(10)
+    assert bucket.tokens == -3
+    assert 0.39 < bucket.wait_time(1) <= 0.4
+
+
+def test_album_does_not_stall_the_chat_for_its_whole_cost():
+    async def run():
+        d = DeliveryScheduler(global_rate=1000, global_burst=1000, chat_rate=10, chat_burst=3)
+        log = []
+        await asyncio.gather(d.submit(1, plain_send(log, "album"), cost=10), d.submit(1, plain_send(log, "next")))
+        return dict(log)
+
+    times = asyncio.run(run())
+    # 4 tokens to refill at 10/s, not the 8 the album would have owed
+    assert 0.35 < times["next"] - times["album"] < 0.6
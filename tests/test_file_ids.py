@@ -0,0 +1,48 @@
+import asyncio
+import json
+import threading
+
+from file_ids import FileIdCache
+
+
+def test_set_get_and_persist(tmp_path):
+    path = tmp_path / "file_ids.json"
+    cache = FileIdCache(str(path))
+    assert cache.get("https://x/a.mkv") is None
+
+    cache.set("https://x/a.mkv", "AAA")
+    cache.set("https://x/b.mkv", "")
+    assert cache.get("https://x/a.mkv") == "AAA"
+    # "" = the old file_id was rejected; not the same as unknown
+    assert cache.get("https://x/b.mkv") == ""
+
+    reloaded = FileIdCache(str(path))
+    assert reloaded.get("https://x/a.mkv") == "AAA"
+
+
+def test_saves_off_the_event_loop_coalesced(tmp_path):
+    path = tmp_path / "file_ids.json"
+    cache = FileIdCache(str(path))
+    save, threads = cache.save, []
+    cache.save = lambda: (threads.append(threading.current_thread()), save())[1]
+
+    async def learn():
+        for i in range(50):
+            cache.set(f"https://x/{i}.mkv", f"id{i}")
+        for _ in range(100):
+            if not cache.dirty:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(learn())
+    assert threads and threading.main_thread() not in threads
+    assert cache.saves < 50
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 50
+
+
+def test_setting_the_same_value_writes_nothing(tmp_path):
+    cache = FileIdCache(str(tmp_path / "file_ids.json"))
+    cache.set("https://x/a.mkv", "")
+    saves = cache.saves
+    cache.set("https://x/a.mkv", "")
+    assert cache.saves == saves and not cache.dirty
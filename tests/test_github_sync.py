@@ -0,0 +1,124 @@
+import json
+import time
+
+import pytest
+
+from fake_github import FakeGitHub, git_blob_sha
+from github_sync import GitHubSync
+from http_client import HttpClient
+
+REPO = "me/movies"
+PATH = "movie_list.json"
+
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def github():
+    with FakeGitHub() as fake:
+        yield fake
+
+
+@pytest.fixture
+def movies():
+    return [{"id": 1, "title": "Kantara"}]
+
+
+@pytest.fixture
+def make_sync(github, movies):
+    syncs = []
+
+    def make(**kwargs):
+        # no HTTP-level retries: the sync's own retry is what is under test
+        http = HttpClient(timeout=5, retries=0)
+        sync = GitHubSync("token", REPO, PATH, get_data=lambda: list(movies), api_url=github.url,
+                          http=http, **dict({"debounce": 0.1, "max_delay": 5.0, "backoff": 0.05}, **kwargs))
+        syncs.append(sync)
+        return sync
+    yield make
+    for sync in syncs:
+        sync.stop(flush=False)
+        sync.http.close()
+
+
+def uploaded(github):
+    return json.loads(github.content(REPO, PATH))
+
+
+def test_changes_in_the_debounce_window_become_one_put(github, movies, make_sync):
+    sync = make_sync()
+    for i in range(2, 7):
+        movies.append({"id": i, "title": f"Movie {i}"})
+        sync.mark_dirty()
+
+    wait_for(lambda: sync.commits == 1)
+    time.sleep(0.3)
+    assert github.puts == 1
+    assert len(uploaded(github)) == 6
+    assert sync.status()["pending_changes"] == 0
+
+
+def test_sha_of_the_last_put_is_reused(github, movies, make_sync):
+    sync = make_sync()
+    sync.mark_dirty()
+    wait_for(lambda: sync.commits == 1)
+    movies.append({"id": 2, "title": "Leo"})
+    sync.mark_dirty()
+    wait_for(lambda: sync.commits == 2)
+
+    # one GET for the (missing) file, then only PUTs
+    assert [method for method, _ in github.requests] == ["GET", "PUT", "PUT"]
+    assert [m["title"] for m in uploaded(github)] == ["Kantara", "Leo"]
+
+
+def test_conflict_refetches_the_sha_and_retries(github, movies, make_sync):
+    sync = make_sync()
+    sync.mark_dirty()
+    wait_for(lambda: sync.commits == 1)
+    # someone edits the file on GitHub: the SHA the sync holds is stale
+    edited = b"[]"
+    github.files[(REPO, PATH)] = (edited, git_blob_sha(edited))
+    github.requests.clear()
+
+    movies.append({"id": 2, "title": "Leo"})
+    sync.mark_dirty()
+    wait_for(lambda: sync.commits == 2)
+
+    assert [method for method, _ in github.requests] == ["PUT", "GET", "PUT"]
+    assert len(uploaded(github)) == 2
+
+
+def test_server_error_is_retried_after_backoff(github, make_sync):
+    sync = make_sync()
+    github.fail_next(2, status=502)
+    sync.mark_dirty()
+
+    wait_for(lambda: sync.commits == 1)
+    assert sync.status()["failures"] == 0 and sync.status()["last_error"] is None
+    assert uploaded(github) == [{"id": 1, "title": "Kantara"}]
+
+
+def test_status_reports_lag_and_the_last_error(github, make_sync):
+    sync = make_sync(backoff=60.0, max_backoff=60.0)
+    sync.mark_dirty()
+    wait_for(lambda: sync.commits == 1)
+    assert sync.status()["lag_seconds"] == 0
+
+    github.fail_next(1, status=500)
+    sync.mark_dirty()
+    wait_for(lambda: sync.status()["failures"] == 1)
+    time.sleep(0.2)
+
+    status = sync.status()
+    # the change waits for the (long) backoff and is still counted as pending
+    assert status["pending_changes"] == 1 and status["lag_seconds"] >= 0.2
+    assert status["last_error"].startswith("500")
+    # flush() skips the backoff
+    assert sync.flush(timeout=5)
+    status = sync.status()
+    assert (status["commits"], status["lag_seconds"], status["last_error"]) == (2, 0, None)
@@ -0,0 +1,164 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import CircuitOpen, HttpClient
+
+
+class StubServer:
+    """Answers each request with the next queued (status, headers), then 200s.
+
+    ``delay`` holds every response; ``max_active`` is the most requests that
+    were in the handler at once.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.hits = 0
+        self.delay = 0.0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def host(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}/"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def _answer(self):
+                with stub._lock:
+                    stub.hits += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    status, headers = stub.replies.pop(0) if stub.replies else (200, {})
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.active -= 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_GET = do_PUT = do_POST = _answer
+
+        return Handler
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(**kwargs):
+        client = HttpClient(**dict({"timeout": 5, "backoff": 0.01}, **kwargs))
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_server_errors_are_retried_with_backoff(stub, make_client):
+    client = make_client(retries=2)
+    stub.replies = [(503, {}), (502, {})]
+
+    assert client.get(stub.url).status_code == 200
+    assert stub.hits == 3
+
+    # out of retries: the last response is returned
+    stub.replies = [(500, {})] * 3
+    assert client.get(stub.url).status_code == 500
+    assert stub.hits == 6
+
+
+def test_post_is_not_retried(stub, make_client):
+    client = make_client(retries=2)
+    stub.replies = [(503, {})]
+
+    assert client.request("POST", stub.url).status_code == 503
+    assert stub.hits == 1
+
+
+def test_429_waits_for_retry_after(stub, make_client):
+    client = make_client(retries=1, max_backoff=5)
+    stub.replies = [(429, {"Retry-After": "1"})]
+
+    started = time.monotonic()
+    assert client.get(stub.url).status_code == 200
+    # backoff alone would have been ~10ms
+    assert time.monotonic() - started >= 0.9
+    assert stub.hits == 2
+
+
+def test_breaker_opens_then_lets_one_trial_through(stub, make_client):
+    client = make_client(retries=0, breaker_threshold=2, breaker_reset=0.2)
+    stub.replies = [(500, {}), (500, {})]
+    client.get(stub.url)
+    client.get(stub.url)
+
+    # open: fails without calling the host
+    with pytest.raises(CircuitOpen):
+        client.get(stub.url)
+    assert stub.hits == 2
+    assert client.stats()[stub.host]["state"] == "open"
+
+    # half-open: while the trial call is in flight, other calls are refused
+    time.sleep(0.25)
+    stub.delay = 0.2
+    stub.replies = [(500, {})]
+    trial = threading.Thread(target=client.get, args=(stub.url,))
+    trial.start()
+    time.sleep(0.05)
+    with pytest.raises(CircuitOpen):
+        client.get(stub.url)
+    trial.join()
+    # the failed trial opens the breaker again at once
+    assert client.stats()[stub.host]["state"] == "open"
+
+    time.sleep(0.25)
+    stub.delay = 0.0
+    assert client.get(stub.url).status_code == 200
+    assert client.stats()[stub.host]["state"] == "closed"
+    assert stub.hits == 4
+
+
+def test_per_host_concurrency_is_capped(stub, make_client):
+    client = make_client(per_host=2)
+    stub.delay = 0.1
+
+    threads = [threading.Thread(target=client.get, args=(stub.url,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert stub.hits == 6
+    assert stub.max_active == 2
+    assert client.stats()[stub.host]["rejected"] == 0
@@ -0,0 +1,103 @@
+import json
+
+from catalog import Catalog
+from importer import import_text
+from storage import JournalStorage, JsonFileStorage
+from updater import import_file
+
+
+def json_catalog(tmp_path, movies=()):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps(list(movies)), encoding="utf-8")
+    return Catalog(str(path))
+
+
+def test_duplicates_against_the_catalog_and_the_upload(tmp_path):
+    catalog = json_catalog(tmp_path, [{"title": "Kantara", "file_url": "https://x/k.mkv", "msg_id": 0}])
+    text = "\n".join([
+        "Kantara HD | https://x/k.mkv | k.mkv",   # 1: URL already in the catalog
+        "Jailer | https://x/j.mkv | j.mkv",       # 2: new
+        "Jailer again | https://x/j.mkv |",       # 3: URL repeated in this upload
+        "jailer | https://x/j2.mkv | J.MKV",      # 4: same title + filename as line 2
+        "Leo | https://x/leo.mkv",                # 5: new
+    ])
+
+    report = import_text(catalog, text, fmt="pipe")
+
+    assert (report.lines, report.added, report.duplicates, report.invalid) == (5, 2, 3, 0)
+    assert [(line, reason) for line, reason, _ in report.rejects] == [
+        (1, "duplicate file_url"), (3, "duplicate file_url"), (4, "duplicate title/filename")]
+    assert [m["title"] for m in catalog.snapshot().movies] == ["Kantara", "Jailer", "Leo"]
+    # learned file_ids live in file_ids.json, not in catalog entries
+    assert not any("file_id" in m for m in catalog.snapshot().movies)
+
+
+def test_same_title_without_filename_is_told_apart_by_its_link(tmp_path):
+    catalog = json_catalog(tmp_path, [{"title": "Kantara", "file_url": "https://x/k1.mkv", "msg_id": 0}])
+    text = "\n".join([
+        "Kantara | https://x/k2.mkv",       # 1: another part, no filename
+        "Kantara | https://x/k3.mkv |",     # 2: and another
+        "Kantara | https://x/k2.mkv",       # 3: line 1 again
+    ])
+
+    report = import_text(catalog, text, fmt="pipe")
+
+    assert (report.added, report.duplicates) == (2, 1)
+    assert [m["file_url"] for m in catalog.snapshot().movies] == [
+        "https://x/k1.mkv", "https://x/k2.mkv", "https://x/k3.mkv"]
+
+
+def test_invalid_rows_are_reported_with_their_line(tmp_path):
+    catalog = json_catalog(tmp_path)
+    text = "title,file_url,filename,msg_id\n" \
+           "Kantara,,,12\n" \
+           ",https://x/none.mkv,,\n" \
+           "Leo,,,\n" \
+           "Jailer,,,abc\n"
+
+    report = import_text(catalog, text, fmt="csv", max_rejects=2)
+
+    assert (report.added, report.invalid) == (1, 3)
+    # only the first max_rejects are kept, the counts cover all of them
+    assert [(line, reason) for line, reason, _ in report.rejects] == [
+        (3, "missing title"), (4, "needs file_url or msg_id")]
+
+
+class RefusingStorage(JsonFileStorage):
+    """Refuses any change that adds a movie titled "Bad"."""
+
+    def record(self, changes, movies):
+        if any(entry and entry.get("title") == "Bad" for _, _, entry in changes):
+            return False
+        return super().record(changes, movies)
+
+
+def test_refused_batch_is_retried_row_by_row(tmp_path):
+    path = tmp_path / "movie_list.json"
+    path.write_text("[]", encoding="utf-8")
+    catalog = Catalog(str(path), storage=RefusingStorage(str(path)))
+
+    report = import_text(catalog, '{"title": "Good", "msg_id": 1}\n{"title": "Bad", "msg_id": 2}\n'
+                                  '{"title": "Fine", "msg_id": 3}\n', fmt="jsonl")
+
+    assert (report.added, report.invalid) == (2, 1)
+    assert report.rejects[0][:2] == (2, "refused by the storage")
+    assert [m["title"] for m in json.loads(path.read_text(encoding="utf-8"))] == ["Good", "Fine"]
+
+
+def test_updater_imports_into_the_configured_journal(tmp_path, monkeypatch):
+    monkeypatch.setenv("CATALOG_STORAGE", "journal")
+    json_path = tmp_path / "movie_list.json"
+    json_path.write_text(json.dumps([{"id": 1, "title": "Kantara", "msg_id": 1}]), encoding="utf-8")
+    # the bot already journaled id 2; an importer that ignored the journal would reuse it
+    bot_catalog = Catalog(str(json_path), storage=JournalStorage(str(json_path)))
+    bot_catalog.add({"title": "Jailer", "msg_id": 2})
+    bot_catalog.close()
+    upload = tmp_path / "new.jsonl"
+    upload.write_text('{"title": "Jailer", "msg_id": 2}\n{"title": "Leo", "msg_id": 3}\n', encoding="utf-8")
+
+    report = import_file(str(upload), json_path=str(json_path))
+
+    assert (report.added, report.duplicates) == (1, 1)
+    reloaded = Catalog(str(json_path), storage=JournalStorage(str(json_path)))
+    assert {k: m["title"] for k, m in reloaded.items()} == {1: "Kantara", 2: "Jailer", 3: "Leo"}
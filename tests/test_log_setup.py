@@ -0,0 +1,37 @@
+import time
+import logging
+
+from log_setup import RateLimitFilter
+
+
+def record(level, lineno=10, msg="x"):
+    return logging.LogRecord("sara_bot", level, "bot.py", lineno, msg, None, None)
+
+
+def test_warnings_past_the_burst_are_suppressed_and_counted():
+    limit = RateLimitFilter(burst=3, window=60)
+
+    passed = [limit.filter(record(logging.WARNING)) for _ in range(5)]
+
+    assert passed == [True, True, True, False, False]
+    assert limit.suppressed == 2
+    # another call site has its own budget
+    assert limit.filter(record(logging.WARNING, lineno=11))
+
+
+def test_info_audit_lines_are_never_limited():
+    limit = RateLimitFilter(burst=3, window=60)
+
+    # e.g. one "Admin bulk deleted id=..." line per removed movie
+    assert all(limit.filter(record(logging.INFO, msg=f"Admin bulk deleted id={i}")) for i in range(100))
+    assert limit.suppressed == 0
+
+
+def test_first_record_after_the_window_reports_the_suppressed_count():
+    limit = RateLimitFilter(burst=1, window=0.05)
+    assert limit.filter(record(logging.ERROR))
+    assert not limit.filter(record(logging.ERROR))
+
+    time.sleep(0.06)
+    rec = record(logging.ERROR)
+    assert limit.filter(rec) and rec.suppressed == 1
@@ -0,0 +1,85 @@
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+def test_render_text_format():
+    registry = Registry()
+    searches = registry.counter("sara_searches_total", "Searches answered", ("tier",))
+    searches.inc(tier="exact")
+    searches.inc(2, tier='fu"zzy')
+    registry.gauge("sara_queued", "Sends waiting", fn=lambda: 3)
+    seconds = registry.histogram("sara_search_seconds", "Search time", buckets=(0.1, 1.0))
+    seconds.observe(0.05)
+    seconds.observe(0.5)
+    seconds.observe(7)
+
+    assert registry.render().splitlines() == [
+        "# HELP sara_searches_total Searches answered",
+        "# TYPE sara_searches_total counter",
+        'sara_searches_total{tier="exact"} 1',
+        'sara_searches_total{tier="fu\\"zzy"} 2',
+        "# HELP sara_queued Sends waiting",
+        "# TYPE sara_queued gauge",
+        "sara_queued 3",
+        "# HELP sara_search_seconds Search time",
+        "# TYPE sara_search_seconds histogram",
+        'sara_search_seconds_bucket{le="0.1"} 1',
+        'sara_search_seconds_bucket{le="1"} 2',
+        'sara_search_seconds_bucket{le="+Inf"} 3',
+        "sara_search_seconds_sum 7.55",
+        "sara_search_seconds_count 3",
+    ]
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = Registry()
+    first = registry.counter("sara_x_total", "x")
+
+    assert registry.counter("sara_x_total", "x") is first
+    with pytest.raises(ValueError):
+        registry.gauge("sara_x_total", "x")
+    with pytest.raises(ValueError):
+        first.inc(tier="exact")
+
+
+def test_a_failing_callback_does_not_break_the_scrape():
+    registry = Registry()
+    registry.gauge("sara_broken", "Broken", fn=lambda: 1 / 0)
+    registry.counter("sara_ok_total", "Fine").inc()
+
+    text = registry.render()
+
+    assert "# sara_broken unavailable: ZeroDivisionError" in text
+    assert "sara_ok_total 1" in text
+
+
+def test_flask_metrics_needs_the_token(bot):
+    # conftest sets METRICS_TOKEN=secret
+    client = bot.flask_app.test_client()
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    resp = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert resp.status_code == 200 and resp.content_type == metrics.CONTENT_TYPE
+    assert "# TYPE sara_handler_seconds histogram" in resp.get_data(as_text=True)
+    assert client.get("/metrics?token=secret").status_code == 200
+
+
+def test_standalone_server_needs_the_token():
+    server = metrics.start_http_server(0, host="127.0.0.1", token="secret")
+    url = "http://127.0.0.1:%d/metrics" % server.server_address[1]
+    try:
+        with pytest.raises(HTTPError) as e:
+            urllib.request.urlopen(url, timeout=5)
+        assert e.value.code == 401
+        req = urllib.request.Request(url, headers={"Authorization": "Bearer secret"})
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            assert resp.status == 200 and resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,74 @@
+import gzip
+import json
+from email.utils import formatdate
+
+import pytest
+
+
+@pytest.fixture
+def client(bot):
+    bot.catalog.save([{"title": f"Movie {i}", "msg_id": i} for i in range(1, 8)])
+    return bot.flask_app.test_client()
+
+
+def test_etag_revalidation(bot, client):
+    first = client.get("/movies")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.json["count"] == 7
+
+    assert client.get("/movies", headers={"If-None-Match": etag}).status_code == 304
+    bot.catalog.add({"title": "Movie 8", "msg_id": 8})
+    again = client.get("/movies", headers={"If-None-Match": etag})
+    assert again.status_code == 200 and again.headers["ETag"] != etag
+
+
+def test_if_modified_since_needs_an_older_second(bot, client):
+    modified_at = bot.catalog.modified_at
+    same_second = formatdate(int(modified_at), usegmt=True)
+    next_second = formatdate(int(modified_at) + 1, usegmt=True)
+
+    # the same second may hide a later change: send the list again
+    assert client.get("/movies", headers={"If-Modified-Since": same_second}).status_code == 200
+    assert client.get("/movies", headers={"If-Modified-Since": next_second}).status_code == 304
+
+
+def test_etag_wins_over_if_modified_since(client):
+    later = formatdate(2 ** 31, usegmt=True)
+    resp = client.get("/movies", headers={"If-None-Match": 'W/"1"', "If-Modified-Since": later})
+    assert resp.status_code == 200
+
+
+def test_offset_paging(client):
+    page = client.get("/movies?limit=3&offset=3").json
+    assert [m["title"] for m in page["movies"]] == ["Movie 4", "Movie 5", "Movie 6"]
+    assert page["next_offset"] == 6
+    last = client.get("/movies?limit=3&offset=6").json
+    assert [m["title"] for m in last["movies"]] == ["Movie 7"] and last["next_offset"] is None
+
+
+def test_cursor_paging_skips_deleted_movies(bot, client):
+    first = client.get("/movies?limit=3&after=0").json
+    ids = [m["id"] for m in first["movies"]]
+    assert first["next_after"] == ids[-1]
+
+    bot.catalog.delete([ids[-1] + 1])
+    second = client.get(f"/movies?limit=3&after={first['next_after']}").json
+    assert [m["id"] for m in second["movies"]] == [ids[-1] + 2, ids[-1] + 3, ids[-1] + 4]
+    assert client.get("/movies?limit=x").status_code == 400
+
+
+def test_since_returns_changes_and_deletions(bot, client):
+    version = client.get("/movies?limit=1").json["version"]
+    key = bot.catalog.key_for_msg(2)
+    bot.catalog.update(key, {"title": "Movie 2 HD"})
+    bot.catalog.delete([bot.catalog.key_for_msg(3)])
+
+    delta = client.get(f"/movies?since={version}").json
+    assert [m["title"] for m in delta["movies"]] == ["Movie 2 HD"]
+    assert len(delta["deleted"]) == 1
+
+
+def test_gzip_when_accepted(client):
+    resp = client.get("/movies", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(resp.data))["count"] == 7
@@ -0,0 +1,88 @@
+import time
+
+import search
+from search import Matcher, SearchIndex, TIER_CORRECTED, TIER_EXACT, TIER_FUZZY, TIER_NONE, TIER_TOKENS
+
+
+def make_matcher(titles, **kwargs):
+    index = SearchIndex()
+    index.rebuild((i, {"id": i, "title": t}) for i, t in enumerate(titles, 1))
+    return Matcher(index, **kwargs)
+
+
+def titles(result):
+    return [e["title"] for e in result.entries]
+
+
+class Speller:
+    def __init__(self, fixes):
+        self.fixes = fixes
+
+    def correct_query(self, q):
+        return " ".join(self.fixes.get(w, w) for w in q.split())
+
+
+def test_exact_title_wins_over_longer_titles():
+    matcher = make_matcher(["Kantara Chapter 1", "Kantara", "Kantara (2022)"])
+
+    result = matcher.match("  KANTARA ")
+
+    assert (result.tier, titles(result)) == (TIER_EXACT, ["Kantara"])
+
+
+def test_token_tier_ranks_titles_with_fewer_extra_words_first():
+    matcher = make_matcher(["Kantara Chapter 1 Hindi Dubbed", "Leo", "Chapter 1 Kantara"])
+
+    result = matcher.match("kantara chapter")
+
+    assert result.tier == TIER_TOKENS
+    assert titles(result) == ["Chapter 1 Kantara", "Kantara Chapter 1 Hindi Dubbed"]
+    assert [score for score, _ in result.matches] == [66, 40]
+
+
+def test_corrected_tier_runs_before_fuzzy():
+    matcher = make_matcher(["Kantara Chapter 1", "Leo"], spell=Speller({"kantra": "kantara"}))
+
+    result = matcher.match("kantra chapter")
+
+    assert (result.tier, titles(result)) == (TIER_CORRECTED, ["Kantara Chapter 1"])
+
+
+def test_fuzzy_tier_and_no_match():
+    matcher = make_matcher(["Kantara", "Leo"])
+
+    result = matcher.match("kantra")
+    assert (result.tier, titles(result), result.truncated) == (TIER_FUZZY, ["Kantara"], False)
+    assert matcher.match("zzzz").tier == TIER_NONE
+    assert matcher.match("   ").tier == TIER_NONE
+
+
+def test_results_are_capped_at_max_results():
+    matcher = make_matcher([f"Movie {i}" for i in range(30)], max_results=5)
+
+    result = matcher.match("movie")
+
+    assert len(result.matches) == 5
+    # equal scores keep catalog order
+    assert titles(result) == [f"Movie {i}" for i in range(5)]
+
+
+def test_fuzzy_scoring_stops_at_its_cpu_budget(monkeypatch):
+    matcher = make_matcher([f"Kantara Part {i}" for i in range(200)], fuzzy_budget=0.01)
+
+    def slow_ratio(a, b):
+        # ~1ms of CPU time per title
+        end = time.thread_time() + 0.001
+        while time.thread_time() < end:
+            pass
+        return 80
+    monkeypatch.setattr(search.fuzz, "token_set_ratio", slow_ratio)
+
+    started = time.thread_time()
+    result = matcher.match("kantra prt")
+    spent = time.thread_time() - started
+
+    assert result.tier == TIER_FUZZY and result.truncated
+    # checked every 16 titles: the budget plus at most one batch of scoring
+    assert 0 < len(result.matches) < 200
+    assert spent < 0.01 + 16 * 0.001 + 0.02
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import json
+import threading
+import time
+
+import pytest
+
+from catalog import Catalog
+from search import Matcher, SearchIndex
+from search_pool import SearchBusy, SearchPool
+
+
+def make_matcher(tmp_path, titles):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps([{"title": t} for t in titles]), encoding="utf-8")
+    catalog = Catalog(str(path))
+    return catalog, Matcher(SearchIndex(catalog))
+
+
+def titles(result):
+    return [e["title"] for e in result.entries]
+
+
+def test_process_pool_follows_catalog_changes(tmp_path):
+    catalog, matcher = make_matcher(tmp_path, ["Kantara", "Pushpa"])
+    pool = SearchPool(matcher, mode="process", workers=1, timeout=30)
+    try:
+        async def run():
+            assert titles(await pool.match("kantara")) == ["Kantara"]
+            base = pool._base
+
+            key = catalog.add({"title": "Jailer"})
+            assert titles(await pool.match("jailer")) == ["Jailer"]
+            catalog.update(key, {"title": "Jailer 2"})
+            assert titles(await pool.match("jailer 2")) == ["Jailer 2"]
+            catalog.delete([key])
+            assert titles(await pool.match("jailer")) == []
+            # a full replace with few differences still ships as a delta
+            catalog.save(catalog.load() + [{"title": "Leo"}])
+            assert titles(await pool.match("leo")) == ["Leo"]
+            assert pool._base == base
+
+        asyncio.run(run())
+    finally:
+        snapshot_dir = pool._snapshot_dir
+        pool.shutdown()
+    assert not os.path.exists(snapshot_dir)
+
+
+def test_timed_out_search_keeps_its_slot_until_it_finishes(tmp_path):
+    _, matcher = make_matcher(tmp_path, ["Kantara"])
+    release = threading.Event()
+    slow_match = matcher.match
+    matcher.match = lambda q: (release.wait(5), slow_match(q))[1]
+    pool = SearchPool(matcher, workers=1, max_pending=1, timeout=0.05)
+    try:
+        async def run():
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.match("kantara")
+            # the job is still running in the pool
+            assert pool.pending == 1
+            with pytest.raises(SearchBusy):
+                await pool.match("kantara")
+            release.set()
+            for _ in range(100):
+                if pool.pending == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert pool.pending == 0
+
+        asyncio.run(run())
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,38 @@
+from series import SeriesIndex
+
+
+def index_of(titles):
+    index = SeriesIndex()
+    entries = [{"id": i, "title": t, "filename": f"{i}.mkv"} for i, t in enumerate(titles, 1)]
+    index.rebuild((e["id"], e) for e in entries)
+    return index, entries
+
+
+def test_group_pulls_in_the_whole_series_in_order():
+    index, entries = index_of(["Pushpa Part 2", "Leo", "Pushpa Part 1"])
+
+    grouped = index.group([(90, entries[0]), (80, entries[1])])
+
+    assert [e["title"] for _, e in grouped] == ["Pushpa Part 1", "Pushpa Part 2", "Leo"]
+    assert [score for score, _ in grouped] == [90, 90, 80]
+
+
+def test_group_stops_at_the_limit():
+    index, entries = index_of([f"Dude S01E{n:02d}" for n in range(1, 41)] + ["Dude Movie", "Leo"])
+    matches = [(100 - i, e) for i, e in enumerate(entries)]
+
+    grouped = index.group(matches, limit=10)
+
+    assert len(grouped) == 10
+
+
+def test_series_cut_by_the_limit_starts_at_the_matched_entry():
+    index, entries = index_of([f"Dude S01E{n:02d}" for n in range(1, 41)] + ["Leo"])
+
+    # the 30th episode matched best; the first ten episodes would not contain it
+    grouped = index.group([(95, entries[29]), (80, entries[40])], limit=10)
+
+    assert [e["title"] for _, e in grouped] == [f"Dude S01E{n:02d}" for n in range(30, 40)]
+    # near the end the window moves back so it stays full
+    grouped = index.group([(95, entries[38])], limit=10)
+    assert [e["title"] for _, e in grouped] == [f"Dude S01E{n:02d}" for n in range(31, 41)]
@@ -0,0 +1,67 @@
+import json
+
+from catalog import Catalog
+from spell import SpellIndex
+
+TITLES = ["Kantara (2022)", "Pushpa The Rise", "Jailer", "Rocky Aur Rani", "Rocky Handsome", "Rocky", "Rocks"]
+
+
+def spell_index(titles=TITLES, **kwargs):
+    index = SpellIndex(**kwargs)
+    index.sync((i, {"title": t}) for i, t in enumerate(titles, 1))
+    return index
+
+
+def test_corrects_to_the_closest_word():
+    index = spell_index()
+
+    assert index.correct("kantra") == "kantara"
+    # a swap of two letters is one edit
+    assert index.correct("jaielr") == "jailer"
+    assert index.correct("jailer") == "jailer"
+    # too far away, too short, or a number: left alone
+    assert index.correct("xyzzyq") == "xyzzyq"
+    assert index.correct("ri") == "ri"
+    assert index.correct("2023") == "2023"
+
+
+def test_ties_go_to_the_word_in_more_titles():
+    # "rockz" is one edit from both; "rocky" is in three titles
+    assert spell_index().correct("rockz") == "rocky"
+
+
+def test_correct_query_keeps_known_words():
+    index = spell_index()
+
+    assert index.correct_query("Pushpa Rsie") == "pushpa rise"
+    assert index.correct_query("Pushpa Rise") == "Pushpa Rise"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "spell_index.json")
+    saved = spell_index(path=path)
+    assert saved.save() and not saved.dirty
+
+    loaded = SpellIndex(path=path)
+    assert loaded.load()
+    assert loaded.stats()["words"] == saved.stats()["words"]
+    assert loaded.stats()["deletes"] == saved.stats()["deletes"]
+    assert loaded.correct("kantra") == "kantara"
+    # built with other settings: not used
+    assert not SpellIndex(path=path, max_distance=1).load()
+
+
+def test_restart_picks_up_titles_changed_since_the_save(tmp_path):
+    movies = tmp_path / "movie_list.json"
+    movies.write_text(json.dumps([{"id": i, "title": t} for i, t in enumerate(TITLES, 1)]), encoding="utf-8")
+    path = str(tmp_path / "spell_index.json")
+    SpellIndex(Catalog(str(movies)), path=path)
+
+    catalog = Catalog(str(movies))
+    catalog.update(3, {"title": "Jawan"})
+    index = SpellIndex(catalog, path=path)
+
+    assert index.correct("jawaan") == "jawan"
+    assert index.correct("jaielr") == "jaielr"
+    # the changed title was saved again
+    assert "jawan" in json.loads((tmp_path / "spell_index.json").read_text(encoding="utf-8"))["counts"]
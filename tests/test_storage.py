@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+from catalog import Catalog, PersistError
+from storage import JournalStorage, SqliteStorage, import_json
+
+
+def journal_catalog(path, **kwargs):
+    return Catalog(str(path), storage=JournalStorage(str(path), **kwargs))
+
+
+def read_journal(path):
+    return [json.loads(line) for line in open(f"{path}.journal", encoding="utf-8") if line.strip()]
+
+
+def test_journal_appends_changes_and_replays_them(tmp_path):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps([{"title": "Kantara"}, {"title": "Pushpa"}]), encoding="utf-8")
+    catalog = journal_catalog(path)
+    kantara, pushpa = catalog.snapshot().keys
+    snapshot_before = path.read_text(encoding="utf-8")
+
+    jailer = catalog.add({"title": "Jailer"})
+    catalog.update(kantara, {"title": "Kantara Chapter 1"})
+    catalog.delete([pushpa])
+
+    # the snapshot is untouched; the changes are journal records
+    assert path.read_text(encoding="utf-8") == snapshot_before
+    assert [(r["op"], r["id"]) for r in read_journal(path)] == [
+        ("add", jailer), ("update", kantara), ("delete", pushpa)]
+
+    reloaded = journal_catalog(path)
+    assert {k: e["title"] for k, e in reloaded.items()} == {kantara: "Kantara Chapter 1", jailer: "Jailer"}
+
+
+def test_journal_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "movie_list.json"
+    path.write_text(json.dumps([{"id": 1, "title": "Kantara"}]), encoding="utf-8")
+    with open(f"{path}.journal", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "add", "id": 2, "entry": {"id": 2, "title": "Jailer"}}) + "\n")
+        f.write('{"op": "add", "id": 3, "entry": {"id": 3, "ti')
+
+    catalog = journal_catalog(path)
+    assert [e["title"] for e in catalog.snapshot().movies] == ["Kantara", "Jailer"]
+    # the next record starts on its own line
+    catalog.add({"title": "Leo"})
+    assert journal_catalog(path).snapshot().movies[-1]["title"] == "Leo"
+
+
+def test_journal_compacts_past_max_records(tmp_path):
+    path = tmp_path / "movie_list.json"
+    path.write_text("[]", encoding="utf-8")
+    catalog = journal_catalog(path, max_records=3)
+
+    for i in range(4):
+        catalog.add({"title": f"Movie {i}"})
+
+    assert catalog.storage.compactions == 1
+    # compaction folded everything into the snapshot and emptied the journal
+    assert [m["title"] for m in json.loads(path.read_text(encoding="utf-8"))] == [
+        "Movie 0", "Movie 1", "Movie 2"]
+    assert [r["entry"]["title"] for r in read_journal(path)] == ["Movie 3"]
+    assert len(journal_catalog(path).snapshot().movies) == 4
+
+
+def sqlite_catalog(path):
+    return Catalog(str(path), storage=SqliteStorage(str(path)))
+
+
+def test_sqlite_refused_add_leaves_the_catalog_unchanged(tmp_path):
+    db = tmp_path / "movies.db"
+    catalog = sqlite_catalog(db)
+    catalog.add({"title": "Kantara", "file_url": "https://x/kantara.mkv"})
+    version = catalog.version
+    events = []
+    catalog.subscribe(lambda event, key, entry: events.append(event))
+
+    # same file_url twice: the unique index refuses the whole batch
+    with pytest.raises(PersistError):
+        catalog.extend([{"title": "Jailer", "msg_id": 7}, {"title": "Kantara 2", "file_url": "https://x/kantara.mkv"}])
+
+    assert [m["title"] for m in catalog.snapshot().movies] == ["Kantara"]
+    assert catalog.key_for_msg(7) is None
+    assert catalog.version == version and events == []
+    # the next add reuses the refused keys, and a restart sees the same catalog
+    jailer = catalog.add({"title": "Jailer", "msg_id": 7})
+    assert jailer == catalog.key_for_msg(7)
+    assert [m["title"] for m in sqlite_catalog(db).snapshot().movies] == ["Kantara", "Jailer"]
+
+
+def test_sqlite_refused_update_keeps_the_old_entry(tmp_path):
+    catalog = sqlite_catalog(tmp_path / "movies.db")
+    kantara, jailer = catalog.extend([{"title": "Kantara", "file_url": "https://x/k.mkv"},
+                                      {"title": "Jailer", "file_url": "https://x/j.mkv"}])
+
+    with pytest.raises(PersistError):
+        catalog.update(jailer, {"file_url": "https://x/k.mkv"})
+
+    assert catalog.get(jailer)["file_url"] == "https://x/j.mkv"
+    assert catalog.key_for_url("https://x/j.mkv") == jailer
+    assert catalog.key_for_url("https://x/k.mkv") == kantara
+
+
+def test_sqlite_save_refuses_duplicates(tmp_path):
+    catalog = sqlite_catalog(tmp_path / "movies.db")
+    start = catalog.snapshot().version
+    catalog.add({"title": "Kantara", "msg_id": 5})
+    version = catalog.version
+    events = []
+    catalog.subscribe(lambda event, key, entry: events.append(event))
+
+    assert not catalog.save([{"title": "Leo", "msg_id": 9}, {"title": "Leo again", "msg_id": 9}])
+    assert [m["title"] for m in catalog.snapshot().movies] == ["Kantara"]
+    # no new version, no reset for listeners, and ?since cursors still work
+    assert catalog.version == version and events == []
+    assert catalog.changes_since(start)[1].keys() == {catalog.key_for_msg(5)}
+
+
+def test_sqlite_import_skips_and_reports_duplicates(tmp_path, caplog):
+    json_path = tmp_path / "movie_list.json"
+    json_path.write_text(json.dumps([
+        {"id": 1, "title": "Kantara", "msg_id": 5},
+        {"id": 2, "title": "Kantara (repost)", "msg_id": 5},
+        {"id": 3, "title": "Leo", "file_url": "https://x/leo.mkv"},
+        {"id": 4, "title": "Leo HD", "file_url": "https://x/leo.mkv"},
+        {"id": 5, "title": "Jailer", "msg_id": 6},
+    ]), encoding="utf-8")
+    db = tmp_path / "movies.db"
+
+    assert import_json(str(json_path), str(db)) == (3, 2)
+    assert [m["title"] for m in SqliteStorage(str(db)).load()] == ["Kantara", "Leo", "Jailer"]
+    report = caplog.text
+    assert "id=2" in report and "repeats id=1" in report
+    assert "id=4" in report and "repeats id=3" in report
+
+
+def test_sqlite_fts_search_follows_updates(tmp_path):
+    catalog = sqlite_catalog(tmp_path / "movies.db")
+    kantara, leo, chapter = catalog.extend([{"title": "Kantara", "msg_id": 1}, {"title": "Leo", "msg_id": 2},
+                                            {"title": "Kantara: Chapter 1", "msg_id": 3}])
+    storage = catalog.storage
+
+    assert sorted(storage.search(["kantara"])) == [kantara, chapter]
+    assert storage.search(["kantara", "chapter"]) == [chapter]
+    assert storage.search([]) == []
+
+    catalog.update(leo, {"title": "Leo Das"})
+    catalog.delete([chapter])
+    assert storage.search(["das"]) == [leo]
+    assert storage.search(["kantara"]) == [kantara]
@@ -0,0 +1,56 @@
+# textutils.py
+# Title normalization and caption parsing helpers shared by bot.py, the search
+# index and the channel indexer.
+import re
+from typing import List, Tuple
+
+STOPWORDS = {
+    "the","and","a","an","of","in","on","at","to","for","by","with","from","part","pt","episode","ep","season","s","disk","disc","cd","movie","film","full","hd","hq","1080p","720p"
+}
+
+def normalize_title(s: str) -> str:
+    s = (s or "").lower()
+    s = re.sub(r"[\[\]\(\)\{\}\|:_\-\.]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+def token_words(s: str) -> List[str]:
+    s = normalize_title(s)
+    words = re.findall(r"[a-z0-9]+", s)
+    return [w for w in words if w not in STOPWORDS]
+
+def base_series_title(s: str) -> str:
+    s = normalize_title(s)
+    s = re.sub(r"\bs\d+\s*e\d+\b", "", s)
+    s = re.sub(r"\b(part|pt|vol|volume|chapter|episode|ep|season|s)\s*\d+\b", "", s)
+    s = re.sub(r"\b\d{4}\b", "", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+def is_exact_or_5words_match(query: str, title: str) -> Tuple[bool, int]:
+    qn = normalize_title(query)
+    tn = normalize_title(title)
+    if not qn or not tn:
+        return False, 0
+    if qn == tn:
+        return True, 999
+    qset = set(token_words(qn))
+    tset = set(token_words(tn))
+    overlap = len(qset & tset)
+    return (overlap >= 5), overlap
+
+def parse_caption(caption_text):
+    if not caption_text:
+        return None, None
+    lines = caption_text.splitlines()
+    title = None
+    for line in lines:
+        s = line.strip()
+        if not s:
+            continue
+        if s.startswith("---") or s.startswith("📌") or s.lower().startswith("feedback") or s.lower().startswith("download"):
+            continue
+        title = s
+        break
+    urls = re.findall(r'https?://\S+', caption_text)
+    return title, (urls[0] if urls else None)
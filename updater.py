@@ -1,83 +1,147 @@
-import os
-import json
-import requests
-from base64 import b64encode
-
-def save_json_to_github(data):
-    token = os.environ.get("GITHUB_TOKEN")
-    repo = os.environ.get("GITHUB_REPO")
-    file_path = os.environ.get("GITHUB_FILE_PATH")
-    branch = os.environ.get("GITHUB_BRANCH", "main")
-
-    if not all([token, repo, file_path]):
-        print("❌ GitHub config environment variables missing.")
-        return
-
-    url = f"https://api.github.com/repos/{repo}/contents/{file_path}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
-
-    # पहले से मौजूद SHA लेना
-    response = requests.get(url, headers=headers)
-    sha = response.json().get("sha") if response.status_code == 200 else None
-
-    # JSON को base64 में encode करना
-    encoded_content = b64encode(
-        json.dumps(data, indent=4, ensure_ascii=False).encode()
-    ).decode()
-
-    payload = {
-        "message": "Update movie_list.json",
-        "content": encoded_content,
-        "branch": branch
-    }
-
-    if sha:
-        payload["sha"] = sha
-
-    res = requests.put(url, headers=headers, json=payload)
-
-    if res.status_code in [200, 201]:
-        print("✅ JSON GitHub पर save हो गया!")
-    else:
-        print("❌ GitHub save error:", res.text)
-
-def add_movie_to_json(title, msg_id, filename=None):
-    path = "movie_list.json"
-    data = []
-
-    # JSON फ़ाइल पढ़ो (अगर है तो)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-
-    # message ID को int में ensure करो
-    try:
-        msg_id = int(str(msg_id).strip())
-    except ValueError:
-        print("❌ Invalid message ID")
-        return
-
-    # नया मूवी object बनाओ
-    movie = {
-        "title": title.strip(),
-        "msg_id": msg_id
-    }
-
-    if filename:
-        movie["filename"] = filename.strip()
-
-    data.append(movie)
-
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
-    print("✅ लोकल movie_list.json में नया मूवी ऐड हो गया")
-
-    # GitHub पर अपडेट करो
-    save_json_to_github(data)
+import os
+import json
+import argparse
+from base64 import b64encode
+
+from catalog import Catalog, PersistError, SharedVersion
+from http_client import HttpClient
+from importer import FORMATS, DedupIndex, import_stream
+from storage import make_storage
+
+# pooled, retrying client shared by every call in this process
+http = HttpClient(timeout=15)
+
+def open_catalog(json_path="movie_list.json", storage=None, db_path=None):
+    """The catalog as the bot sees it: same CATALOG_STORAGE backend and, under gunicorn, same shared version."""
+    storage = storage or os.environ.get("CATALOG_STORAGE", "json")
+    db_path = db_path or os.environ.get("CATALOG_DB_PATH", "movies.db")
+    backend = make_storage(storage, json_path, db_path,
+                           max_records=int(os.environ.get("JOURNAL_MAX_RECORDS", "5000")),
+                           max_bytes=int(os.environ.get("JOURNAL_MAX_BYTES", str(8 * 1024 * 1024))))
+    shared = None
+    if os.environ.get("WEB_SERVER") == "gunicorn":
+        # the running bot and its workers reload when this version moves
+        shared = SharedVersion(os.environ.get("CATALOG_VERSION_PATH", f"{json_path}.version"))
+    return Catalog(json_path, reload_interval=float(os.environ.get("CATALOG_RELOAD_INTERVAL", "2")),
+                   storage=backend, shared=shared)
+
+def save_json_to_github(data):
+    token = os.environ.get("GITHUB_TOKEN")
+    repo = os.environ.get("GITHUB_REPO")
+    file_path = os.environ.get("GITHUB_FILE_PATH")
+    branch = os.environ.get("GITHUB_BRANCH", "main")
+    api_url = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+    if not all([token, repo, file_path]):
+        print("❌ GitHub config environment variables missing.")
+        return
+
+    url = f"{api_url}/repos/{repo}/contents/{file_path}"
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json"
+    }
+
+    # पहले से मौजूद SHA लेना
+    response = http.get(url, headers=headers)
+    sha = response.json().get("sha") if response.status_code == 200 else None
+
+    # JSON को base64 में encode करना
+    encoded_content = b64encode(
+        json.dumps(data, indent=4, ensure_ascii=False).encode()
+    ).decode()
+
+    payload = {
+        "message": "Update movie_list.json",
+        "content": encoded_content,
+        "branch": branch
+    }
+
+    if sha:
+        payload["sha"] = sha
+
+    res = http.put(url, headers=headers, json=payload)
+
+    if res.status_code in [200, 201]:
+        print("✅ JSON GitHub पर save हो गया!")
+    else:
+        print("❌ GitHub save error:", res.text)
+
+def add_movie_to_json(title, msg_id, filename=None):
+    # message ID को int में ensure करो
+    try:
+        msg_id = int(str(msg_id).strip())
+    except ValueError:
+        print("❌ Invalid message ID")
+        return
+
+    # नया मूवी object बनाओ
+    movie = {
+        "title": title.strip(),
+        "msg_id": msg_id
+    }
+
+    if filename:
+        movie["filename"] = filename.strip()
+
+    catalog = open_catalog()
+    try:
+        reason = DedupIndex(catalog.snapshot().movies).duplicate_of(movie)
+        if reason:
+            print(f"⚠️ मूवी पहले से list में है ({reason})")
+            return
+
+        try:
+            catalog.add(movie)
+        except PersistError as e:
+            print(f"❌ मूवी save नहीं हुई: {e}")
+            return
+        print("✅ लोकल catalog में नया मूवी ऐड हो गया")
+
+        # GitHub पर अपडेट करो
+        save_json_to_github(catalog.load())
+    finally:
+        catalog.close()
+
+def import_file(path, fmt="auto", json_path="movie_list.json", db_path=None, batch_size=None, push=False,
+                storage=None):
+    """Stream ``path`` (pipe / CSV / JSONL / JSON) into the catalog; returns the ImportReport.
+
+    ``storage`` is a CATALOG_STORAGE value (default: that env var, or
+    "sqlite" when ``db_path`` is given).
+    """
+    if storage is None and db_path:
+        storage = "sqlite"
+    catalog = open_catalog(json_path, storage, db_path)
+
+    def progress(r):
+        print(f"  ... {r.lines} lines, {r.added} added ({r.rate:.0f} lines/s)")
+
+    try:
+        with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            report = import_stream(catalog, f, fmt, filename=path, batch_size=batch_size, on_batch=progress)
+        movies = catalog.load() if push and report.added else None
+    finally:
+        catalog.close()
+    print(f"✅ {report.lines} lines: {report.added} added, {report.duplicates} duplicates, "
+          f"{report.invalid} invalid in {report.seconds:.2f}s")
+    for line_no, reason, raw in report.rejects[:20]:
+        print(f"  line {line_no}: {reason}: {raw[:120]}")
+    if len(report.rejects) > 20:
+        print(f"  ... {report.duplicates + report.invalid - 20} more rejected")
+    if movies is not None:
+        save_json_to_github(movies)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import movies into the catalog")
+    parser.add_argument("file", help="pipe-delimited, CSV, JSON lines or JSON array file")
+    parser.add_argument("--format", default="auto", choices=("auto",) + FORMATS)
+    parser.add_argument("--json", default="movie_list.json", help="catalog JSON file (default: movie_list.json)")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"),
+                        help="catalog backend (default: $CATALOG_STORAGE, as the bot uses)")
+    parser.add_argument("--db", help="SQLite catalog file (default: $CATALOG_DB_PATH; implies --storage sqlite)")
+    parser.add_argument("--batch-size", type=int, help="rows per commit (default depends on the storage)")
+    parser.add_argument("--push", action="store_true", help="upload the result to GitHub afterwards")
+    args = parser.parse_args()
+    import_file(args.file, args.format, args.json, args.db, args.batch_size, args.push, args.storage)
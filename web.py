@@ -0,0 +1,612 @@
+# web.py
+# The Flask app: admin panel, /movies JSON API and /metrics. bot.py serves it
+# from a thread of the bot process; wsgi.py serves it from gunicorn workers,
+# which import only this module and never build the bot's client, search
+# pool or caches.
+import os
+import io
+import json
+import gzip
+import zlib
+import bisect
+import secrets
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Flask, Response, request, render_template_string, redirect, session, stream_with_context, url_for
+
+from catalog import Catalog, PersistError
+from search import SearchIndex
+from github_sync import GitHubSync
+from http_client import HttpClient
+from importer import import_stream
+from textutils import normalize_title
+import metrics
+
+# -------------------------
+# Config / Env
+# -------------------------
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD")
+if not ADMIN_PASSWORD:
+    raise ValueError("ADMIN_PASSWORD required")
+
+FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "change_me_secret")
+# /metrics is open unless a token is set (then: Authorization: Bearer <token> or ?token=)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+SETTINGS_PATH = "settings.json"
+
+logger = logging.getLogger("sara_bot")
+
+flask_app = Flask(__name__)
+flask_app.secret_key = FLASK_SECRET_KEY
+flask_app.permanent_session_lifetime = timedelta(hours=8)
+
+HANDLER_SECONDS = metrics.histogram("sara_handler_seconds", "Time spent in Pyrogram handlers and Flask routes",
+                                    ("handler",))
+
+def instrumented(fn):
+    """Time a Pyrogram handler or Flask route in sara_handler_seconds."""
+    return metrics.timed(HANDLER_SECONDS, handler=fn.__name__)(fn)
+
+# -------------------------
+# What the routes serve (see bind)
+# -------------------------
+catalog: Optional[Catalog] = None
+# only the bot process uploads; web workers have no sync
+github_sync: Optional[GitHubSync] = None
+http_client: Optional[HttpClient] = None
+search_index: Optional[SearchIndex] = None
+# () -> stats of the bot's caches, for /admin/cache_stats
+cache_stats: Callable[[], Dict] = dict
+_index_lock = threading.Lock()
+
+def bind(movie_catalog: Catalog, sync: Optional[GitHubSync] = None, http: Optional[HttpClient] = None,
+         index: Optional[SearchIndex] = None, stats: Optional[Callable[[], Dict]] = None):
+    global catalog, github_sync, http_client, search_index, cache_stats
+    catalog, github_sync, http_client, search_index = movie_catalog, sync, http, index
+    cache_stats = stats or dict
+
+def title_index() -> SearchIndex:
+    # a web worker builds its index on the first admin search, not at startup
+    global search_index
+    with _index_lock:
+        if search_index is None:
+            search_index = SearchIndex(catalog)
+        return search_index
+
+def mark_dirty():
+    if github_sync is not None:
+        github_sync.mark_dirty()
+
+def sync_status() -> Dict:
+    return github_sync.status() if github_sync is not None else {"enabled": False}
+
+# -------------------------
+# Settings (auto-forward)
+# -------------------------
+def load_settings():
+    default = {"auto_forward": False}
+    try:
+        if os.path.exists(SETTINGS_PATH):
+            with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
+                s = json.load(f)
+                if "auto_forward" not in s:
+                    s["auto_forward"] = False
+                return s
+        else:
+            return default
+    except Exception:
+        logger.exception("load_settings error")
+        return default
+
+def save_settings(settings):
+    try:
+        with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=4, ensure_ascii=False)
+    except Exception:
+        logger.exception("save_settings error")
+
+# -------------------------
+# Flask templates
+# -------------------------
+login_template = """
+<!doctype html><title>Admin Login</title>
+<h2>Admin Login</h2>
+{% if error %}<p style="color:red">{{ error }}</p>{% endif %}
+<form method="post">
+  <input name="password" type="password" placeholder="Password" required>
+  <button type="submit">Login</button>
+</form>
+"""
+
+dashboard_template = """
+<!doctype html><title>Dashboard</title>
+<h2>Movie List ({{ count }})</h2>
+<p>
+  <a href="{{ url_for('admin_logout') }}">Logout</a> |
+  GitHub sync: <b>{% if not sync.enabled %}off{% elif sync.pending_changes %}{{ sync.pending_changes }} pending, lag {{ sync.lag_seconds }}s{% else %}up to date{% endif %}</b> |
+  Auto-forward: <b>{{ 'ON' if settings.auto_forward else 'OFF' }}</b>
+  <form method="post" action="{{ url_for('toggle_forward') }}" style="display:inline">
+    <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
+    <button type="submit">{{ 'Disable' if settings.auto_forward else 'Enable' }} Auto-forward</button>
+  </form>
+</p>
+
+<h3>Bulk Add (one per line: title|file_url|filename(optional), or upload a .txt/.csv/.jsonl file)</h3>
+<form method="post" action="{{ url_for('admin_bulk_add') }}" enctype="multipart/form-data">
+  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
+  <textarea name="bulk_data" rows="6" cols="80" placeholder="Movie Title | https://link.or.file_id | filename.mkv"></textarea><br>
+  File: <input type="file" name="bulk_file">
+  Format: <select name="format">
+    <option value="auto">auto</option><option value="pipe">title|url|filename</option>
+    <option value="csv">CSV</option><option value="jsonl">JSON lines</option><option value="json">JSON array</option>
+  </select>
+  <button type="submit">Add Bulk</button>
+</form>
+
+<h3>Bulk Delete (ids)</h3>
+<form method="post" action="{{ url_for('admin_bulk_delete') }}">
+  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
+  <input type="hidden" name="next" value="{{ here }}">
+  <input name="bulk_delete_indexes" placeholder="e.g. 3,8,15-17"><button type="submit">Delete</button>
+</form>
+
+<form method="get" action="{{ url_for('admin_login') }}">
+  <input name="q" value="{{ view.q }}" placeholder="Search title">
+  <select name="sort">
+    {% for s in sorts %}<option value="{{ s }}" {{ 'selected' if s == view.sort }}>{{ s }}</option>{% endfor %}
+  </select>
+  <select name="order">
+    <option value="asc" {{ 'selected' if view.order == 'asc' }}>asc</option>
+    <option value="desc" {{ 'selected' if view.order == 'desc' }}>desc</option>
+  </select>
+  <input type="hidden" name="per_page" value="{{ view.per_page }}">
+  <button type="submit">Go</button>
+  {% if view.q %}{{ view.total }} match(es) | <a href="{{ url_for('admin_login') }}">clear</a>{% endif %}
+</form>
+
+{% macro page_link(p, label) %}<a href="{{ url_for('admin_login', page=p, per_page=view.per_page, sort=view.sort, order=view.order, q=view.q or None) }}">{{ label }}</a>{% endmacro %}
+<p>
+  Page {{ view.page }} / {{ view.pages }}
+  {% if view.page > 1 %} | {{ page_link(1, '« First') }} | {{ page_link(view.page - 1, '‹ Prev') }}{% endif %}
+  {% if view.page < view.pages %} | {{ page_link(view.page + 1, 'Next ›') }} | {{ page_link(view.pages, 'Last »') }}{% endif %}
+</p>
+
+<table border=1 cellpadding=6>
+<tr><th>ID</th><th>Title</th><th>Filename</th><th>Msg ID</th><th>File URL</th><th>Actions</th></tr>
+{% for movie in movies %}
+<tr>
+  <td>{{ movie.id }}</td>
+  <td>{{ movie.title }}</td>
+  <td>{{ movie.filename }}</td>
+  <td>{{ movie.msg_id }}</td>
+  <td style="max-width:300px;word-break:break-all">{{ movie.file_url }}</td>
+  <td>
+    <a href="{{ url_for('admin_edit_movie', movie_id=movie.id, next=here) }}">Edit</a> |
+    <a href="{{ url_for('admin_delete_movie', movie_id=movie.id, password=session.get('pwd_token'), next=here) }}" onclick="return confirm('Delete?')">Delete</a>
+  </td>
+</tr>
+{% endfor %}
+</table>
+"""
+
+import_report_template = """
+<!doctype html><title>Import Report</title>
+<h2>Bulk Add</h2>
+<p>{{ r.lines }} lines: <b>{{ r.added }} added</b>, {{ r.duplicates }} duplicates, {{ r.invalid }} invalid
+   ({{ '%.2f'|format(r.seconds) }}s, {{ r.rate|round|int }} lines/s)</p>
+{% if r.rejects %}
+<h3>Rejected lines{% if r.rejects|length < r.duplicates + r.invalid %} (first {{ r.rejects|length }}){% endif %}</h3>
+<table border=1 cellpadding=4>
+<tr><th>Line</th><th>Reason</th><th>Content</th></tr>
+{% for line_no, reason, raw in r.rejects %}
+<tr><td>{{ line_no }}</td><td>{{ reason }}</td><td style="max-width:600px;word-break:break-all">{{ raw }}</td></tr>
+{% endfor %}
+</table>
+{% endif %}
+<a href="{{ url_for('admin_login') }}">Back</a>
+"""
+
+edit_template = """
+<!doctype html><title>Edit Movie</title>
+<h2>Edit Movie #{{ movie_id }}</h2>
+<form method="post">
+  <input type="hidden" name="password" value="{{ session.get('pwd_token') }}">
+  <input type="hidden" name="next" value="{{ next }}">
+  Title:<br><input type="text" name="title" value="{{ movie.title }}" required><br>
+  Filename:<br><input type="text" name="filename" value="{{ movie.filename }}"><br>
+  File URL:<br><input type="text" name="file_url" value="{{ movie.file_url }}"><br>
+  <button type="submit">Save</button>
+</form>
+<a href="{{ next }}">Back</a>
+"""
+
+# -------------------------
+# Flask routes
+# -------------------------
+def require_login():
+    return session.get("logged", False)
+
+DASHBOARD_PER_PAGE = 50
+DASHBOARD_MAX_PER_PAGE = 500
+# sort key per column; "id" is catalog order and needs no sorting
+DASHBOARD_SORTS = {
+    "id": None,
+    "title": lambda m: normalize_title(m.get("title", "")),
+    "msg_id": lambda m: int(m.get("msg_id", 0) or 0),
+    "filename": lambda m: (m.get("filename") or "").lower(),
+}
+# (version, sort) -> ordered catalog keys; rebuilt once per catalog version
+_dashboard_orders: Dict[Tuple[int, str], Tuple[int, ...]] = {}
+
+def dashboard_order(snap, sort: str) -> Tuple[int, ...]:
+    keyfunc = DASHBOARD_SORTS.get(sort)
+    if keyfunc is None:
+        return snap.keys
+    order = _dashboard_orders.get((snap.version, sort))
+    if order is None:
+        ranked = sorted(zip(snap.keys, snap.movies), key=lambda km: (keyfunc(km[1]), km[0]))
+        order = tuple(k for k, _ in ranked)
+        for stale in [vs for vs in _dashboard_orders if vs[0] != snap.version]:
+            _dashboard_orders.pop(stale, None)
+        _dashboard_orders[(snap.version, sort)] = order
+    return order
+
+def int_arg(name: str, default: int, lo: int, hi: int) -> int:
+    try:
+        return min(max(int(request.args.get(name, default)), lo), hi)
+    except ValueError:
+        return default
+
+def render_dashboard():
+    snap = catalog.snapshot()
+    sort = request.args.get("sort", "id")
+    if sort not in DASHBOARD_SORTS:
+        sort = "id"
+    order = "desc" if request.args.get("order") == "desc" else "asc"
+    q = request.args.get("q", "").strip()
+    per_page = int_arg("per_page", DASHBOARD_PER_PAGE, 1, DASHBOARD_MAX_PER_PAGE)
+
+    if q:
+        # title search through the search index; only the matches get sorted
+        ids = [m["id"] for m in title_index().search(q)]
+        keyfunc = DASHBOARD_SORTS[sort]
+        if keyfunc is not None:
+            ids.sort(key=lambda k: (keyfunc(catalog.get(k) or {}), k))
+        keys = ids
+    else:
+        keys = dashboard_order(snap, sort)
+    total = len(keys)
+    pages = max(1, (total + per_page - 1) // per_page)
+    page = int_arg("page", 1, 1, pages)
+    if order == "desc":
+        end = total - (page - 1) * per_page
+        page_keys = keys[max(0, end - per_page):end][::-1]
+    else:
+        page_keys = keys[(page - 1) * per_page:page * per_page]
+    movies = [m for m in (catalog.get(k) for k in page_keys) if m is not None]
+
+    view = {"q": q, "sort": sort, "order": order, "page": page, "pages": pages, "per_page": per_page, "total": total}
+    return render_template_string(dashboard_template, movies=movies, count=len(snap.movies), view=view,
+                                  sorts=list(DASHBOARD_SORTS), here=request.full_path.rstrip("?"),
+                                  session=session, settings=load_settings(), sync=sync_status())
+
+def back_to_dashboard():
+    # return to the dashboard page the action came from
+    target = request.values.get("next", "")
+    if target.startswith("/admin") and not target.startswith("//"):
+        return redirect(target)
+    return redirect(url_for("admin_login"))
+
+@flask_app.route("/admin", methods=["GET", "POST"])
+@instrumented
+def admin_login():
+    if request.method == "POST":
+        pwd = request.form.get("password")
+        if pwd == ADMIN_PASSWORD:
+            session.permanent = True
+            session["logged"] = True
+            session["pwd_token"] = pwd
+            return render_dashboard()
+        else:
+            return render_template_string(login_template, error="Wrong password!")
+    else:
+        if require_login():
+            return render_dashboard()
+        return render_template_string(login_template, error=None)
+
+@flask_app.route("/admin/logout")
+@instrumented
+def admin_logout():
+    session.clear()
+    return redirect(url_for("admin_login"))
+
+@flask_app.route("/admin/edit/<int:movie_id>", methods=["GET", "POST"])
+@instrumented
+def admin_edit_movie(movie_id):
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    key = movie_id
+    movie = catalog.get(key)
+    if movie is None:
+        return "Invalid movie id"
+    if request.method == "POST":
+        fields = {
+            "title": request.form.get("title", movie.get("title","")).strip(),
+            "filename": request.form.get("filename", movie.get("filename","")),
+            "file_url": request.form.get("file_url", movie.get("file_url","")),
+        }
+        if fields["file_url"] != movie.get("file_url"):
+            other = catalog.key_for_url(fields["file_url"]) if fields["file_url"] else None
+            if other is not None and other != key:
+                return "Another movie already uses this file URL"
+            # a file_id stored in the entry by older versions belonged to the old URL
+            if movie.get("file_id"):
+                fields["file_id"] = ""
+        try:
+            catalog.update(key, fields)
+        except PersistError:
+            logger.exception("Admin edit of movie id=%s not saved", movie_id)
+            return "Could not save the change, see the bot log", 500
+        mark_dirty()
+        logger.info("Admin edited movie id=%s", movie_id)
+        return back_to_dashboard()
+    return render_template_string(edit_template, movie=movie, movie_id=movie_id,
+                                  next=request.args.get("next") or url_for("admin_login"))
+
+@flask_app.route("/admin/delete/<int:movie_id>")
+@instrumented
+def admin_delete_movie(movie_id):
+    pwd = request.args.get("password")
+    if pwd != session.get("pwd_token"):
+        return redirect(url_for("admin_login"))
+    try:
+        removed = catalog.delete([movie_id])
+    except PersistError:
+        logger.exception("Admin delete of movie id=%s not saved", movie_id)
+        return "Could not delete the movie, see the bot log", 500
+    if removed:
+        mark_dirty()
+        logger.info("Admin deleted movie id=%s title=%s", movie_id, removed[0].get("title"))
+    return back_to_dashboard()
+
+@flask_app.route("/admin/bulk_add", methods=["POST"])
+@instrumented
+def admin_bulk_add():
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    fmt = request.form.get("format", "auto")
+    upload = request.files.get("bulk_file")
+    if upload and upload.filename:
+        # read the upload line by line instead of loading it whole
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="replace", newline="")
+        filename = upload.filename
+    else:
+        bulk = request.form.get("bulk_data", "").strip()
+        if not bulk:
+            return redirect(url_for("admin_login"))
+        stream, filename = io.StringIO(bulk), ""
+    try:
+        report = import_stream(catalog, stream, fmt, filename=filename,
+                               on_batch=lambda r: mark_dirty())
+    except ValueError as e:
+        return f"Import failed: {e}", 400
+    logger.info("Admin bulk added %d movies (%d duplicates, %d invalid)", report.added, report.duplicates, report.invalid)
+    return render_template_string(import_report_template, r=report)
+
+def parse_indexes_spec(spec: str):
+    rv = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            try:
+                a,b = part.split("-",1)
+                a=int(a); b=int(b)
+                for i in range(a,b+1):
+                    rv.add(i)
+            except:
+                continue
+        else:
+            try:
+                rv.add(int(part))
+            except:
+                continue
+    return sorted(rv)
+
+@flask_app.route("/admin/bulk_delete", methods=["POST"])
+@instrumented
+def admin_bulk_delete():
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    spec = request.form.get("bulk_delete_indexes","").strip()
+    if not spec:
+        return redirect(url_for("admin_login"))
+    try:
+        removed = catalog.delete(parse_indexes_spec(spec))
+    except PersistError:
+        logger.exception("Admin bulk delete %r not saved", spec)
+        return "Could not delete the movies, see the bot log", 500
+    for movie in removed:
+        logger.info("Admin bulk deleted id=%s title=%s", movie.get("id"), movie.get("title"))
+    if removed:
+        mark_dirty()
+    return back_to_dashboard()
+
+@flask_app.route("/admin/sync_status")
+@instrumented
+def admin_sync_status():
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    return dict(sync_status(), http=http_client.stats() if http_client is not None else None)
+
+@flask_app.route("/admin/cache_stats")
+@instrumented
+def admin_cache_stats():
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    return cache_stats()
+
+@flask_app.route("/metrics")
+def prometheus_metrics():
+    # not @instrumented: a scrape would otherwise time itself
+    if METRICS_TOKEN:
+        auth = request.headers.get("Authorization", "")
+        token = auth[7:] if auth.startswith("Bearer ") else request.args.get("token", "")
+        if not secrets.compare_digest(token, METRICS_TOKEN):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@flask_app.route("/toggle_forward", methods=["POST"])
+@instrumented
+def toggle_forward():
+    if not require_login():
+        return redirect(url_for("admin_login"))
+    s = load_settings()
+    s["auto_forward"] = not bool(s.get("auto_forward", False))
+    save_settings(s)
+    logger.info("Auto-forward set to %s by admin", s["auto_forward"])
+    return redirect(url_for("admin_login"))
+
+@flask_app.route("/")
+@instrumented
+def home():
+    return "✅ Sara bot Flask server running."
+
+# -------------------------
+# /movies JSON API
+# -------------------------
+#   /movies                      full list, streamed
+#   /movies?limit=N&offset=M     one page in catalog order
+#   /movies?limit=N&after=ID     one page by id (cursor: next_after)
+#   /movies?since=VERSION        only movies added/changed/deleted since VERSION
+# Responses carry ETag/Last-Modified of the catalog version (304 when
+# unchanged) and are gzipped when the client accepts it.
+MOVIES_MAX_LIMIT = 1000
+# (version, ids in ascending order) for cursor paging
+_ids_by_version: Tuple[int, Tuple[int, ...]] = (0, ())
+
+def ids_in_order(snap) -> Tuple[int, ...]:
+    global _ids_by_version
+    version, ids = _ids_by_version
+    if version != snap.version:
+        ids = tuple(sorted(snap.keys))
+        _ids_by_version = (snap.version, ids)
+    return ids
+
+def http_date(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+def not_modified(etag: str, modified_at: float) -> bool:
+    # the ETag names the exact catalog version: when the client sent one,
+    # If-Modified-Since is ignored (RFC 9110 13.1.3)
+    inm = request.headers.get("If-None-Match")
+    if inm:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("If-Modified-Since")
+    if ims:
+        try:
+            # HTTP dates have whole seconds: a change later in the same second
+            # as the client's copy would look unmodified, so only an older
+            # second counts
+            return int(modified_at) < parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def json_chunks(head: Dict, movies) -> Iterable[str]:
+    # {"count": ..., "version": ..., "movies": [ ... ]} without building it in memory
+    yield json.dumps(head, ensure_ascii=False)[:-1] + ', "movies": ['
+    first = True
+    for m in movies:
+        yield ("" if first else ",") + json.dumps(m, ensure_ascii=False)
+        first = False
+    yield "]}"
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterable[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    buf = []
+    size = 0
+    for chunk in chunks:
+        buf.append(chunk.encode("utf-8"))
+        size += len(buf[-1])
+        if size >= 64 * 1024:
+            out = z.compress(b"".join(buf))
+            buf, size = [], 0
+            if out:
+                yield out
+    yield z.compress(b"".join(buf)) + z.flush()
+
+def movies_response(chunks: Iterable[str], etag: str, modified_at: float, stream: bool = False):
+    gz = "gzip" in request.headers.get("Accept-Encoding", "")
+    if stream:
+        body = stream_with_context(gzip_chunks(chunks) if gz else (c.encode("utf-8") for c in chunks))
+    else:
+        raw = "".join(chunks).encode("utf-8")
+        body = gzip.compress(raw, 6) if gz and len(raw) > 1024 else raw
+        gz = gz and body is not raw
+    resp = Response(body, mimetype="application/json")
+    if gz:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["ETag"] = etag
+    resp.headers["Last-Modified"] = http_date(modified_at)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@flask_app.route("/movies")
+@instrumented
+def get_movies():
+    snap = catalog.snapshot()
+    modified_at = catalog.modified_at
+    etag = f'W/"{snap.version}"'
+    if not_modified(etag, modified_at):
+        resp = Response(status=304)
+        resp.headers["ETag"] = etag
+        resp.headers["Last-Modified"] = http_date(modified_at)
+        return resp
+
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            delta = catalog.changes_since(int(since))
+        except ValueError:
+            return {"error": "since must be a catalog version"}, 400
+        if delta is None:
+            # too old (or the catalog was replaced): fetch the full list again
+            return {"error": "version too old, fetch /movies again", "version": snap.version}, 410
+        version, changed = delta
+        changed_movies = [changed[k] for k in sorted(changed) if changed[k] is not None]
+        head = {"since": int(since), "version": version, "count": len(changed_movies),
+                "deleted": sorted(k for k, m in changed.items() if m is None)}
+        return movies_response(json_chunks(head, changed_movies), f'W/"{version}"', modified_at)
+
+    if "limit" not in request.args:
+        head = {"count": len(snap.movies), "version": snap.version}
+        return movies_response(json_chunks(head, snap.movies), etag, modified_at, stream=True)
+
+    try:
+        limit = min(max(int(request.args["limit"]), 1), MOVIES_MAX_LIMIT)
+        offset = max(int(request.args.get("offset", 0)), 0)
+        after = request.args.get("after")
+        after = int(after) if after is not None else None
+    except ValueError:
+        return {"error": "limit, offset and after must be integers"}, 400
+    head = {"count": len(snap.movies), "version": snap.version, "limit": limit}
+    if after is not None:
+        ids = ids_in_order(snap)
+        start = bisect.bisect_right(ids, after)
+        page_ids = ids[start:start + limit]
+        page = [m for m in (catalog.get(k) for k in page_ids) if m is not None]
+        head["after"] = after
+        head["next_after"] = page_ids[-1] if start + limit < len(ids) else None
+    else:
+        page = snap.movies[offset:offset + limit]
+        head["offset"] = offset
+        head["next_offset"] = offset + limit if offset + limit < len(snap.movies) else None
+    return movies_response(json_chunks(head, page), etag, modified_at)
+
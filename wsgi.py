@@ -0,0 +1,38 @@
+# wsgi.py
+# Entry point for serving the Flask app (admin panel, /movies, /metrics) from
+# gunicorn worker processes, next to a bot process started without Flask:
+#
+#   WEB_SERVER=gunicorn python bot.py &
+#   WEB_SERVER=gunicorn gunicorn wsgi:application --workers 2 --threads 4
+#
+# (start.sh does both.) A worker loads web.py and a catalog only, not bot.py:
+# no Telegram client, search pool, poster cache or GitHub sync per worker.
+# Workers share the bot's catalog through the storage backend and
+# CATALOG_VERSION_PATH: a write by any process is seen by the others on their
+# next request. Don't use gunicorn's --preload: each worker must open the
+# catalog, its file lock and its log thread after the fork.
+import os
+import atexit
+import logging
+
+# the catalog is only shared when every process agrees on it
+os.environ.setdefault("WEB_SERVER", "gunicorn")
+
+import metrics  # noqa: E402
+import web  # noqa: E402
+from log_setup import setup_logging  # noqa: E402
+from updater import open_catalog  # noqa: E402
+
+# stderr only (gunicorn's log): several processes can't rotate one bot.log
+logger = logging.getLogger("sara_bot")
+log_listener = setup_logging(logger, os.environ.get("LOG_FILE", ""),
+                             json_lines=os.environ.get("LOG_FORMAT", "text").lower() == "json")
+atexit.register(log_listener.stop)
+
+catalog = open_catalog()
+atexit.register(catalog.close)
+metrics.gauge("sara_catalog_entries", "Movies in the catalog", fn=lambda: len(catalog.snapshot().movies))
+# edits go to the shared storage; the bot process picks them up and uploads them
+web.bind(catalog)
+
+application = web.flask_app